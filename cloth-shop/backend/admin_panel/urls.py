@@ -6,4 +6,5 @@ urlpatterns = [
     path('check/', views.admin_check, name='admin_check'),
     path('dashboard-stats/', views.dashboard_stats, name='dashboard_stats'),
     path('sales-report/', views.sales_report, name='sales_report'),
+    path('request-metrics/', views.request_metrics, name='request_metrics'),
 ]
\ No newline at end of file
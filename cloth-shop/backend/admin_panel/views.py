@@ -1,4 +1,6 @@
 # admin_panel/views.py
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -12,8 +14,11 @@ from orders.models import Order
 from products.models import Product, Category
 from users.models import CustomUser
 from payments.models import Payment
+from perf.metrics import registry as request_metrics_registry
 from .serializers import AdminLoginSerializer, DashboardStatsSerializer, SalesReportSerializer
 
+logger = logging.getLogger(__name__)
+
 @api_view(['POST'])
 @permission_classes([])
 def admin_login(request):
@@ -136,8 +141,7 @@ def dashboard_stats(request):
         
         return Response(stats)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error building dashboard stats")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
@@ -184,3 +188,13 @@ def admin_check(request):
             'first_name': request.user.first_name,
         }
     })
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """Per-endpoint latency histograms from this worker process (DELETE resets them)"""
+    if request.method == 'DELETE':
+        request_metrics_registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(request_metrics_registry.snapshot())
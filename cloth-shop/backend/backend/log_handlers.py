@@ -0,0 +1,81 @@
+# backend/log_handlers.py
+"""
+Non-blocking logging handlers used by ``settings.LOGGING``.
+
+``QueuedHandler`` only puts records on an in-memory queue; a ``QueueListener``
+thread owns the real (stream/file) handler and does the formatting and I/O,
+so request threads never wait on stdout or disk. When the queue is full,
+records are dropped and counted instead of blocking the request.
+
+The listener thread is started when logging is configured, i.e. in each
+gunicorn worker (without ``--preload``) and in management commands.
+"""
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+
+class QueuedHandler(QueueHandler):
+    """
+    ``QueueHandler`` that builds its target handler from ``LOGGING``::
+
+        'payments_file': {
+            '()': 'backend.log_handlers.QueuedHandler',
+            'handler': 'logging.FileHandler',
+            'filename': BASE_DIR / 'stripe_payments.log',
+            'formatter': 'verbose',
+        }
+
+    Extra keys are passed to the target handler; the formatter is applied to
+    the target so the listener thread does the formatting. Messages are
+    merged with their args (and traceback) before queueing, as
+    ``QueueHandler.prepare`` does.
+    """
+
+    def __init__(self, handler='logging.StreamHandler', queue_size=10000, **kwargs):
+        super().__init__(queue.Queue(queue_size))
+        self.target = import_string(handler)(**kwargs)
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # logging.shutdown() closes handlers at exit; stop() drains the queue.
+        listener, self.listener = self.listener, None
+        try:
+            if listener is not None:
+                listener.stop()
+            self.target.close()
+        finally:
+            super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of noisy records.
+
+    Records at or below ``level`` pass with probability ``rate``; anything
+    above ``level`` always passes, so warnings and errors are never sampled.
+    """
+
+    def __init__(self, rate=1.0, level='DEBUG'):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        if record.levelno > self.level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
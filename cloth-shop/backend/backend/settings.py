@@ -72,9 +72,12 @@ INSTALLED_APPS = [
     'reviews',
     'wishlist',
     'admin_panel',
+    'perf',
 ]
 
 MIDDLEWARE = [
+    'perf.middleware.RequestMetricsMiddleware',
+    'perf.middleware.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -298,10 +301,87 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('EMAIL_HOST_USER', default='')
 
+# Cache (defaults to per-process memory; set CACHE_URL, e.g. redis://, in production)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Seconds the first page of a product's review feed stays cached
+REVIEW_FEED_CACHE_TIMEOUT = env.int('REVIEW_FEED_CACHE_TIMEOUT', default=300)
+
+# Store helpful votes unapplied and fold them into Review.helpful_count with
+# `manage.py flush_review_votes` (run from cron) instead of one UPDATE per vote
+REVIEW_VOTE_BUFFERED = env.bool('REVIEW_VOTE_BUFFERED', default=False)
+
+# Seconds a signed guest cart token (cart.guest) stays valid
+GUEST_CART_MAX_AGE = env.int('GUEST_CART_MAX_AGE', default=60 * 60 * 24 * 30)
+
+# Seconds a cart line holds its size stock (cart.holds); expired holds are
+# released by `manage.py sweep_expired_holds` (run from cron)
+CART_HOLD_TTL = env.int('CART_HOLD_TTL', default=15 * 60)
+
+# Seconds a prepaid order may stay unpaid before `manage.py
+# cancel_unpaid_orders` (run from cron) cancels it and restocks its units
+UNPAID_ORDER_TTL = env.int('UNPAID_ORDER_TTL', default=24 * 60 * 60)
+
+# Worker id (0-1023) in order numbers (orders.numbering); give each process
+# that creates orders its own. Unset, the process id is used.
+ORDER_NUMBER_WORKER_ID = env.int('ORDER_NUMBER_WORKER_ID', default=None)
+
+# Seconds between database polls feeding order event streams (orders.events).
+# Leave at 0 when one ASGI process serves both the API and the streams; set it
+# when orders are changed by other processes (WSGI workers, cron, webhooks).
+ORDER_EVENTS_POLL_INTERVAL = env.float('ORDER_EVENTS_POLL_INTERVAL', default=0)
+
+# Seconds between keep-alive comments on an idle order event stream
+ORDER_EVENTS_KEEPALIVE = env.int('ORDER_EVENTS_KEEPALIVE', default=15)
+
 # Stripe Configuration
 STRIPE_PUBLIC_KEY = env('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY')
+STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
+
+# Gateway the payment views charge through (payments.gateway); set it to
+# payments.gateway.FakeGateway to run checkout without network access
+PAYMENT_GATEWAY = env('PAYMENT_GATEWAY', default='payments.gateway.StripeGateway')
+
+# Stripe HTTP client: seconds to connect and to wait for a response,
+# network retries (jittered backoff) and pooled connections per process
+STRIPE_CONNECT_TIMEOUT = env.float('STRIPE_CONNECT_TIMEOUT', default=3)
+STRIPE_READ_TIMEOUT = env.float('STRIPE_READ_TIMEOUT', default=10)
+STRIPE_MAX_RETRIES = env.int('STRIPE_MAX_RETRIES', default=2)
+STRIPE_POOL_SIZE = env.int('STRIPE_POOL_SIZE', default=10)
+
+# Times `manage.py process_stripe_events` retries a failing webhook event
+# before leaving it as failed
+STRIPE_EVENT_MAX_ATTEMPTS = env.int('STRIPE_EVENT_MAX_ATTEMPTS', default=5)
+
+# Per-request timing (perf.middleware.RequestMetricsMiddleware)
+PERF_METRICS = {
+    'ENABLED': env.bool('PERF_METRICS_ENABLED', default=True),
+    'SERVER_TIMING': env.bool('PERF_SERVER_TIMING', default=True),
+    'WINDOW': 500,  # samples kept per route for percentiles
+    # Level of the per-request line on `perf.requests`; the DEBUG default
+    # stays out of production logs unless PERF_LOG_LEVEL is lowered
+    'LOG_LEVEL': env('PERF_REQUEST_LOG_LEVEL', default='DEBUG'),
+}
+
+# Wall-clock budgets (benchmark p95s, micro-benchmarks) in `manage.py test`.
+# Off by default: they depend on the machine; query budgets always apply.
+BENCHMARK_LATENCY = env.bool('BENCHMARK_LATENCY', default=False)
+
+# Duplicate/slow query detection (perf.middleware.QueryInspectorMiddleware).
+# Off by default: resolving call sites walks the stack on every query.
+PERF_QUERY_INSPECTOR = {
+    'ENABLED': env.bool('PERF_QUERY_INSPECTOR', default=False),
+    'THRESHOLD': env.int('PERF_DUPLICATE_QUERY_THRESHOLD', default=5),
+    'SLOW_MS': env.int('PERF_SLOW_QUERY_MS', default=100),
+    'RAISE': env.bool('PERF_QUERY_INSPECTOR_RAISE', default=False),
+}
 
+# Handlers hand records to a queue drained by a background thread
+# (backend.log_handlers.QueuedHandler), so logging never blocks a request on
+# stdout or disk. DEBUG records are sampled at LOG_DEBUG_SAMPLE_RATE.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -311,22 +391,35 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        'sample_debug': {
+            '()': 'backend.log_handlers.SamplingFilter',
+            'rate': env.float('LOG_DEBUG_SAMPLE_RATE', default=1.0),
+            'level': 'DEBUG',
+        },
+    },
     'handlers': {
         'console': {
+            '()': 'backend.log_handlers.QueuedHandler',
+            'handler': 'logging.StreamHandler',
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
             'formatter': 'verbose',
+            'filters': ['sample_debug'],
         },
         'payments_file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': 'backend.log_handlers.QueuedHandler',
+            'handler': 'logging.FileHandler',
             'filename': BASE_DIR / 'stripe_payments.log',
+            'delay': True,
+            'level': 'INFO',
             'formatter': 'verbose',
         },
         'users_file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': 'backend.log_handlers.QueuedHandler',
+            'handler': 'logging.FileHandler',
             'filename': BASE_DIR / 'auth_logs.log',
+            'delay': True,
+            'level': 'INFO',
             'formatter': 'verbose',
         },
     },
@@ -341,5 +434,35 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'products': {
+            'handlers': ['console'],
+            'level': env('PRODUCTS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'cart': {
+            'handlers': ['console'],
+            'level': env('CART_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'orders': {
+            'handlers': ['console'],
+            'level': env('ORDERS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'reviews': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'admin_panel': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'perf': {
+            'handlers': ['console'],
+            'level': env('PERF_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
     },
 }
@@ -0,0 +1,67 @@
+import logging
+import random
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from backend.log_handlers import QueuedHandler, SamplingFilter
+
+
+def make_record(level=logging.INFO, msg='event %s', args=(1,)):
+    return logging.LogRecord('tests', level, __file__, 1, msg, args, None)
+
+
+class QueuedHandlerTests(SimpleTestCase):
+    def make_handler(self, queue_size=10000):
+        handler = QueuedHandler(handler='logging.handlers.BufferingHandler', queue_size=queue_size, capacity=1000)
+        self.addCleanup(handler.close)
+        return handler
+
+    def stop_listener(self, handler):
+        # Drains what is queued; later records stay on the queue
+        handler.listener.stop()
+        handler.listener = None
+
+    def test_records_reach_the_target_formatted_in_order(self):
+        handler = self.make_handler()
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        for number in range(3):
+            handler.handle(make_record(args=(number,)))
+        self.stop_listener(handler)
+
+        buffered = handler.target.buffer
+        self.assertEqual([record.getMessage() for record in buffered], ['event 0', 'event 1', 'event 2'])
+        self.assertEqual(handler.target.format(buffered[0]), 'INFO event 0')
+        self.assertEqual(handler.dropped, 0)
+
+    def test_records_are_dropped_and_counted_when_the_queue_is_full(self):
+        handler = self.make_handler(queue_size=2)
+        self.stop_listener(handler)
+
+        for number in range(5):
+            handler.handle(make_record(args=(number,)))
+
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual([handler.queue.get_nowait().getMessage() for _ in range(2)], ['event 0', 'event 1'])
+
+
+class SamplingFilterTests(SimpleTestCase):
+    def passed(self, sampling_filter, level, count=10000):
+        return sum(sampling_filter.filter(make_record(level)) for _ in range(count))
+
+    def test_debug_records_pass_at_the_sample_rate(self):
+        with mock.patch('backend.log_handlers.random', random.Random(30)):
+            passed = self.passed(SamplingFilter(rate=0.25), logging.DEBUG)
+        self.assertAlmostEqual(passed / 10000, 0.25, delta=0.02)
+
+    def test_records_above_the_level_are_never_sampled(self):
+        sampling_filter = SamplingFilter(rate=0, level='DEBUG')
+        self.assertEqual(self.passed(sampling_filter, logging.DEBUG, 100), 0)
+        for level in (logging.INFO, logging.WARNING, logging.ERROR):
+            self.assertEqual(self.passed(sampling_filter, level, 100), 100)
+
+    def test_full_rate_keeps_everything(self):
+        with mock.patch('backend.log_handlers.random') as rng:
+            self.assertEqual(self.passed(SamplingFilter(rate=1.0), logging.DEBUG, 100), 100)
+        rng.random.assert_not_called()
@@ -0,0 +1,276 @@
+# cart/guest.py
+"""
+Guest carts.
+
+Anonymous shoppers have no ``Cart`` row (it is one-to-one with a user), so
+their lines travel with the client as a signed token: a compressed,
+``django.core.signing`` protected list of ``[product_id, variant_id, size,
+quantity]``. Nothing is written to the database until login, when
+``merge`` folds the lines into the user's cart.
+
+Validation is done for all lines at once, one query each for products,
+colour variants and size stocks, and the merge upserts every line with a
+single ``bulk_create(update_conflicts=True)``.
+"""
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import ColorVariant, Product, SizeStock
+from . import holds, pricing
+from .models import Cart, CartItem
+
+SALT = 'cart.guest'
+COOKIE_NAME = 'guest_cart'
+MAX_LINES = 50
+MAX_QUANTITY = 99
+
+
+class GuestLine:
+    __slots__ = ('product_id', 'variant_id', 'size', 'quantity', 'product', 'variant', 'size_stock')
+
+    def __init__(self, product_id, variant_id=None, size=None, quantity=1):
+        self.product_id = product_id
+        self.variant_id = variant_id
+        self.size = size
+        self.quantity = quantity
+        self.product = None
+        self.variant = None
+        self.size_stock = None
+
+    @property
+    def key(self):
+        return (self.product_id, self.variant_id, self.size)
+
+    @property
+    def id(self):
+        """Stable string id the client uses to update or remove the line."""
+        return f"{self.product_id}:{self.variant_id or ''}:{self.size or ''}"
+
+    def pricing_line(self):
+        return pricing.Line(
+            key=self.key,
+            base_price=self.product.base_price,
+            discount_price=self.product.discount_price,
+            price_adjustment=self.variant.price_adjustment if self.variant else pricing.ZERO,
+            quantity=self.quantity,
+        )
+
+
+def parse_lines(data):
+    """Lines from request data (dicts with product_id, variant_id, size, quantity).
+
+    Raises ``ValueError`` for malformed input. A quantity of 0 is kept so
+    callers can use it to remove a line.
+    """
+    if not isinstance(data, list):
+        raise ValueError('items must be a list')
+    if len(data) > MAX_LINES:
+        raise ValueError(f'at most {MAX_LINES} items per cart')
+    lines = []
+    for entry in data:
+        if not isinstance(entry, dict) or not entry.get('product_id'):
+            raise ValueError('each item needs a product_id')
+        variant_id = entry.get('variant_id')
+        quantity = int(entry.get('quantity', 1))
+        if not 0 <= quantity <= MAX_QUANTITY:
+            raise ValueError(f'quantity must be between 0 and {MAX_QUANTITY}')
+        lines.append(GuestLine(
+            int(entry['product_id']),
+            int(variant_id) if variant_id else None,
+            str(entry['size']) if entry.get('size') else None,
+            quantity,
+        ))
+    return lines
+
+
+def combine(lines, changes):
+    """``lines`` with ``changes`` applied: a change replaces the line with the same key, 0 removes it."""
+    by_key = {line.key: line for line in lines}
+    for change in changes:
+        by_key[change.key] = change
+    return [line for line in by_key.values() if line.quantity > 0][:MAX_LINES]
+
+
+def dumps(lines):
+    return signing.dumps(
+        [[line.product_id, line.variant_id, line.size, line.quantity] for line in lines],
+        salt=SALT, compress=True,
+    )
+
+
+def loads(token):
+    """Lines from a guest cart token. Raises ``signing.BadSignature`` if tampered with or expired."""
+    if not token:
+        return []
+    rows = signing.loads(token, salt=SALT, max_age=settings.GUEST_CART_MAX_AGE)
+    return [GuestLine(*row) for row in rows[:MAX_LINES]]
+
+
+def validate(lines):
+    """Resolve ``lines`` against the catalogue in three queries.
+
+    Returns ``(valid, errors)``. Lines for missing or inactive products,
+    unknown variants or sizes are dropped; quantities above the stock not
+    held by other carts are lowered to it. ``errors`` explains each change.
+    """
+    errors = []
+    products = Product.objects.in_bulk({line.product_id for line in lines if line.quantity > 0})
+    products = {pk: product for pk, product in products.items() if product.is_active}
+    variants = ColorVariant.objects.in_bulk({line.variant_id for line in lines if line.variant_id})
+    sized = [line for line in lines if line.variant_id and line.size]
+    stock = {}
+    if sized:
+        stock = {
+            (row.variant_id, row.size): row
+            for row in SizeStock.objects.filter(
+                variant_id__in={line.variant_id for line in sized},
+                size__in={line.size for line in sized},
+            )
+        }
+
+    valid = []
+    for line in lines:
+        if line.quantity <= 0:
+            continue
+        line.product = products.get(line.product_id)
+        if line.product is None:
+            errors.append({'id': line.id, 'error': 'Product not found or inactive'})
+            continue
+        if line.variant_id:
+            line.variant = variants.get(line.variant_id)
+            if line.variant is None or line.variant.product_id != line.product_id:
+                errors.append({'id': line.id, 'error': 'Color variant not found'})
+                continue
+            if line.size:
+                line.size_stock = stock.get((line.variant_id, line.size))
+                if line.size_stock is None:
+                    errors.append({'id': line.id, 'error': f'Size {line.size} not available for this variant'})
+                    continue
+                available = line.size_stock.available_quantity
+                if available <= 0:
+                    errors.append({'id': line.id, 'error': 'Out of stock'})
+                    continue
+                if line.quantity > available:
+                    line.quantity = available
+                    errors.append({'id': line.id, 'error': f'Only {available} items available'})
+        valid.append(line)
+    return valid, errors
+
+
+def serialize(lines):
+    """Cart-shaped payload for a guest cart, so the client renders it like a user cart."""
+    quote = pricing.price(line.pricing_line() for line in lines)
+    items = []
+    for line, priced in zip(lines, quote.lines):
+        items.append({
+            'id': line.id,
+            'product': {
+                'id': line.product.id,
+                'name': line.product.name,
+                'slug': line.product.slug,
+                'brand': line.product.brand,
+            },
+            'color_variant': line.variant_id,
+            'color_variant_details': {
+                'id': line.variant.id,
+                'color_name': line.variant.color_name,
+                'color_hex': line.variant.color_hex,
+                'size': line.size,
+            } if line.variant else None,
+            'size': line.size,
+            'quantity': line.quantity,
+            'total_price': str(priced.total),
+        })
+    return {
+        'items': items,
+        'total_price': str(quote.subtotal),
+        'total_quantity': quote.quantity,
+        'shipping_charge': str(quote.shipping_charge),
+        'tax': str(quote.tax),
+        'grand_total': str(quote.total),
+    }
+
+
+def merge(user, lines):
+    """Add validated ``lines`` to ``user``'s cart; quantities add up with existing items, capped at stock.
+
+    Returns the cart. Lines whose variant and size are both set (the unique
+    key has no NULLs) are upserted with one INSERT ... ON CONFLICT DO UPDATE;
+    the rest, where NULLs defeat the conflict target, are matched against
+    the already loaded items instead. A line capped to 0 (sold out since
+    validation, with the user's own line holding nothing, e.g. after the
+    sweep) is dropped and the user's line deleted rather than written with
+    quantity 0. Sized lines then take cart holds.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        existing = {
+            (item.product_id, item.color_variant_id, item.size): item
+            for item in CartItem.objects.filter(cart=cart).select_related('hold')
+        }
+        upserts, creates, updates, removed = [], [], [], []
+        for line in lines:
+            item = existing.get(line.key)
+            quantity = line.quantity + (item.quantity if item else 0)
+            if line.size_stock is not None:
+                quantity = min(quantity, holds.available_to(item, line.size_stock) if item
+                               else line.size_stock.available_quantity)
+            if quantity <= 0:
+                if item:
+                    removed.append(item.pk)
+                continue
+            if line.variant_id and line.size:
+                upserts.append(CartItem(
+                    cart=cart, product_id=line.product_id, color_variant_id=line.variant_id,
+                    size=line.size, quantity=quantity,
+                ))
+            elif item:
+                item.quantity = quantity
+                item.updated_at = now
+                updates.append(item)
+            else:
+                creates.append(CartItem(
+                    cart=cart, product_id=line.product_id, color_variant_id=line.variant_id,
+                    size=line.size, quantity=quantity,
+                ))
+        if upserts:
+            CartItem.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=['cart', 'product', 'color_variant', 'size'],
+                update_fields=['quantity', 'updated_at'],
+            )
+        if creates:
+            CartItem.objects.bulk_create(creates)
+        if updates:
+            CartItem.objects.bulk_update(updates, ['quantity', 'updated_at'])
+        if removed:
+            holds.release_items(removed)
+            CartItem.objects.filter(pk__in=removed).delete()
+        Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+        _hold_lines(cart, [line for line in lines if line.size_stock is not None])
+    return cart
+
+
+def _hold_lines(cart, lines):
+    """Hold stock for merged lines; a line that lost a race for stock shrinks to what is left."""
+    if not lines:
+        return
+    size_stocks = {line.key: line.size_stock for line in lines}
+    items = CartItem.objects.filter(
+        cart=cart, color_variant_id__in={line.variant_id for line in lines}
+    ).select_related('hold')
+    for item in items:
+        size_stock = size_stocks.get((item.product_id, item.color_variant_id, item.size))
+        if size_stock is None or holds.reserve(item, size_stock.pk, item.quantity):
+            continue
+        size_stock.refresh_from_db(fields=['quantity', 'held_quantity'])
+        item.quantity = holds.available_to(item, size_stock)
+        if item.quantity and holds.reserve(item, size_stock.pk, item.quantity):
+            item.save(update_fields=['quantity', 'updated_at'])
+        else:
+            holds.release_items([item.pk])
+            item.delete()
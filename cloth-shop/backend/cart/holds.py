@@ -0,0 +1,326 @@
+# cart/holds.py
+"""
+Soft stock reservations for cart lines.
+
+Adding a sized line to a cart holds that many units of its ``SizeStock``
+for ``CART_HOLD_TTL`` seconds; every change to the line refreshes the
+hold. The total held per SKU is kept on ``SizeStock.held_quantity`` so
+available-to-sell is ``quantity - held_quantity`` on a single row, and a
+hold is taken with one conditional UPDATE::
+
+    UPDATE size_stocks SET held_quantity = held_quantity + n
+    WHERE id = %s AND quantity >= held_quantity + n
+
+which either reserves atomically or touches no row, so concurrent shoppers
+can never hold more than is on hand.
+
+``CartHold`` rows record who holds what. Expired and orphaned holds are
+given back by ``sweep`` (``manage.py sweep_expired_holds``, run from cron),
+and opportunistically for a single SKU when a reservation would otherwise
+fail. At checkout ``sell`` turns a cart's holds into sold stock, and
+``restock`` gives it back when the order is cancelled or refunded.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Product, SizeStock
+from .models import CartHold
+
+
+def expiry():
+    return timezone.now() + timedelta(seconds=settings.CART_HOLD_TTL)
+
+
+def current_hold(item):
+    """The item's hold, using a ``select_related('hold')`` cache when present."""
+    try:
+        return item.hold
+    except CartHold.DoesNotExist:
+        return None
+
+
+def size_stocks(items):
+    """``{item.id: SizeStock}`` for the sized lines among ``items``, in one query."""
+    sized = [item for item in items if item.color_variant_id and item.size]
+    if not sized:
+        return {}
+    rows = {
+        (row.variant_id, row.size): row
+        for row in SizeStock.objects.filter(
+            variant_id__in={item.color_variant_id for item in sized},
+            size__in={item.size for item in sized},
+        )
+    }
+    return {
+        item.id: rows[(item.color_variant_id, item.size)]
+        for item in sized if (item.color_variant_id, item.size) in rows
+    }
+
+
+def available_to(item, size_stock):
+    """Units ``item`` could hold: free stock plus what it already holds."""
+    hold = current_hold(item)
+    own = hold.quantity if hold and hold.size_stock_id == size_stock.pk else 0
+    return max(size_stock.quantity - size_stock.held_quantity, 0) + own
+
+
+def _take(size_stock_id, delta):
+    return SizeStock.objects.filter(
+        pk=size_stock_id, quantity__gte=F('held_quantity') + delta
+    ).update(held_quantity=F('held_quantity') + delta)
+
+
+class Unavailable(Exception):
+    """Not enough free stock to take a hold."""
+
+
+def reserve(item, size_stock_id, quantity):
+    """Make ``item`` hold exactly ``quantity`` units of ``size_stock_id``.
+
+    Only the difference to the existing hold touches the counter. Returns
+    False, changing nothing, when not enough stock is available.
+    """
+    try:
+        _reserve(item, size_stock_id, quantity)
+    except Unavailable:
+        return False
+    return True
+
+
+def _reserve(item, size_stock_id, quantity):
+    hold = current_hold(item)
+    with transaction.atomic():
+        if hold and hold.size_stock_id != size_stock_id:
+            release([hold])
+            hold = None
+        delta = quantity - (hold.quantity if hold else 0)
+        if delta > 0 and not _take(size_stock_id, delta):
+            # Expired holds still count until swept; give this SKU's back and retry
+            keep = [hold.pk] if hold else []
+            if not sweep(size_stock_ids=[size_stock_id], exclude=keep) or not _take(size_stock_id, delta):
+                raise Unavailable(size_stock_id)
+        elif delta < 0:
+            SizeStock.objects.filter(pk=size_stock_id).update(held_quantity=F('held_quantity') + delta)
+
+        if hold:
+            hold.quantity = quantity
+            hold.expires_at = expiry()
+            hold.save(update_fields=['quantity', 'expires_at'])
+        else:
+            item.hold = CartHold.objects.create(
+                cart_item=item, size_stock_id=size_stock_id, quantity=quantity, expires_at=expiry()
+            )
+
+
+def reserve_many(lines):
+    """``reserve`` for several ``(item, size_stock_id, quantity)`` lines at once.
+
+    Every counter change goes in one conditional UPDATE and the holds in one
+    bulk write, however many lines there are. Only when that UPDATE falls
+    short are the lines reserved one by one, which sweeps expired holds and
+    finds the line that cannot be held. Returns that line's item, else None.
+    """
+    try:
+        _reserve_all(lines)
+    except Unavailable:
+        for item, size_stock_id, quantity in lines:
+            if not reserve(item, size_stock_id, quantity):
+                return item
+    return None
+
+
+def _counter_change(deltas):
+    """``deltas[pk]`` for the row being updated, as one CASE (0 for rows not in ``deltas``)."""
+    return Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()], default=0)
+
+
+def _units_by_product(items, stocks):
+    units = {}
+    for item in items:
+        if item.id in stocks and item.product_id:
+            units[item.product_id] = units.get(item.product_id, 0) + item.quantity
+    return units
+
+
+def _reserve_all(lines):
+    plan, moved, deltas = [], [], {}
+    for item, size_stock_id, quantity in lines:
+        hold = current_hold(item)
+        if hold and hold.size_stock_id != size_stock_id:
+            moved.append(hold)
+            hold = None
+        deltas[size_stock_id] = deltas.get(size_stock_id, 0) + quantity - (hold.quantity if hold else 0)
+        plan.append((item, size_stock_id, quantity, hold))
+    taking = {size_stock_id: delta for size_stock_id, delta in deltas.items() if delta > 0}
+    giving = {size_stock_id: delta for size_stock_id, delta in deltas.items() if delta < 0}
+
+    with transaction.atomic():
+        if moved:
+            release(moved)
+        if taking:
+            change = _counter_change(taking)
+            taken = SizeStock.objects.filter(
+                pk__in=taking, quantity__gte=F('held_quantity') + change
+            ).update(held_quantity=F('held_quantity') + change)
+            if taken != len(taking):
+                raise Unavailable(sorted(taking))
+        if giving:
+            SizeStock.objects.filter(pk__in=giving).update(held_quantity=F('held_quantity') + _counter_change(giving))
+
+        expires_at = expiry()
+        refreshed, created = [], []
+        for item, size_stock_id, quantity, hold in plan:
+            if hold:
+                hold.quantity = quantity
+                hold.expires_at = expires_at
+                refreshed.append(hold)
+            else:
+                item.hold = CartHold(
+                    cart_item=item, size_stock_id=size_stock_id, quantity=quantity, expires_at=expires_at
+                )
+                created.append(item.hold)
+        CartHold.objects.bulk_update(refreshed, ['quantity', 'expires_at'])
+        CartHold.objects.bulk_create(created)
+
+
+def sell(items):
+    """Turn the stock of ``items``, cart lines being ordered, into sold units.
+
+    Per SKU, the ``n`` units ordered leave ``quantity`` and the ``h`` these
+    lines hold leave ``held_quantity``, every SKU in one conditional UPDATE::
+
+        UPDATE size_stocks SET quantity = quantity - n, held_quantity = held_quantity - h
+        WHERE id IN (...) AND quantity - held_quantity >= n - h
+
+    and each product's ``total_stock`` drops by the units sold.
+
+    A hold that expired but was not swept yet still counts in
+    ``held_quantity``, so its units are still the line's. One that was swept
+    holds nothing, so its units must be free again: the line is re-reserved
+    or, if someone else took them, rejected. Call inside the order
+    transaction. Returns ``(item, available)`` for a line that can not be
+    covered, changing nothing, else None.
+    """
+    stocks = size_stocks(items)
+    ordered, own, stray = {}, {}, []
+    for item in items:
+        hold = current_hold(item)
+        size_stock = stocks.get(item.id)
+        if size_stock is not None:
+            ordered[size_stock.pk] = ordered.get(size_stock.pk, 0) + item.quantity
+        if hold and size_stock is not None and hold.size_stock_id == size_stock.pk:
+            own[hold.pk] = size_stock.pk
+        elif hold:
+            stray.append(hold)
+
+    with transaction.atomic():
+        release(stray)
+        if not ordered:
+            return None
+        # Locked and re-read: a sweep may have given a hold back since the cart was loaded
+        held = {}
+        live = CartHold.objects.select_for_update().filter(pk__in=own).values_list('pk', 'quantity')
+        for pk, quantity in live:
+            held[own[pk]] = held.get(own[pk], 0) + quantity
+        needed = {pk: ordered[pk] - held.get(pk, 0) for pk in ordered}
+        sold = SizeStock.objects.filter(
+            pk__in=ordered, quantity__gte=F('held_quantity') + _counter_change(needed)
+        ).update(
+            quantity=F('quantity') - _counter_change(ordered),
+            held_quantity=F('held_quantity') - _counter_change(held),
+        )
+        if sold == len(ordered):
+            CartHold.objects.filter(pk__in=own).delete()
+            units = _units_by_product(items, stocks)
+            Product.objects.filter(pk__in=units).update(total_stock=F('total_stock') - _counter_change(units))
+            return None
+        transaction.set_rollback(True)
+
+    # The line furthest short (or, if stock moved meanwhile, still the one to retry)
+    free = dict(
+        SizeStock.objects.filter(pk__in=ordered).values_list('pk', F('quantity') - F('held_quantity'))
+    )
+    pk, item = min(
+        ((stocks[item.id].pk, item) for item in items if item.id in stocks),
+        key=lambda pair: free.get(pair[0], 0) - needed[pair[0]],
+    )
+    return item, max(free.get(pk, 0), 0) + held.get(pk, 0)
+
+
+def restock(items):
+    """Put the units of ``items``, lines of orders that sold them, back into stock.
+
+    One UPDATE per table: ``SizeStock.quantity`` and ``Product.total_stock``
+    grow by the units returned. Lines whose SKU no longer exists are skipped.
+    Returns the number of units returned.
+    """
+    stocks = size_stocks(items)
+    returned = {}
+    for item in items:
+        if item.id in stocks:
+            returned[stocks[item.id].pk] = returned.get(stocks[item.id].pk, 0) + item.quantity
+    if not returned:
+        return 0
+    units = _units_by_product(items, stocks)
+    with transaction.atomic():
+        SizeStock.objects.filter(pk__in=returned).update(quantity=F('quantity') + _counter_change(returned))
+        Product.objects.filter(pk__in=units).update(total_stock=F('total_stock') + _counter_change(units))
+    return sum(returned.values())
+
+
+def release(holds):
+    """Give back ``holds`` (instances or a queryset): one counter UPDATE and one DELETE."""
+    holds = [(hold.pk, hold.size_stock_id, hold.quantity) for hold in holds]
+    if not holds:
+        return 0
+    totals = {}
+    for _, size_stock_id, quantity in holds:
+        totals[size_stock_id] = totals.get(size_stock_id, 0) + quantity
+    with transaction.atomic():
+        SizeStock.objects.filter(pk__in=totals).update(
+            held_quantity=F('held_quantity') - Case(
+                *[When(pk=size_stock_id, then=total) for size_stock_id, total in totals.items()],
+                default=0,
+            )
+        )
+        CartHold.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+    return len(holds)
+
+
+def release_items(item_ids):
+    """Release the holds of cart lines that are about to be deleted or ordered."""
+    return release(CartHold.objects.filter(cart_item_id__in=list(item_ids)))
+
+
+def sweep(batch_size=1000, size_stock_ids=None, exclude=()):
+    """Release expired and orphaned holds in batches. Returns the number released."""
+    released = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked lets several sweepers split the work (ignored on SQLite)
+            expired = CartHold.objects.select_for_update(skip_locked=True).filter(
+                Q(expires_at__lte=timezone.now()) | Q(cart_item__isnull=True)
+            ).exclude(pk__in=exclude)
+            if size_stock_ids is not None:
+                expired = expired.filter(size_stock_id__in=size_stock_ids)
+            batch = list(expired.order_by('expires_at').only('id', 'size_stock_id', 'quantity')[:batch_size])
+            if not batch:
+                return released
+            released += release(batch)
+
+
+def rebuild():
+    """Release expired holds, then reset every ``held_quantity`` from the holds left."""
+    sweep()
+    totals = (
+        CartHold.objects.filter(size_stock=OuterRef('pk')).order_by()
+        .values('size_stock').annotate(total=Sum('quantity')).values('total')
+    )
+    return SizeStock.objects.exclude(
+        held_quantity=Coalesce(Subquery(totals), 0)
+    ).update(held_quantity=Coalesce(Subquery(totals), 0))
@@ -0,0 +1,28 @@
+# cart/management/commands/sweep_expired_holds.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart import holds
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart holds back to available stock (see CART_HOLD_TTL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Keep running, sweeping every SECONDS, instead of sweeping once')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Also reset every SizeStock.held_quantity from the remaining holds')
+
+    def handle(self, *args, **options):
+        while True:
+            released = holds.sweep(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Released {released} expired holds'))
+            if options['rebuild']:
+                changed = holds.rebuild()
+                self.stdout.write(self.style.SUCCESS(f'Rebuilt held_quantity on {changed} size stocks'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_alter_cartitem_unique_together_and_more'),
+        ('products', '0022_sizestock_held_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cart_item', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hold', to='cart.cartitem')),
+                ('size_stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='products.sizestock')),
+            ],
+            options={
+                'db_table': 'cart_holds',
+                'indexes': [models.Index(fields=['expires_at'], name='cart_holds_expires_idx'), models.Index(fields=['size_stock', 'expires_at'], name='cart_holds_stock_expires_idx')],
+            },
+        ),
+    ]
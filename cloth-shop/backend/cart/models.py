@@ -1,8 +1,9 @@
 # cart/models.py
 from django.db import models
 from users.models import CustomUser
-from products.models import Product, ProductVariant, ColorVariant
+from products.models import Product, ProductVariant, ColorVariant, SizeStock
 from django.core.validators import MinValueValidator
+from . import pricing
 
 class Cart(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='cart')
@@ -16,7 +17,7 @@ class Cart(models.Model):
         return f"Cart - {self.user.email}"
 
     def get_total_price(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return pricing.quote_items(self.items.all()).subtotal
 
     def get_total_quantity(self):
         return sum(item.quantity for item in self.items.all())
@@ -43,11 +44,30 @@ class CartItem(models.Model):
         color_info = f" ({self.color_variant.color_name})" if self.color_variant else ""
         return f"{self.cart.user.email} - {self.product.name}{color_info}{size_info}"
 
+    def get_unit_price(self):
+        line = pricing.snapshot_line(self)
+        return pricing.unit_price(line.base_price, line.discount_price, line.price_adjustment)
+
     def get_total_price(self):
-        price = self.product.discount_price or self.product.base_price
-        # Use color variant price adjustment if available
-        if self.color_variant:
-            price += self.color_variant.price_adjustment
-        elif self.variant:
-            price += self.variant.price_adjustment
-        return price * self.quantity
+        return self.get_unit_price() * self.quantity
+
+class CartHold(models.Model):
+    """Stock reserved for a cart line until ``expires_at`` (see cart.holds)."""
+    # SET_NULL so deleting a line never skips the counter release; orphaned
+    # holds are released by sweep_expired_holds
+    cart_item = models.OneToOneField(CartItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='hold')
+    size_stock = models.ForeignKey(SizeStock, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'cart_holds'
+        indexes = [
+            models.Index(fields=['expires_at'], name='cart_holds_expires_idx'),
+            models.Index(fields=['size_stock', 'expires_at'], name='cart_holds_stock_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.quantity} x {self.size_stock} until {self.expires_at}"
+
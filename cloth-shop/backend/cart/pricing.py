@@ -0,0 +1,110 @@
+# cart/pricing.py
+"""
+Checkout pricing: line prices, subtotal, shipping, tax and total.
+
+Pure Python and ``Decimal`` only, no queries: callers take a snapshot of
+already loaded cart lines (``snapshot``) and ``price`` computes the whole
+quote in one pass. The cart, order creation and payments all price through
+here, so the cart a customer sees and the order they are charged for can
+not drift apart.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_EVEN, Decimal
+
+CENTS = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+FREE_SHIPPING_THRESHOLD = Decimal('1000')
+SHIPPING_CHARGE = Decimal('100.00')
+TAX_RATE = Decimal('0.05')
+
+
+@dataclass(frozen=True)
+class Line:
+    """What pricing needs to know about one cart line."""
+    key: object
+    base_price: Decimal
+    discount_price: Decimal = None
+    price_adjustment: Decimal = ZERO
+    quantity: int = 1
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    key: object
+    unit_price: Decimal
+    quantity: int
+    total: Decimal
+
+
+@dataclass(frozen=True)
+class Quote:
+    lines: tuple
+    subtotal: Decimal
+    shipping_charge: Decimal
+    tax: Decimal
+    total: Decimal
+
+    @property
+    def quantity(self):
+        return sum(line.quantity for line in self.lines)
+
+    def line(self, key):
+        for line in self.lines:
+            if line.key == key:
+                return line
+        raise KeyError(key)
+
+
+def unit_price(base_price, discount_price=None, price_adjustment=ZERO):
+    """Sale price (discount if set, else base) plus the variant's adjustment."""
+    return (discount_price or base_price) + (price_adjustment or ZERO)
+
+
+def shipping_for(subtotal):
+    return ZERO if subtotal >= FREE_SHIPPING_THRESHOLD else SHIPPING_CHARGE
+
+
+def tax_for(subtotal):
+    # Half-even, as round() on Decimal did before pricing moved here
+    return (subtotal * TAX_RATE).quantize(CENTS, rounding=ROUND_HALF_EVEN)
+
+
+def price(lines):
+    """Quote for ``lines`` (an iterable of ``Line``)."""
+    priced = []
+    subtotal = ZERO
+    for line in lines:
+        unit = unit_price(line.base_price, line.discount_price, line.price_adjustment)
+        total = unit * line.quantity
+        subtotal += total
+        priced.append(PricedLine(line.key, unit, line.quantity, total))
+    shipping_charge = shipping_for(subtotal)
+    tax = tax_for(subtotal)
+    return Quote(tuple(priced), subtotal, shipping_charge, tax, subtotal + shipping_charge + tax)
+
+
+def snapshot_line(item):
+    """``Line`` for a cart item whose product and variant are already loaded."""
+    variant = item.color_variant or item.variant
+    return Line(
+        key=item.pk,
+        base_price=item.product.base_price,
+        discount_price=item.product.discount_price,
+        price_adjustment=variant.price_adjustment if variant else ZERO,
+        quantity=item.quantity,
+    )
+
+
+def snapshot(items):
+    return [snapshot_line(item) for item in items]
+
+
+def quote_items(items):
+    """Quote for cart items (load them with ``product``, ``color_variant`` and ``variant``)."""
+    return price(snapshot(items))
+
+
+def to_minor_units(amount):
+    """Amount in the currency's smallest unit, as payment gateways expect."""
+    return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_EVEN))
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from .models import Cart, CartItem
 from products.serializers import ProductListSerializer
 from products.models import ProductVariant, ColorVariant
+from . import pricing
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductListSerializer()
@@ -44,13 +45,30 @@ class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
     total_quantity = serializers.SerializerMethodField()
+    shipping_charge = serializers.SerializerMethodField()
+    tax = serializers.SerializerMethodField()
+    grand_total = serializers.SerializerMethodField()
     
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total_price', 'total_quantity', 'updated_at']
+        fields = ['id', 'items', 'total_price', 'total_quantity', 'shipping_charge', 'tax', 'grand_total', 'updated_at']
+    
+    def to_representation(self, obj):
+        # One pricing pass for every total below (same engine as create_order)
+        self._quote = pricing.quote_items(obj.items.all())
+        return super().to_representation(obj)
     
     def get_total_price(self, obj):
-        return str(obj.get_total_price())
+        return str(self._quote.subtotal)
     
     def get_total_quantity(self, obj):
-        return obj.get_total_quantity()
+        return self._quote.quantity
+    
+    def get_shipping_charge(self, obj):
+        return str(self._quote.shipping_charge)
+    
+    def get_tax(self, obj):
+        return str(self._quote.tax)
+    
+    def get_grand_total(self, obj):
+        return str(self._quote.total)
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import random
+import time
+import timeit
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart import guest, holds, pricing
+from cart.models import Cart, CartHold, CartItem
+from orders.models import Order
+from products.models import Category, ColorVariant, Product, SizeStock
+from users.models import CustomUser, UserAddress
+
+
+def random_price(rng, low=50, high=3000):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def random_lines(rng, count=None):
+    """A random cart snapshot; roughly half the lines are discounted or carry an adjustment."""
+    lines = []
+    for key in range(count or rng.randint(1, 12)):
+        base_price = random_price(rng)
+        lines.append(pricing.Line(
+            key=key,
+            base_price=base_price,
+            discount_price=random_price(rng, 10, int(base_price)) if rng.random() < 0.5 else None,
+            price_adjustment=Decimal(rng.randint(-2000, 5000)) / 100 if rng.random() < 0.5 else pricing.ZERO,
+            quantity=rng.randint(1, 5),
+        ))
+    return lines
+
+
+class PricingPropertyTests(SimpleTestCase):
+    """Invariants of the pricing engine over seeded random carts."""
+
+    TRIALS = 500
+
+    def setUp(self):
+        self.rng = random.Random(40)
+
+    def test_quote_totals_add_up(self):
+        for _ in range(self.TRIALS):
+            quote = pricing.price(random_lines(self.rng))
+            self.assertEqual(quote.subtotal, sum(line.total for line in quote.lines))
+            self.assertEqual(quote.total, quote.subtotal + quote.shipping_charge + quote.tax)
+            expected_shipping = pricing.ZERO if quote.subtotal >= pricing.FREE_SHIPPING_THRESHOLD else pricing.SHIPPING_CHARGE
+            self.assertEqual(quote.shipping_charge, expected_shipping)
+            self.assertEqual(quote.tax, quote.tax.quantize(pricing.CENTS))
+            self.assertLessEqual(abs(quote.tax - quote.subtotal * pricing.TAX_RATE), Decimal('0.005'))
+
+    def test_line_prices(self):
+        for _ in range(self.TRIALS):
+            lines = random_lines(self.rng)
+            for line, priced in zip(lines, pricing.price(lines).lines):
+                sale_price = line.discount_price or line.base_price
+                self.assertEqual(priced.unit_price, sale_price + line.price_adjustment)
+                self.assertEqual(priced.total, priced.unit_price * line.quantity)
+
+    def test_quote_ignores_line_order_and_splits(self):
+        for _ in range(self.TRIALS):
+            lines = random_lines(self.rng)
+            quote = pricing.price(lines)
+            shuffled = lines[:]
+            self.rng.shuffle(shuffled)
+            self.assertEqual(pricing.price(shuffled).total, quote.total)
+            # The same goods as one line per unit cost the same
+            units = [pricing.Line(line.key, line.base_price, line.discount_price, line.price_adjustment, 1)
+                     for line in lines for _ in range(line.quantity)]
+            self.assertEqual(pricing.price(units).total, quote.total)
+
+    def test_minor_units_are_exact(self):
+        for _ in range(self.TRIALS):
+            total = pricing.price(random_lines(self.rng)).total
+            self.assertEqual(Decimal(pricing.to_minor_units(total)) / 100, total)
+
+    @unittest.skipUnless(settings.BENCHMARK_LATENCY, 'wall-clock budgets need BENCHMARK_LATENCY=1')
+    def test_pricing_a_large_cart_is_fast(self):
+        # Micro-benchmark: a 100-line cart must price in well under a
+        # millisecond per line on any machine; the budget is deliberately loose.
+        lines = random_lines(self.rng, count=100)
+        runs = 200
+        best = min(timeit.repeat(lambda: pricing.price(lines), number=runs, repeat=5)) / runs
+        self.assertLess(best * 1000, 5, f'pricing 100 lines took {best * 1000:.3f} ms')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CartOrderTotalsTests(TestCase):
+    """The cart a customer sees and the order created from it always agree."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(41)
+        category = Category.objects.create(name='Hoodies', slug='hoodies', category_type='hoodies')
+        cls.skus = []
+        for index in range(8):
+            base_price = random_price(rng, 200, 2500)
+            product = Product.objects.create(
+                category=category, name=f'Hoodie {index}', slug=f'hoodie-{index}', description='',
+                base_price=base_price,
+                discount_price=random_price(rng, 100, int(base_price)) if index % 2 else None,
+            )
+            variant = ColorVariant.objects.create(
+                product=product, color_name='Black', sku=f'HD-{index}',
+                price_adjustment=Decimal(rng.randint(-5000, 5000)) / 100,
+            )
+            for size in ('M', 'L'):
+                SizeStock.objects.create(variant=variant, size=size, quantity=100)
+                cls.skus.append((product, variant, size))
+        cls.user = CustomUser.objects.create_user(email='shopper@example.com', password='x')
+        cls.address = UserAddress.objects.create(
+            user=cls.user, name='Shopper', phone='9999999999', address_line1='1 Main St',
+            city='Kochi', state='Kerala', pincode='682001',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_order_totals_match_cart(self):
+        rng = random.Random(42)
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        for _ in range(15):
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product=product, color_variant=variant, size=size, quantity=rng.randint(1, 4))
+                for product, variant, size in rng.sample(self.skus, rng.randint(1, 6))
+            ])
+            shown = self.client.get('/api/cart/').json()
+
+            response = self.client.post(
+                '/api/orders/create/', {'address_id': self.address.id, 'payment_method': 'cod'}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+            order = Order.objects.get(pk=response.json()['order']['id'])
+            self.assertEqual(str(order.subtotal), shown['total_price'])
+            self.assertEqual(str(order.shipping_charge), shown['shipping_charge'])
+            self.assertEqual(str(order.tax), shown['tax'])
+            self.assertEqual(str(order.total), shown['grand_total'])
+            self.assertEqual(
+                sorted(str(item.total) for item in order.items.all()),
+                sorted(item['total_price'] for item in shown['items']),
+            )
+            self.assertFalse(cart.items.exists())
+
+
+def flip(text, at):
+    """``text`` with the character at ``at`` changed."""
+    return text[:at] + ('A' if text[at] != 'A' else 'B') + text[at + 1:]
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class GuestCartTests(TestCase):
+    """Signed guest cart tokens and their merge into a user's cart at login."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Hoodies', slug='hoodies', category_type='hoodies')
+        cls.hoodie = Product.objects.create(
+            category=category, name='Hoodie', slug='hoodie', description='', base_price=Decimal('1000.00'),
+        )
+        cls.variant = ColorVariant.objects.create(product=cls.hoodie, color_name='Black', sku='HD-BLK')
+        cls.stock = SizeStock.objects.create(variant=cls.variant, size='M', quantity=5)
+        cls.cap = Product.objects.create(
+            category=category, name='Cap', slug='cap', description='', base_price=Decimal('300.00'),
+        )
+        cls.user = CustomUser.objects.create_user(email='guest@example.com', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def hoodie_line(self, quantity):
+        return {'product_id': self.hoodie.pk, 'variant_id': self.variant.pk, 'size': 'M', 'quantity': quantity}
+
+    def guest_cart(self, token=None, items=()):
+        return self.client.post('/api/cart/guest/', {'token': token, 'items': list(items)}, format='json')
+
+    def test_token_round_trips_the_lines(self):
+        first = self.guest_cart(items=[self.hoodie_line(2), {'product_id': self.cap.pk, 'quantity': 1}]).json()
+        again = self.guest_cart(token=first['token']).json()
+
+        self.assertEqual(again['items'], first['items'])
+        self.assertEqual(again['grand_total'], first['grand_total'])
+        self.assertEqual(again['total_quantity'], 3)
+        self.assertEqual(
+            [line.key for line in guest.loads(first['token'])],
+            [(self.hoodie.pk, self.variant.pk, 'M'), (self.cap.pk, None, None)],
+        )
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_changes_replace_or_remove_lines_by_key(self):
+        token = self.guest_cart(items=[self.hoodie_line(1), {'product_id': self.cap.pk}]).json()['token']
+
+        cart = self.guest_cart(token, [self.hoodie_line(3), {'product_id': self.cap.pk, 'quantity': 0}]).json()
+
+        self.assertEqual([(item['id'], item['quantity']) for item in cart['items']], [(f'{self.hoodie.pk}:{self.variant.pk}:M', 3)])
+
+    def test_tampered_tokens_are_rejected(self):
+        token = self.guest_cart(items=[self.hoodie_line(1)]).json()['token']
+        forged = signing.dumps([[self.hoodie.pk, self.variant.pk, 'M', 99]], salt='another.salt', compress=True)
+
+        for bad in (flip(token, -1), flip(token, 3), forged):
+            with self.subTest(token=bad):
+                response = self.guest_cart(token=bad)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Invalid or expired guest cart')
+
+    def test_expired_tokens_are_rejected(self):
+        token = guest.dumps(guest.parse_lines([self.hoodie_line(1)]))
+        later = time.time() + settings.GUEST_CART_MAX_AGE + 60
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertEqual(self.guest_cart(token=token).status_code, 400)
+
+    def test_quantities_are_lowered_to_free_stock(self):
+        SizeStock.objects.filter(pk=self.stock.pk).update(held_quantity=2)
+
+        cart = self.guest_cart(items=[self.hoodie_line(9)]).json()
+
+        self.assertEqual(cart['items'][0]['quantity'], 3)
+        self.assertEqual(cart['errors'], [{'id': f'{self.hoodie.pk}:{self.variant.pk}:M', 'error': 'Only 3 items available'}])
+        self.assertEqual(guest.loads(cart['token'])[0].quantity, 3)
+
+    def test_merge_adds_to_the_users_cart_and_holds_stock(self):
+        token = self.guest_cart(items=[self.hoodie_line(2), {'product_id': self.cap.pk, 'quantity': 1}]).json()['token']
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.cap, quantity=2)
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/cart/add/', self.hoodie_line(2), format='json')
+
+        response = self.client.post('/api/cart/merge/', {'token': token}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['merged'], 2)
+        quantities = dict(cart.items.values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.hoodie.pk: 4, self.cap.pk: 3})
+        self.assertEqual(CartHold.objects.get().quantity, 4)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.held_quantity, 4)
+        self.assertEqual(response.cookies[guest.COOKIE_NAME].value, '')
+
+    def test_merge_caps_at_stock_other_carts_do_not_hold(self):
+        token = self.guest_cart(items=[self.hoodie_line(4)]).json()['token']
+        SizeStock.objects.filter(pk=self.stock.pk).update(held_quantity=3)
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post('/api/cart/merge/', {'token': token}, format='json')
+
+        self.assertEqual(response.json()['errors'][0]['error'], 'Only 2 items available')
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 2)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.held_quantity, 5)
+
+    def test_merge_drops_lines_that_sold_out_since_validation(self):
+        cart = Cart.objects.create(user=self.user)
+        # the user's line lost its hold to the sweep, so it holds nothing
+        item = CartItem.objects.create(cart=cart, product=self.hoodie, color_variant=self.variant, size='M', quantity=1)
+        lines, _ = guest.validate(guest.parse_lines([self.hoodie_line(2)]))
+        SizeStock.objects.filter(pk=self.stock.pk).update(held_quantity=5)
+        lines[0].size_stock.refresh_from_db()
+
+        guest.merge(self.user, lines)
+
+        self.assertFalse(CartItem.objects.filter(pk=item.pk).exists())
+        self.assertFalse(CartItem.objects.filter(quantity=0).exists())
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.held_quantity, 5)
+
+    def test_merge_rejects_a_tampered_token(self):
+        token = self.guest_cart(items=[self.hoodie_line(1)]).json()['token']
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post('/api/cart/merge/', {'token': token[:-2]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BatchCartUpdateTests(TestCase):
+    """``PATCH /api/cart/items/`` applies every change or none."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tees', slug='tees', category_type='tshirts')
+        cls.stocks = []
+        for index in range(3):
+            product = Product.objects.create(
+                category=category, name=f'Tee {index}', slug=f'tee-{index}', description='',
+                base_price=Decimal('400.00'),
+            )
+            variant = ColorVariant.objects.create(product=product, color_name='White', sku=f'TEE-{index}')
+            cls.stocks.append(SizeStock.objects.create(variant=variant, size='M', quantity=5))
+        cls.user = CustomUser.objects.create_user(email='batch@example.com', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.items = []
+        for stock in self.stocks:
+            response = self.client.post('/api/cart/add/', {
+                'product_id': stock.variant.product_id, 'variant_id': stock.variant_id, 'size': 'M', 'quantity': 1,
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.items = list(CartItem.objects.filter(cart__user=self.user).order_by('id'))
+
+    def patch(self, *changes):
+        return self.client.patch(
+            '/api/cart/items/', {'items': [{'item_id': i, 'quantity': q} for i, q in changes]}, format='json'
+        )
+
+    def state(self):
+        """Line quantities, hold quantities and held stock counters."""
+        return (
+            dict(CartItem.objects.values_list('id', 'quantity')),
+            dict(CartHold.objects.values_list('cart_item_id', 'quantity')),
+            [SizeStock.objects.get(pk=stock.pk).held_quantity for stock in self.stocks],
+        )
+
+    def test_changes_and_removals_apply_together(self):
+        first, second, third = self.items
+
+        response = self.patch((first.id, 3), (second.id, 0), (third.id, 2))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.state(), ({first.id: 3, third.id: 2}, {first.id: 3, third.id: 2}, [3, 0, 2]))
+        self.assertEqual(response.json()['total_quantity'], 5)
+
+    def test_one_line_short_of_stock_rolls_back_the_batch(self):
+        first, second, third = self.items
+        before = self.state()
+
+        response = self.patch((first.id, 0), (second.id, 4), (third.id, 6))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['items'], [{'item_id': third.id, 'error': 'Only 5 items available'}])
+        self.assertEqual(self.state(), before)
+
+    def test_unknown_or_foreign_items_reject_the_batch(self):
+        other = CustomUser.objects.create_user(email='other@example.com', password='x')
+        foreign = CartItem.objects.create(cart=Cart.objects.create(user=other), product=self.stocks[0].variant.product)
+        before = self.state()
+
+        response = self.patch((self.items[0].id, 2), (foreign.id, 1), (999999, 1))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['item_ids'], sorted([foreign.id, 999999]))
+        self.assertEqual(self.state(), before)
+
+    def test_malformed_batches_are_rejected(self):
+        for body in ({'items': []}, {'items': [{'quantity': 1}]}, {'items': [{'item_id': self.items[0].id, 'quantity': -1}]}):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.patch('/api/cart/items/', body, format='json').status_code, 400)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as one:
+            self.patch((self.items[0].id, 2))
+        with CaptureQueriesContext(connection) as three:
+            self.patch(*[(item.id, 3) for item in self.items])
+        self.assertEqual(len(three), len(one))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CartHoldTests(TestCase):
+    """Cart holds: reserve, release, the expiry sweep and checkout."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Pants', slug='pants', category_type='pants')
+        cls.product = Product.objects.create(
+            category=category, name='Chino', slug='chino', description='', base_price=Decimal('1200.00'),
+        )
+        cls.variant = ColorVariant.objects.create(product=cls.product, color_name='Khaki', sku='CH-KHK')
+        cls.admin = CustomUser.objects.create_superuser(email='stock@example.com', password='x')
+        cls.shoppers = [CustomUser.objects.create_user(email=f'shopper{i}@example.com', password='x') for i in range(2)]
+        cls.addresses = {
+            shopper.pk: UserAddress.objects.create(
+                user=shopper, name='Shopper', phone='9999999999', address_line1='1 Main St',
+                city='Kochi', state='Kerala', pincode='682001',
+            )
+            for shopper in cls.shoppers
+        }
+
+    def setUp(self):
+        self.stock = SizeStock.objects.create(variant=self.variant, size='32', quantity=5)
+        Product.objects.filter(pk=self.product.pk).update(total_stock=5)
+        self.client = APIClient()
+
+    def add(self, shopper, quantity):
+        self.client.force_authenticate(shopper)
+        return self.client.post('/api/cart/add/', {
+            'product_id': self.product.pk, 'variant_id': self.variant.pk, 'size': '32', 'quantity': quantity,
+        }, format='json')
+
+    def counters(self):
+        self.stock.refresh_from_db()
+        return self.stock.quantity, self.stock.held_quantity
+
+    def total_stock(self):
+        return Product.objects.values_list('total_stock', flat=True).get(pk=self.product.pk)
+
+    def expire_holds(self):
+        CartHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def checkout(self, shopper, payment_method='cod'):
+        self.client.force_authenticate(shopper)
+        return self.client.post('/api/orders/create/', {
+            'address_id': self.addresses[shopper.pk].pk, 'payment_method': payment_method,
+        }, format='json')
+
+    def test_reserve_holds_stock_until_it_runs_out(self):
+        self.assertEqual(self.add(self.shoppers[0], 3).status_code, 201)
+        self.assertEqual(self.counters(), (5, 3))
+
+        response = self.add(self.shoppers[1], 3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Only 2 items available')
+        self.assertEqual(self.counters(), (5, 3))
+        self.assertEqual(self.add(self.shoppers[1], 2).status_code, 201)
+        self.assertEqual(self.counters(), (5, 5))
+
+    def test_changing_and_removing_lines_adjusts_the_hold(self):
+        self.add(self.shoppers[0], 2)
+        item = CartItem.objects.get()
+
+        self.client.put(f'/api/cart/update/{item.pk}/', {'quantity': 4}, format='json')
+        self.assertEqual(self.counters(), (5, 4))
+        self.client.put(f'/api/cart/update/{item.pk}/', {'quantity': 1}, format='json')
+        self.assertEqual(self.counters(), (5, 1))
+        self.client.delete(f'/api/cart/remove/{item.pk}/')
+        self.assertEqual(self.counters(), (5, 0))
+        self.assertFalse(CartHold.objects.exists())
+
+    def test_sweep_releases_only_expired_and_orphaned_holds(self):
+        self.add(self.shoppers[0], 2)
+        self.add(self.shoppers[1], 1)
+        CartHold.objects.filter(cart_item__cart__user=self.shoppers[0]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        orphan = CartHold.objects.create(
+            size_stock=self.stock, quantity=1, expires_at=timezone.now() + timedelta(hours=1)
+        )
+        SizeStock.objects.filter(pk=self.stock.pk).update(held_quantity=4)
+
+        out = StringIO()
+        call_command('sweep_expired_holds', stdout=out)
+
+        self.assertIn('Released 2 expired holds', out.getvalue())
+        self.assertEqual(self.counters(), (5, 1))
+        self.assertEqual(list(CartHold.objects.values_list('cart_item__cart__user', flat=True)), [self.shoppers[1].pk])
+        self.assertFalse(CartHold.objects.filter(pk=orphan.pk).exists())
+
+    def test_expired_holds_are_taken_back_when_stock_runs_out(self):
+        self.add(self.shoppers[0], 4)
+        self.expire_holds()
+
+        self.assertEqual(self.add(self.shoppers[1], 3).status_code, 201)
+
+        self.assertEqual(self.counters(), (5, 3))
+        self.assertEqual(CartHold.objects.get().cart_item.cart.user, self.shoppers[1])
+
+    def test_rebuild_resets_counters_from_live_holds(self):
+        self.add(self.shoppers[0], 2)
+        SizeStock.objects.filter(pk=self.stock.pk).update(held_quantity=9)
+
+        call_command('sweep_expired_holds', '--rebuild', stdout=StringIO())
+
+        self.assertEqual(self.counters(), (5, 2))
+
+    def test_checkout_turns_the_hold_into_sold_stock(self):
+        self.add(self.shoppers[0], 3)
+        self.add(self.shoppers[1], 2)
+
+        response = self.checkout(self.shoppers[0])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counters(), (2, 2))
+        self.assertEqual(self.total_stock(), 2)
+        self.assertEqual(CartHold.objects.count(), 1)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.shoppers[0]).exists())
+
+    def test_cancelling_restocks_the_order_once(self):
+        self.add(self.shoppers[0], 3)
+        order_id = self.checkout(self.shoppers[0]).json()['order']['id']
+        self.assertEqual((self.counters(), self.total_stock()), ((2, 0), 2))
+
+        response = self.client.post(f'/api/orders/{order_id}/cancel/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.counters(), self.total_stock()), ((5, 0), 5))
+        self.assertFalse(Order.objects.get(pk=order_id).stock_sold)
+        self.assertEqual(self.client.post(f'/api/orders/{order_id}/cancel/').status_code, 400)
+        self.assertEqual(self.counters(), (5, 0))
+
+    def test_bulk_cancel_and_refund_restock_every_order(self):
+        orders = []
+        for shopper, quantity in zip(self.shoppers, (2, 1)):
+            self.add(shopper, quantity)
+            orders.append(self.checkout(shopper).json()['order']['id'])
+        Order.objects.filter(pk=orders[1]).update(status='delivered')
+        self.assertEqual(self.counters(), (2, 0))
+        self.client.force_authenticate(self.admin)
+
+        self.client.post('/api/orders/bulk-status/', {'order_ids': orders, 'status': 'cancelled'}, format='json')
+        self.assertEqual(self.counters(), (4, 0))
+        self.client.post('/api/orders/bulk-status/', {'order_ids': orders, 'status': 'refunded'}, format='json')
+        self.assertEqual((self.counters(), self.total_stock()), ((5, 0), 5))
+
+    def test_orders_placed_before_stock_was_sold_are_not_restocked(self):
+        self.add(self.shoppers[0], 3)
+        order_id = self.checkout(self.shoppers[0]).json()['order']['id']
+        Order.objects.filter(pk=order_id).update(stock_sold=False)
+
+        self.client.post(f'/api/orders/{order_id}/cancel/')
+
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_unpaid_prepaid_orders_are_cancelled_and_restocked(self):
+        self.add(self.shoppers[0], 2)
+        card = self.checkout(self.shoppers[0], 'card').json()['order']['id']
+        self.add(self.shoppers[0], 1)
+        cod = self.checkout(self.shoppers[0]).json()['order']['id']
+        Order.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.counters(), (2, 0))
+
+        out = StringIO()
+        call_command('cancel_unpaid_orders', stdout=out)
+
+        self.assertIn('Cancelled 1 unpaid orders', out.getvalue())
+        self.assertEqual(Order.objects.get(pk=card).status, 'cancelled')
+        self.assertEqual(Order.objects.get(pk=cod).status, 'pending')
+        self.assertEqual((self.counters(), self.total_stock()), ((4, 0), 4))
+
+    def test_checkout_with_an_expired_hold_still_covered(self):
+        self.add(self.shoppers[0], 3)
+        self.expire_holds()
+
+        self.assertEqual(self.checkout(self.shoppers[0]).status_code, 201)
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_checkout_re_reserves_a_swept_hold(self):
+        self.add(self.shoppers[0], 3)
+        self.expire_holds()
+        holds.sweep()
+
+        self.assertEqual(self.checkout(self.shoppers[0]).status_code, 201)
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_checkout_is_rejected_when_a_swept_hold_was_taken(self):
+        self.add(self.shoppers[0], 3)
+        self.expire_holds()
+        self.add(self.shoppers[1], 4)  # sweeps the expired hold to fit
+
+        response = self.checkout(self.shoppers[0])
+
+        self.assertEqual(response.status_code, 409)
+        item = CartItem.objects.get(cart__user=self.shoppers[0])
+        self.assertEqual(response.json()['items'], [{'item_id': item.pk, 'error': 'Only 1 items available'}])
+        self.assertEqual(self.counters(), (5, 4))
+        self.assertFalse(Order.objects.exists())
+
+    def test_stock_edits_keep_the_held_counter(self):
+        self.add(self.shoppers[0], 2)
+        stale = SizeStock.objects.get(pk=self.stock.pk)
+        self.add(self.shoppers[1], 1)
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.patch(f'/api/products/size-stocks/{self.stock.pk}/', {'quantity': 8}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters(), (8, 3))
+
+        self.client.force_login(self.admin)
+        response = self.client.post(f'/admin/products/sizestock/{stale.pk}/change/', {
+            'variant': self.variant.pk, 'size': '32', 'quantity': 10, 'held_quantity': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.counters(), (10, 3))
@@ -6,6 +6,9 @@ urlpatterns = [
     path('', views.get_cart, name='get-cart'),
     path('add/', views.add_to_cart, name='add-to-cart'),
     path('update/<int:item_id>/', views.update_cart_item, name='update-cart'),
+    path('items/', views.update_cart_items, name='update-cart-items'),
     path('remove/<int:item_id>/', views.remove_from_cart, name='remove-cart'),
     path('clear/', views.clear_cart, name='clear-cart'),
+    path('guest/', views.guest_cart, name='guest-cart'),
+    path('merge/', views.merge_cart, name='merge-cart'),
 ]
\ No newline at end of file
@@ -1,20 +1,45 @@
 # cart/views.py
+import logging
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from . import guest, holds
 from .models import Cart, CartItem
 from products.models import Product, ProductVariant, ColorVariant, SizeStock
 from .serializers import CartSerializer, CartItemSerializer
 
+logger = logging.getLogger(__name__)
+
+# Everything CartSerializer walks, so a cart serializes in a fixed number of
+# queries instead of several per line
+CART_PREFETCH = (
+    'items__product__category',
+    'items__product__images',
+    'items__product__color_variants__variant_images',
+    'items__product__color_variants__size_stocks',
+    'items__color_variant__variant_images',
+    'items__variant__color',
+)
+
+def _cart_data(cart):
+    """CartSerializer output for ``cart``, reloaded with CART_PREFETCH."""
+    return CartSerializer(Cart.objects.prefetch_related(*CART_PREFETCH).get(pk=cart.pk)).data
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_cart(request):
     try:
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart, created = Cart.objects.prefetch_related(*CART_PREFETCH).get_or_create(user=request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     except Exception as e:
+        logger.exception("Error loading cart")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -44,36 +69,40 @@ def add_to_cart(request):
             except ColorVariant.DoesNotExist:
                 return Response({'error': 'Color variant not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Validate size stock if size is provided
-            if size:
-                try:
-                    size_stock = SizeStock.objects.get(variant=color_variant, size=size)
-                    if size_stock.quantity < quantity:
-                        return Response({'error': f'Only {size_stock.quantity} items available'}, status=status.HTTP_400_BAD_REQUEST)
-                except SizeStock.DoesNotExist:
-                    return Response({'error': f'Size {size} not available for this variant'}, status=status.HTTP_400_BAD_REQUEST)
+        # Validate size stock if size is provided; it is held below
+        size_stock = None
+        if color_variant and size:
+            try:
+                size_stock = SizeStock.objects.get(variant=color_variant, size=size)
+            except SizeStock.DoesNotExist:
+                return Response({'error': f'Size {size} not available for this variant'}, status=status.HTTP_400_BAD_REQUEST)
         
         cart, _ = Cart.objects.get_or_create(user=request.user)
         
-        # Look for existing cart item with same product, color variant, and size
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            color_variant=color_variant,
-            size=size,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        with transaction.atomic():
+            # Look for existing cart item with same product, color variant, and size
+            cart_item, created = CartItem.objects.select_related('hold').get_or_create(
+                cart=cart,
+                product=product,
+                color_variant=color_variant,
+                size=size,
+                defaults={'quantity': quantity}
+            )
+            
+            if not created:
+                cart_item.quantity += quantity
+                cart_item.save()
+            
+            if size_stock and not holds.reserve(cart_item, size_stock.id, cart_item.quantity):
+                size_stock.refresh_from_db(fields=['quantity', 'held_quantity'])
+                transaction.set_rollback(True)
+                available = holds.available_to(cart_item, size_stock) - (0 if created else cart_item.quantity - quantity)
+                return Response({'error': f'Only {max(available, 0)} items available'}, status=status.HTTP_400_BAD_REQUEST)
         
         cart.save()
-        serializer = CartSerializer(cart)
-        return Response({'message': 'Added to cart', 'cart': serializer.data}, status=status.HTTP_201_CREATED)
+        return Response({'message': 'Added to cart', 'cart': _cart_data(cart)}, status=status.HTTP_201_CREATED)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error adding to cart")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -82,29 +111,117 @@ def add_to_cart(request):
 def update_cart_item(request, item_id):
     try:
         cart = Cart.objects.get(user=request.user)
-        item = CartItem.objects.get(id=item_id, cart=cart)
+        item = CartItem.objects.select_related('hold').get(id=item_id, cart=cart)
         
         quantity = int(request.data.get('quantity', 1))
-        if quantity <= 0:
-            item.delete()
-        else:
-            item.quantity = quantity
-            item.save()
+        with transaction.atomic():
+            if quantity <= 0:
+                holds.release_items([item.id])
+                item.delete()
+            else:
+                size_stock = holds.size_stocks([item]).get(item.id)
+                if size_stock and not holds.reserve(item, size_stock.id, quantity):
+                    size_stock.refresh_from_db(fields=['quantity', 'held_quantity'])
+                    available = holds.available_to(item, size_stock)
+                    return Response({'error': f'Only {available} items available'}, status=status.HTTP_400_BAD_REQUEST)
+                item.quantity = quantity
+                item.save()
         
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(_cart_data(cart))
     except Exception as e:
+        logger.exception("Error updating cart item")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+MAX_BATCH_OPERATIONS = 100
+
+def _parse_operations(data):
+    """``{item_id: quantity}`` from a list of ``{item_id, quantity}``; later entries win."""
+    if isinstance(data, dict):
+        data = data.get('items')
+    if not isinstance(data, list) or not data:
+        raise ValueError('Expected a list of {item_id, quantity} operations')
+    if len(data) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f'At most {MAX_BATCH_OPERATIONS} operations per request')
+    operations = {}
+    for operation in data:
+        if not isinstance(operation, dict) or 'item_id' not in operation:
+            raise ValueError('Each operation needs an item_id')
+        quantity = int(operation.get('quantity', 1))
+        if quantity < 0:
+            raise ValueError('quantity must not be negative')
+        operations[int(operation['item_id'])] = quantity
+    return operations
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def update_cart_items(request):
+    """Apply several quantity changes at once (quantity 0 deletes the line).
+
+    All-or-nothing: unknown items, or a line whose cart hold cannot grow to
+    the new quantity, reject the whole batch. One query loads the items, one
+    the size stocks, and the writes are a single DELETE plus one bulk UPDATE
+    in one transaction, alongside the cart holds (``holds.reserve_many``).
+    """
+    try:
+        operations = _parse_operations(request.data)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        items = {
+            item.id: item
+            for item in CartItem.objects.filter(cart__user=request.user, id__in=operations).select_related('hold')
+        }
+        missing = sorted(set(operations) - set(items))
+        if missing:
+            return Response({'error': 'Cart items not found', 'item_ids': missing}, status=status.HTTP_404_NOT_FOUND)
+
+        updated = [item for item in items.values() if operations[item.id] > 0]
+        size_stocks = holds.size_stocks(updated)
+
+        now = timezone.now()
+        with transaction.atomic():
+            deleted = [item_id for item_id, quantity in operations.items() if quantity == 0]
+            if deleted:
+                holds.release_items(deleted)
+                CartItem.objects.filter(id__in=deleted).delete()
+            short = holds.reserve_many([
+                (item, size_stocks[item.id].id, operations[item.id]) for item in updated if item.id in size_stocks
+            ])
+            if short:
+                size_stock = size_stocks[short.id]
+                size_stock.refresh_from_db(fields=['quantity', 'held_quantity'])
+                available = holds.available_to(short, size_stock)
+                transaction.set_rollback(True)
+                return Response({
+                    'error': 'Insufficient stock',
+                    'items': [{'item_id': short.id, 'error': f'Only {available} items available'}],
+                }, status=status.HTTP_400_BAD_REQUEST)
+            for item in updated:
+                item.quantity = operations[item.id]
+                item.updated_at = now
+            if updated:
+                CartItem.objects.bulk_update(updated, ['quantity', 'updated_at'])
+            Cart.objects.filter(user=request.user).update(updated_at=now)
+
+        cart = Cart.objects.prefetch_related(*CART_PREFETCH).get(user=request.user)
+        return Response(CartSerializer(cart).data)
+    except Exception as e:
+        logger.exception("Error updating cart items")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_from_cart(request, item_id):
     try:
-        CartItem.objects.get(id=item_id, cart__user=request.user).delete()
+        item = CartItem.objects.get(id=item_id, cart__user=request.user)
+        with transaction.atomic():
+            holds.release_items([item.id])
+            item.delete()
         cart = Cart.objects.get(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(_cart_data(cart))
     except Exception as e:
+        logger.exception("Error removing cart item")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -112,8 +229,63 @@ def remove_from_cart(request, item_id):
 def clear_cart(request):
     try:
         cart = Cart.objects.get(user=request.user)
-        cart.items.all().delete()
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        with transaction.atomic():
+            holds.release_items(cart.items.values_list('id', flat=True))
+            cart.items.all().delete()
+        return Response(_cart_data(cart))
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        logger.exception("Error clearing cart")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _guest_token(request):
+    return request.data.get('token') or request.COOKIES.get(guest.COOKIE_NAME)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def guest_cart(request):
+    """Validate and price a guest cart; no database writes.
+
+    Body: ``{"token": "...", "items": [{"product_id", "variant_id", "size", "quantity"}]}``.
+    ``items`` replace the token's lines with the same product/variant/size
+    (quantity 0 removes one). Responds with the cart, a fresh ``token``
+    (also set as a cookie) and ``errors`` for lines that were dropped or
+    lowered to the available stock.
+    """
+    try:
+        lines = guest.combine(guest.loads(_guest_token(request)), guest.parse_lines(request.data.get('items', [])))
+    except signing.BadSignature:
+        return Response({'error': 'Invalid or expired guest cart'}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    lines, errors = guest.validate(lines)
+    token = guest.dumps(lines)
+    response = Response({**guest.serialize(lines), 'token': token, 'errors': errors})
+    response.set_cookie(
+        guest.COOKIE_NAME, token, max_age=settings.GUEST_CART_MAX_AGE,
+        httponly=True, samesite='Lax', secure=not settings.DEBUG,
+    )
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def merge_cart(request):
+    """Fold a guest cart (``token`` or cookie, or raw ``items``) into the user's cart after login."""
+    try:
+        lines = guest.loads(_guest_token(request)) + guest.parse_lines(request.data.get('items', []))
+    except signing.BadSignature:
+        return Response({'error': 'Invalid or expired guest cart'}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        lines, errors = guest.validate(guest.combine([], lines))
+        cart = guest.merge(request.user, lines)
+    except Exception as e:
+        logger.exception("Error merging guest cart")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    response = Response({'cart': _cart_data(cart), 'merged': len(lines), 'errors': errors})
+    response.delete_cookie(guest.COOKIE_NAME, samesite='Lax')
+    return response
@@ -0,0 +1,198 @@
+# orders/events.py
+"""
+Order tracking events (``GET /api/orders/events/``).
+
+Every ``OrderTracking`` row is pushed to its customer's open server-sent
+event streams, so clients stop polling ``track_order`` and the order detail.
+A stream is a coroutine waiting on an ``asyncio.Queue``: an idle connection
+holds no thread and no database connection, and one ASGI worker
+(``backend.asgi``) can keep thousands of them open.
+
+Streams are fed one of two ways:
+
+* In process (the default). Code that adds tracking rows calls
+  ``tracking_created``, which publishes them once the transaction commits.
+  This only reaches streams held by the same process, so it suits a single
+  ASGI process serving both the API and the streams.
+* By polling, when ``ORDER_EVENTS_POLL_INTERVAL`` is set. One task per
+  process reads tracking rows newer than the last it saw and publishes them,
+  whichever process wrote them: one query per interval, not per connection.
+
+Event ids are tracking ids. A reconnecting ``EventSource`` sends
+``Last-Event-ID`` and is first sent what it missed, from the database. A
+client too slow to drain its queue is disconnected and catches up the same
+way.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import OrderTracking
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+REPLAY_LIMIT = 100
+POLL_BATCH_SIZE = 1000
+
+# Queued in place of events for a client that fell too far behind
+_DISCONNECT = object()
+
+
+def _events(tracking):
+    """``(user id, payload)`` for each row of the ``tracking`` queryset."""
+    rows = tracking.values(
+        'pk', 'order_id', 'order__order_number', 'order__user_id', 'status', 'description', 'created_at'
+    )
+    return [
+        (row['order__user_id'], {
+            'id': row['pk'],
+            'order_id': row['order_id'],
+            'order_number': row['order__order_number'],
+            'status': row['status'],
+            'description': row['description'],
+            'created_at': row['created_at'],
+        })
+        for row in rows
+    ]
+
+
+def _missed(user_id, last_id):
+    return [payload for _, payload in _events(
+        OrderTracking.objects.filter(order__user_id=user_id, pk__gt=last_id).order_by('pk')[:REPLAY_LIMIT]
+    )]
+
+
+def _latest_id():
+    return OrderTracking.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def _after(last_id):
+    return _events(OrderTracking.objects.filter(pk__gt=last_id).order_by('pk')[:POLL_BATCH_SIZE])
+
+
+class Broker:
+    """
+    Per-process fan-out from tracking rows to the queues of open streams.
+
+    Subscriptions and delivery run on the event loop; ``publish`` may be
+    called from any thread (sync views run in a thread pool under ASGI).
+    """
+
+    def __init__(self):
+        self._queues = defaultdict(set)  # user id -> queues of that user's streams
+        self._loop = None
+        self._poller = None
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._queues[user_id].add(queue)
+        interval = settings.ORDER_EVENTS_POLL_INTERVAL
+        if interval and (self._poller is None or self._poller.done()):
+            self._poller = loop.create_task(self._poll(interval))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._queues.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._queues[user_id]
+
+    def has_subscribers(self):
+        return bool(self._queues)
+
+    def publish(self, events):
+        """Deliver ``(user id, payload)`` pairs to the streams of those users."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(events)
+        else:
+            loop.call_soon_threadsafe(self._deliver, events)
+
+    def _deliver(self, events):
+        for user_id, payload in events:
+            for queue in self._queues.get(user_id, ()):
+                try:
+                    queue.put_nowait(payload)
+                except asyncio.QueueFull:
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(_DISCONNECT)
+
+    async def _poll(self, interval):
+        last_id = await sync_to_async(_latest_id)()
+        # Stops with the last stream; the next subscriber starts a new poller
+        while self._queues:
+            await asyncio.sleep(interval)
+            try:
+                events = await sync_to_async(_after)(last_id)
+            except Exception:
+                logger.exception("Polling for order tracking events failed")
+                continue
+            if events:
+                last_id = events[-1][1]['id']
+                self._deliver(events)
+
+
+broker = Broker()
+
+
+def _publish(tracking_ids):
+    # Nothing to do unless this process holds streams
+    if broker.has_subscribers():
+        broker.publish(_events(OrderTracking.objects.filter(pk__in=tracking_ids).order_by('pk')))
+
+
+def tracking_created(entries):
+    """Publish new ``OrderTracking`` rows once the current transaction commits."""
+    if settings.ORDER_EVENTS_POLL_INTERVAL:
+        # The poller picks them up; publishing here too would send them twice
+        return
+    tracking_ids = [entry.pk for entry in entries]
+    if tracking_ids:
+        transaction.on_commit(lambda: _publish(tracking_ids))
+
+
+def _format(payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f'id: {payload["id"]}\nevent: tracking\ndata: {data}\n\n'
+
+
+async def stream(user_id, last_event_id=None):
+    """Server-sent events for ``user_id``'s orders, starting after ``last_event_id``."""
+    queue = broker.subscribe(user_id)
+    try:
+        replayed = set()
+        if last_event_id is not None:
+            # Subscribed first, so anything added meanwhile is queued too
+            for payload in await sync_to_async(_missed)(user_id, last_event_id):
+                replayed.add(payload['id'])
+                yield _format(payload)
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=settings.ORDER_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            if payload is _DISCONNECT:
+                return
+            if payload['id'] not in replayed:
+                yield _format(payload)
+    finally:
+        broker.unsubscribe(user_id, queue)
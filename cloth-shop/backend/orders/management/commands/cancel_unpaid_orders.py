@@ -0,0 +1,21 @@
+# orders/management/commands/cancel_unpaid_orders.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders import state
+
+
+class Command(BaseCommand):
+    help = 'Cancel prepaid orders left unpaid for longer than UNPAID_ORDER_TTL and restock their units'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, metavar='SECONDS',
+                            help='Override UNPAID_ORDER_TTL for this run')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        older_than = timedelta(seconds=options['older_than'] or settings.UNPAID_ORDER_TTL)
+        cancelled = state.cancel_unpaid(older_than, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Cancelled {cancelled} unpaid orders'))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_purchases(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    PurchasedProduct = apps.get_model('orders', 'PurchasedProduct')
+    rows = (
+        OrderItem.objects.filter(order__status='delivered', order__user__isnull=False, product__isnull=False)
+        .order_by().values('order__user_id', 'product_id')
+        .annotate(first_delivered_at=Min('order__updated_at'))
+    )
+    PurchasedProduct.objects.bulk_create(
+        [
+            PurchasedProduct(
+                user_id=row['order__user_id'], product_id=row['product_id'],
+                first_delivered_at=row['first_delivered_at'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_orderitem_color_variant_orderitem_size'),
+        ('products', '0021_relatedproduct'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchasedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_delivered_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchasers', to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchased_products', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'purchased_products',
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='unique_purchased_product')],
+            },
+        ),
+        migrations.RunPython(backfill_purchases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:17
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+def first_image(images):
+    images = list(images)
+    image = next((image for image in images if image.is_primary), None) or next(iter(images), None)
+    return image.image if image else ''
+
+
+def backfill_snapshots(apps, schema_editor):
+    # Same fields as orders.snapshots.line_snapshot, from the catalog as it is
+    # now. A snapshot only depends on the line's product/variant/colour, so
+    # this is one UPDATE per distinct combination rather than per line; lines
+    # whose product is gone keep empty snapshots.
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    Product = apps.get_model('products', 'Product')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    ColorVariant = apps.get_model('products', 'ColorVariant')
+
+    combinations = list(
+        OrderItem.objects.filter(product__isnull=False).order_by()
+        .values_list('product_id', 'variant_id', 'color_variant_id').distinct()
+    )
+    products = Product.objects.prefetch_related('images').in_bulk({row[0] for row in combinations})
+    variants = ProductVariant.objects.select_related('color').in_bulk({row[1] for row in combinations if row[1]})
+    color_variants = ColorVariant.objects.prefetch_related('variant_images').in_bulk(
+        {row[2] for row in combinations if row[2]}
+    )
+
+    for product_id, variant_id, color_variant_id in combinations:
+        product = products[product_id]
+        variant = variants.get(variant_id)
+        color_variant = color_variants.get(color_variant_id)
+        fields = {'product_name': product.name, 'sku': '', 'color_name': '', 'color_hex': '', 'image_url': ''}
+        if color_variant:
+            fields.update(sku=color_variant.sku, color_name=color_variant.color_name,
+                          color_hex=color_variant.color_hex,
+                          image_url=first_image(color_variant.variant_images.all()))
+        elif variant:
+            fields.update(sku=variant.sku, color_name=variant.color.name if variant.color else '',
+                          size=Coalesce('size', Value(variant.size)))
+        if not fields['image_url']:
+            fields['image_url'] = first_image(product.images.all())
+        OrderItem.objects.filter(
+            product_id=product_id, variant_id=variant_id, color_variant_id=color_variant_id
+        ).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_purchased_product'),
+        ('products', '0022_sizestock_held_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='color_hex',
+            field=models.CharField(blank=True, default='', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='color_name',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='image_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_item_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordertracking',
+            index=models.Index(fields=['order', '-created_at'], name='order_tracking_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_tracking_timeline_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_sold',
+            field=models.BooleanField(default=False),
+        ),
+    ]
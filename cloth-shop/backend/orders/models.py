@@ -2,7 +2,18 @@
 from django.db import models
 from users.models import CustomUser, UserAddress
 from products.models import Product, ProductVariant, ColorVariant
-from django.utils import timezone
+from . import numbering
+
+class OrderQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Everything OrderListSerializer walks, in a fixed number of queries per page."""
+        # Items render from their own snapshot columns, so no catalog joins
+        return self.select_related('user', 'shipping_address').prefetch_related('items')
+
+    def for_detail(self):
+        """As ``for_listing``, plus the tracking entries OrderDetailSerializer adds."""
+        return self.for_listing().prefetch_related('tracking')
+
 
 class Order(models.Model):
     STATUS_CHOICES = (
@@ -50,10 +61,15 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
+    # Units taken from SizeStock at checkout (cart.holds.sell); cleared when
+    # a cancel or refund puts them back, so they are returned only once
+    stock_sold = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         db_table = 'orders'
         verbose_name_plural = 'Orders'
@@ -69,11 +85,7 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import random
-            import string
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-            self.order_number = f"ORD{timestamp}{random_str}"
+            self.order_number = numbering.next_order_number()
         super().save(*args, **kwargs)
 
 class OrderItem(models.Model):
@@ -88,11 +100,19 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     total = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Snapshot taken at checkout (orders.snapshots); order history renders
+    # from these, never from the live catalog
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    sku = models.CharField(max_length=100, blank=True, default='')
+    color_name = models.CharField(max_length=50, blank=True, default='')
+    color_hex = models.CharField(max_length=7, blank=True, default='')
+    image_url = models.URLField(max_length=500, blank=True, default='')
+
     class Meta:
         db_table = 'order_items'
 
     def __str__(self):
-        return f"{self.order.order_number} - {self.product.name}"
+        return f"{self.order.order_number} - {self.product_name}"
 
     def save(self, *args, **kwargs):
         self.total = self.price * self.quantity
@@ -117,6 +137,28 @@ class OrderTracking(models.Model):
     class Meta:
         db_table = 'order_tracking'
         ordering = ['-created_at']
+        indexes = [
+            # An order's timeline, newest first (track_order, order detail)
+            models.Index(fields=['order', '-created_at'], name='order_tracking_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order.order_number} - {self.status}"
+
+class PurchasedProduct(models.Model):
+    """
+    One row per (user, product) the user has received in a delivered order.
+    Maintained by ``orders.purchases``; backs review eligibility checks.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='purchased_products')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchasers')
+    first_delivered_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'purchased_products'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_purchased_product'),
+        ]
 
     def __str__(self):
-        return f"{self.order.order_number} - {self.status}"
\ No newline at end of file
+        return f"{self.user_id} - {self.product_id}"
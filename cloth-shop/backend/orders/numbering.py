@@ -0,0 +1,97 @@
+# orders/numbering.py
+"""
+Order numbers.
+
+Snowflake-style ids: milliseconds since ``EPOCH`` (41 bits), a worker id
+(10 bits) and a per-millisecond sequence (12 bits). Within one worker ids are
+strictly increasing and never repeat, up to 4096 per millisecond; workers
+with different ids can never collide. Because the numbers grow with time,
+new rows always land at the right-hand end of the ``order_number`` index.
+
+The worker id is ``ORDER_NUMBER_WORKER_ID`` when set, and that is the way to
+run it in production: give every process that creates orders its own id.
+Without it the id falls back to the process id, which is unique on one host.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+PREFIX = 'ORD'
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+class SnowflakeGenerator:
+
+    def __init__(self, worker_id, clock=_now_ms):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'worker_id must be between 0 and {MAX_WORKER_ID}')
+        self.worker_id = worker_id
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now = self.clock()
+            if now < self._last_ms:
+                # Clock stepped back (NTP): keep counting from the last
+                # millisecond issued rather than risk a repeat
+                now = self._last_ms
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # 4096 ids this millisecond; wait for the next one
+                    while now <= self._last_ms:
+                        now = self.clock()
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (
+                (now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)
+                | self.worker_id << SEQUENCE_BITS
+                | self._sequence
+            )
+
+
+def format_number(snowflake_id):
+    # Zero padded, so string order matches numeric order
+    return f'{PREFIX}{snowflake_id:019d}'
+
+
+def _worker_id():
+    worker_id = settings.ORDER_NUMBER_WORKER_ID
+    return worker_id if worker_id is not None else os.getpid() & MAX_WORKER_ID
+
+
+_generator = None
+_generator_pid = None
+_generator_lock = threading.Lock()
+
+
+def _get_generator():
+    # Per process: a generator inherited across fork() would hand the child
+    # the parent's ids
+    global _generator, _generator_pid
+    pid = os.getpid()
+    if _generator_pid != pid:
+        with _generator_lock:
+            if _generator_pid != pid:
+                _generator = SnowflakeGenerator(_worker_id())
+                _generator_pid = pid
+    return _generator
+
+
+def next_order_number():
+    return format_number(_get_generator().next_id())
@@ -0,0 +1,105 @@
+# orders/purchases.py
+"""
+Purchase eligibility: which products has a user received?
+
+``PurchasedProduct`` holds one row per (user, product) from delivered
+orders, so "may this user review X" is one EXISTS on a unique index instead
+of a join over orders and order items, and list pages test a whole page of
+products with one ``IN`` query. The rows are read directly rather than
+cached, so a delivery or refund counts at once in every process.
+
+Rows are added when an order reaches ``delivered`` and removed again when
+the order is cancelled or refunded and no other delivered order contains
+the product (see ``orders.signals``).
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import OrderItem, PurchasedProduct
+
+REVOKING_STATUSES = ('cancelled', 'refunded')
+
+
+def has_purchased(user, product_id):
+    if not user or not user.is_authenticated:
+        return False
+    return PurchasedProduct.objects.filter(user_id=user.pk, product_id=product_id).exists()
+
+
+def purchased_among(user, product_ids):
+    """The subset of ``product_ids`` that ``user`` has received."""
+    if not user or not user.is_authenticated:
+        return frozenset()
+    return frozenset(
+        PurchasedProduct.objects.filter(user_id=user.pk, product_id__in=list(product_ids))
+        .values_list('product_id', flat=True)
+    )
+
+
+def record_delivered(orders):
+    """Add the products of delivered ``orders`` (order instances) to their users' purchases."""
+    orders = [order for order in orders if order.user_id]
+    if not orders:
+        return
+    users = {order.pk: order.user_id for order in orders}
+    delivered_at = timezone.now()
+    pairs = {
+        (users[order_id], product_id)
+        for order_id, product_id in OrderItem.objects.filter(
+            order_id__in=users, product_id__isnull=False
+        ).values_list('order_id', 'product_id')
+    }
+    PurchasedProduct.objects.bulk_create(
+        [PurchasedProduct(user_id=user_id, product_id=product_id, first_delivered_at=delivered_at)
+         for user_id, product_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def revoke_undelivered(orders):
+    """Drop purchases of ``orders`` that no longer have any delivered order behind them."""
+    orders = [order for order in orders if order.user_id]
+    if not orders:
+        return
+    users = {order.pk: order.user_id for order in orders}
+    pairs = set(
+        OrderItem.objects.filter(order_id__in=users, product_id__isnull=False)
+        .values_list('order__user_id', 'product_id')
+    )
+    still_delivered = set(
+        OrderItem.objects.filter(
+            order__status='delivered',
+            order__user_id__in=set(users.values()),
+            product_id__in={product_id for _, product_id in pairs},
+        ).values_list('order__user_id', 'product_id')
+    )
+    stale = pairs - still_delivered
+    if stale:
+        PurchasedProduct.objects.filter(
+            reduce(or_, (Q(user_id=user_id, product_id=product_id) for user_id, product_id in stale))
+        ).delete()
+
+
+def rebuild(user_ids=None):
+    """Recreate purchases from delivered orders (optionally for some users). Returns the row count."""
+    items = OrderItem.objects.filter(
+        order__status='delivered', order__user__isnull=False, product__isnull=False
+    )
+    purchases = PurchasedProduct.objects.all()
+    if user_ids is not None:
+        items = items.filter(order__user_id__in=user_ids)
+        purchases = purchases.filter(user_id__in=user_ids)
+    rows = [
+        PurchasedProduct(user_id=row['order__user_id'], product_id=row['product_id'],
+                         first_delivered_at=row['first_delivered_at'])
+        for row in items.order_by().values('order__user_id', 'product_id')
+        .annotate(first_delivered_at=Min('order__updated_at'))
+    ]
+    with transaction.atomic():
+        purchases.delete()
+        PurchasedProduct.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
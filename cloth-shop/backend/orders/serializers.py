@@ -5,53 +5,32 @@ from products.serializers import ProductListSerializer
 from users.serializers import UserAddressSerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product_name = serializers.CharField(source='product.name', read_only=True)
-    product_image = serializers.SerializerMethodField()
+    """Renders from the line's checkout snapshot only (orders.snapshots); no joins."""
+    product_image = serializers.CharField(source='image_url', read_only=True)
     variant_details = serializers.SerializerMethodField()
     color_variant_details = serializers.SerializerMethodField()
     
     class Meta:
         model = OrderItem
         fields = ['id', 'product_name', 'product_image', 'variant', 'variant_details', 'color_variant', 'color_variant_details', 'size', 'quantity', 'price', 'total']
-    
-    def get_product_image(self, obj):
-        if not obj.product:
-            return None
-            
-        # 1. Check if color_variant has an image
-        if obj.color_variant:
-            img = obj.color_variant.variant_images.filter(is_primary=True).first()
-            if not img:
-                img = obj.color_variant.variant_images.first()
-            if img:
-                return img.image
-                
-        # 2. Check if legacy variant has an image (usually they don't have separate images, but for completeness)
-        
-        # 3. Fallback to product images
-        img = obj.product.images.filter(is_primary=True).first()
-        if not img:
-            img = obj.product.images.first()
-        if img:
-            return img.image
-            
-        return None
 
     def get_variant_details(self, obj):
-        if obj.variant:
+        if obj.variant_id:
             return {
-                'size': obj.variant.size,
-                'color': obj.variant.color.name if obj.variant.color else None,
-                'sku': obj.variant.sku
+                'size': obj.size,
+                'color': obj.color_name or None,
+                'sku': obj.sku
             }
         return None
 
     def get_color_variant_details(self, obj):
-        if obj.color_variant:
+        # Colour variant lines are the ones with a hex in their snapshot, so
+        # the details survive the colour variant being deleted
+        if obj.color_hex:
             return {
-                'color_name': obj.color_variant.color_name,
-                'color_hex': obj.color_variant.color_hex,
-                'sku': obj.color_variant.sku
+                'color_name': obj.color_name,
+                'color_hex': obj.color_hex,
+                'sku': obj.sku
             }
         return None
 
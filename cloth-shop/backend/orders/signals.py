@@ -0,0 +1,32 @@
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+
+from . import purchases
+from .models import Order
+
+
+def _loaded_status(order):
+    # Read from __dict__: a deferred status (``only()``) would cost a query
+    return order.__dict__.get('status')
+
+
+@receiver(post_init, sender=Order)
+def remember_status(sender, instance, **kwargs):
+    instance._saved_status = _loaded_status(instance)
+
+
+@receiver(post_save, sender=Order)
+def sync_purchased_products(sender, instance, created=False, raw=False, **kwargs):
+    """Keep PurchasedProduct in step with orders reaching or leaving ``delivered``.
+
+    Only a save that changes the status does anything; re-saving a delivered
+    order (a note, the payment fields) leaves purchases alone.
+    """
+    previous = None if created else instance._saved_status
+    status = instance._saved_status = _loaded_status(instance)
+    if raw or status is None or status == previous:
+        return
+    if status == 'delivered':
+        purchases.record_delivered([instance])
+    elif status in purchases.REVOKING_STATUSES:
+        purchases.revoke_undelivered([instance])
@@ -0,0 +1,37 @@
+# orders/snapshots.py
+"""
+Order line snapshots.
+
+At checkout each ``OrderItem`` copies what order history and invoices show
+about its product (name, sku, colour, size, image) into its own row, so past
+orders render from ``order_items`` alone: no joins, no image lookups, and
+unaffected by later catalog edits or deleted products.
+"""
+
+
+def primary_image(images):
+    """URL of the primary image in ``images`` (a prefetched manager), else the first one."""
+    images = images.all()
+    image = next((image for image in images if image.is_primary), None) or next(iter(images), None)
+    return image.image if image else ''
+
+
+def line_snapshot(product, variant=None, color_variant=None, size=None):
+    """Snapshot fields for an ``OrderItem``; load images with ``prefetch_related`` first."""
+    snapshot = {
+        'product_name': product.name,
+        'sku': '',
+        'color_name': '',
+        'color_hex': '',
+        'size': size,
+        'image_url': '',
+    }
+    if color_variant:
+        snapshot.update(sku=color_variant.sku, color_name=color_variant.color_name,
+                        color_hex=color_variant.color_hex, image_url=primary_image(color_variant.variant_images))
+    elif variant:
+        snapshot.update(sku=variant.sku, color_name=variant.color.name if variant.color else '',
+                        size=size or variant.size)
+    if not snapshot['image_url']:
+        snapshot['image_url'] = primary_image(product.images)
+    return snapshot
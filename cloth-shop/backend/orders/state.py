@@ -0,0 +1,140 @@
+# orders/state.py
+"""
+Order state machine.
+
+``TRANSITIONS`` lists which statuses an order may move to from each status.
+Every status change made through here is one guarded
+``UPDATE ... WHERE id IN (...) AND status IN (<allowed sources>)`` plus one
+``bulk_create`` of tracking rows, whether it moves one order (a customer
+cancelling) or hundreds (an admin shipping a day's orders). The tracking rows
+are published to open event streams (``orders.events``).
+
+Queryset updates skip ``post_save``, so purchase eligibility
+(``orders.purchases``) is synced here explicitly for orders reaching or
+leaving ``delivered``. Orders reaching ``cancelled`` or ``refunded`` put the
+units they sold at checkout back into stock (``cart.holds.restock``), in the
+same transaction as the status change.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from cart import holds
+from . import events, purchases
+from .models import Order, OrderItem, OrderTracking
+
+TRANSITIONS = {
+    'pending': ('confirmed', 'processing', 'cancelled'),
+    'confirmed': ('processing', 'shipped', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': ('refunded',),
+    'cancelled': (),
+    'refunded': (),
+}
+
+# Tracking entry (OrderTracking.status, description) added on reaching a status
+TRACKING = {
+    'confirmed': ('order_processing', 'Order has been confirmed'),
+    'processing': ('order_processing', 'Order is being processed'),
+    'shipped': ('order_shipped', 'Order has been shipped'),
+    'delivered': ('delivered', 'Order has been delivered'),
+    'cancelled': ('cancelled', 'Order has been cancelled'),
+    'refunded': ('cancelled', 'Order has been refunded'),
+}
+
+# Statuses that return an order's sold units to stock
+RESTOCKING_STATUSES = ('cancelled', 'refunded')
+
+# Per-order outcomes reported by bulk_transition
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid_transition'
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def sources_for(target):
+    """Statuses an order may move to ``target`` from."""
+    return [source for source, targets in TRANSITIONS.items() if target in targets]
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def bulk_transition(order_ids, target, description=None, tracking_status=None):
+    """
+    Move the orders ``order_ids`` to ``target`` where the transition is allowed.
+
+    ``description`` and ``tracking_status`` override the tracking entry's
+    defaults from ``TRACKING``. Returns ``{order_id: (outcome, previous status or None)}``; orders that
+    can not make the move are left untouched.
+    """
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f'Unknown order status: {target}')
+    order_ids = set(order_ids)
+    sources = sources_for(target)
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=order_ids).values_list('pk', 'status')
+        )
+        movable = [pk for pk, status in current.items() if status in sources]
+        if movable:
+            Order.objects.filter(pk__in=movable, status__in=sources).update(status=target, updated_at=now)
+            default_status, default_description = TRACKING[target]
+            events.tracking_created(OrderTracking.objects.bulk_create([
+                OrderTracking(order_id=pk, status=tracking_status or default_status,
+                              description=description or default_description)
+                for pk in movable
+            ]))
+            if target == 'delivered':
+                purchases.record_delivered(Order.objects.filter(pk__in=movable).only('pk', 'user_id'))
+            elif target in purchases.REVOKING_STATUSES:
+                purchases.revoke_undelivered(Order.objects.filter(pk__in=movable).only('pk', 'user_id'))
+            if target in RESTOCKING_STATUSES:
+                sold = Order.objects.filter(pk__in=movable, stock_sold=True)
+                holds.restock(list(OrderItem.objects.filter(order__in=sold)))
+                sold.update(stock_sold=False)
+
+    outcomes = {}
+    for pk in order_ids:
+        if pk not in current:
+            outcomes[pk] = (NOT_FOUND, None)
+        elif current[pk] in sources:
+            outcomes[pk] = (UPDATED, current[pk])
+        else:
+            outcomes[pk] = (INVALID, current[pk])
+    return outcomes
+
+
+def transition(order, target, description=None):
+    """Move one order to ``target``; raises ``InvalidTransition`` if it may not."""
+    outcome, previous = bulk_transition([order.pk], target, description)[order.pk]
+    if outcome != UPDATED:
+        raise InvalidTransition(f'Cannot move order {order.order_number} from {previous} to {target}')
+    order.status = target
+    return order
+
+
+def cancel_unpaid(older_than, batch_size=500):
+    """
+    Cancel prepaid orders still unpaid ``older_than`` after they were
+    placed, returning their units to stock. Returns the number cancelled.
+
+    A payment that lands afterwards is recorded and refunded
+    (``payments.handlers.record_paid``).
+    """
+    stale = (
+        Order.objects.filter(status='pending', created_at__lt=timezone.now() - older_than)
+        .exclude(payment_method='cod').exclude(payment_status='completed')
+    )
+    cancelled = 0
+    while True:
+        batch = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return cancelled
+        outcomes = bulk_transition(batch, 'cancelled', 'Order cancelled: payment was not received')
+        cancelled += sum(outcome == UPDATED for outcome, _ in outcomes.values())
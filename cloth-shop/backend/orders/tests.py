@@ -1,3 +1,536 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from orders import events, numbering, purchases, snapshots, state
+from orders.models import Order, OrderItem, OrderTracking, PurchasedProduct
+from products.models import Category, ColorOption, ColorVariant, Product, ProductImage, ProductVariant, VariantImage
+from users.models import CustomUser, UserAddress
+
+
+def create_order(user, status='pending', product=None):
+    order = Order.objects.create(
+        user=user, shipping_name='Customer', shipping_phone='9999999999', shipping_email=user.email,
+        subtotal=Decimal('500.00'), total=Decimal('605.00'), status=status,
+    )
+    if product:
+        OrderItem.objects.create(order=order, product=product, size='M', quantity=1, price=product.base_price)
+    return order
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class OrderStateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='customer@example.com', password='x')
+        cls.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='x')
+        category = Category.objects.create(name='Shoes', slug='shoes', category_type='shoes')
+        cls.product = Product.objects.create(
+            category=category, name='Runner', slug='runner', description='', base_price=Decimal('500.00'),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_transitions_are_validated(self):
+        self.assertTrue(state.can_transition('pending', 'cancelled'))
+        self.assertTrue(state.can_transition('shipped', 'delivered'))
+        self.assertFalse(state.can_transition('shipped', 'cancelled'))
+        self.assertFalse(state.can_transition('cancelled', 'pending'))
+        self.assertEqual(sorted(state.sources_for('shipped')), ['confirmed', 'processing'])
+
+    def test_bulk_transition_reports_each_order(self):
+        ready = [create_order(self.user, 'processing') for _ in range(3)]
+        delivered = create_order(self.user, 'delivered')
+
+        with self.assertNumQueries(5):  # savepoint, lock/read, update, tracking insert, release
+            outcomes = state.bulk_transition([*(o.pk for o in ready), delivered.pk, 999999], 'shipped')
+
+        for order in ready:
+            self.assertEqual(outcomes[order.pk], (state.UPDATED, 'processing'))
+        self.assertEqual(outcomes[delivered.pk], (state.INVALID, 'delivered'))
+        self.assertEqual(outcomes[999999], (state.NOT_FOUND, None))
+        self.assertEqual(
+            set(Order.objects.values_list('status', flat=True)), {'shipped', 'delivered'}
+        )
+        self.assertEqual(OrderTracking.objects.filter(status='order_shipped').count(), 3)
+
+    def test_delivery_and_refund_sync_purchases(self):
+        order = create_order(self.user, 'shipped', product=self.product)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            state.bulk_transition([order.pk], 'delivered')
+        self.assertTrue(purchases.has_purchased(self.user, self.product.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            state.bulk_transition([order.pk], 'refunded')
+        self.assertFalse(purchases.has_purchased(self.user, self.product.pk))
+
+    def test_cancel_order_uses_the_state_machine(self):
+        self.client.force_authenticate(self.user)
+        pending = create_order(self.user)
+        shipped = create_order(self.user, 'shipped')
+
+        response = self.client.post(f'/api/orders/{pending.pk}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'cancelled')
+        self.assertTrue(OrderTracking.objects.filter(order=pending, status='cancelled').exists())
+
+        response = self.client.post(f'/api/orders/{shipped.pk}/cancel/')
+        self.assertEqual(response.status_code, 400)
+        shipped.refresh_from_db()
+        self.assertEqual(shipped.status, 'shipped')
+
+    def test_bulk_status_endpoint(self):
+        orders = [create_order(self.user, 'confirmed') for _ in range(4)] + [create_order(self.user, 'cancelled')]
+        ids = [order.pk for order in orders]
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.client.post('/api/orders/bulk-status/', {'order_ids': ids, 'status': 'shipped'}, format='json')
+            .status_code, 403,
+        )
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            '/api/orders/bulk-status/',
+            {'order_ids': ids, 'status': 'shipped', 'description': 'Picked up by courier'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['updated'], 4)
+        self.assertEqual(body['results'][-1], {
+            'order_id': ids[-1], 'result': 'invalid_transition', 'previous_status': 'cancelled',
+        })
+        self.assertEqual(
+            OrderTracking.objects.filter(description='Picked up by courier').count(), 4
+        )
+
+        response = self.client.post('/api/orders/bulk-status/', {'order_ids': ids, 'status': 'lost'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PurchasedProductSyncTests(TestCase):
+    """PurchasedProduct follows orders into and out of ``delivered``, however they are saved."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='buyer@example.com', password='x')
+        category = Category.objects.create(name='Shoes', slug='shoes', category_type='shoes')
+        cls.product = Product.objects.create(
+            category=category, name='Runner', slug='runner', description='', base_price=Decimal('500.00'),
+        )
+
+    def set_status(self, order, status):
+        order.status = status
+        order.save()
+
+    def test_saving_an_order_as_delivered_records_the_purchase(self):
+        order = create_order(self.user, 'shipped', product=self.product)
+        self.assertFalse(purchases.has_purchased(self.user, self.product.pk))
+
+        self.set_status(order, 'delivered')
+
+        self.assertTrue(purchases.has_purchased(self.user, self.product.pk))
+        self.assertEqual(purchases.purchased_among(self.user, [self.product.pk, 999999]), {self.product.pk})
+
+    def test_resaving_a_delivered_order_leaves_purchases_alone(self):
+        order = create_order(self.user, 'shipped', product=self.product)
+        self.set_status(order, 'delivered')
+        PurchasedProduct.objects.all().delete()
+
+        order.notes = 'Left at the door'
+        with self.assertNumQueries(1):
+            order.save()
+        reloaded = Order.objects.get(pk=order.pk)
+        reloaded.save()
+        Order.objects.only('pk', 'user_id').get(pk=order.pk).save()
+
+        self.assertFalse(PurchasedProduct.objects.exists())
+
+    def test_refund_and_cancel_revoke_unless_another_delivery_remains(self):
+        first = create_order(self.user, 'shipped', product=self.product)
+        second = create_order(self.user, 'shipped', product=self.product)
+        self.set_status(first, 'delivered')
+        self.set_status(second, 'delivered')
+
+        self.set_status(first, 'refunded')
+        self.assertTrue(purchases.has_purchased(self.user, self.product.pk))
+
+        self.set_status(second, 'refunded')
+        self.assertFalse(purchases.has_purchased(self.user, self.product.pk))
+
+    def test_cancelling_an_undelivered_order_revokes_nothing_else(self):
+        delivered = create_order(self.user, 'shipped', product=self.product)
+        self.set_status(delivered, 'delivered')
+        pending = create_order(self.user, product=self.product)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            state.bulk_transition([pending.pk], 'cancelled')
+
+        self.assertTrue(purchases.has_purchased(self.user, self.product.pk))
+
+    def test_eligibility_is_read_from_the_table_every_time(self):
+        order = create_order(self.user, 'shipped', product=self.product)
+        with self.assertNumQueries(1):
+            self.assertFalse(purchases.has_purchased(self.user, self.product.pk))
+
+        # A delivery recorded elsewhere (another process, a bulk update) counts at once
+        state.bulk_transition([order.pk], 'delivered')
+        with self.assertNumQueries(1):
+            self.assertTrue(purchases.has_purchased(self.user, self.product.pk))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class OrderListQueryCountTests(TestCase):
+    """Listing orders costs the same number of queries however many orders and lines there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='lister@example.com', password='x')
+        cls.admin = CustomUser.objects.create_superuser(email='lister-admin@example.com', password='x')
+        cls.address = UserAddress.objects.create(
+            user=cls.user, name='Lister', phone='9999999999', address_line1='1 Main St',
+            city='Kochi', state='Kerala', pincode='682001',
+        )
+        category = Category.objects.create(name='Jackets', slug='jackets', category_type='jackets')
+        color = ColorOption.objects.create(name='Olive', hex_code='#556B2F')
+        cls.lines = []
+        for index in range(3):
+            product = Product.objects.create(
+                category=category, name=f'Jacket {index}', slug=f'jacket-{index}', description='',
+                base_price=Decimal('1500.00'),
+            )
+            ProductImage.objects.create(product=product, image=f'https://img.example.com/p{index}.jpg')
+            color_variant = ColorVariant.objects.create(product=product, color_name='Olive', sku=f'JK-{index}')
+            VariantImage.objects.create(
+                variant=color_variant, image=f'https://img.example.com/v{index}.jpg', is_primary=True
+            )
+            variant = ProductVariant.objects.create(product=product, size='L', color=color, sku=f'JK-{index}-L')
+            cls.lines.append((product, variant, color_variant))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = create_order(self.user)
+            order.shipping_address = self.address
+            order.save()
+            for product, variant, color_variant in self.lines:
+                OrderItem.objects.create(
+                    order=order, product=product, variant=variant, color_variant=color_variant,
+                    quantity=1, price=product.base_price,
+                    **snapshots.line_snapshot(product, variant, color_variant, 'L'),
+                )
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(captured), response.json()
+
+    def test_my_orders_query_count_is_bounded(self):
+        self.client.force_authenticate(self.user)
+        self.add_orders(2)
+        few, _ = self.count_queries('/api/orders/my-orders/')
+        self.add_orders(8)
+        many, body = self.count_queries('/api/orders/my-orders/')
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 10)
+        self.assertEqual(body['count'], 10)
+        item = body['results'][0]['items'][0]
+        self.assertTrue(item['product_image'].startswith('https://img.example.com/v'))
+        self.assertEqual(item['color_variant_details']['color_name'], 'Olive')
+        self.assertEqual(body['results'][0]['shipping_city'], 'Kochi')
+
+    def test_order_lines_render_from_their_snapshot(self):
+        self.client.force_authenticate(self.user)
+        self.add_orders(1)
+        product, _, color_variant = self.lines[0]
+        before = self.client.get('/api/orders/my-orders/').json()['results'][0]['items']
+
+        product.name = 'Renamed'
+        product.save()
+        product.delete()
+
+        after = self.client.get('/api/orders/my-orders/').json()['results'][0]['items']
+        line = next(item for item in after if item['color_variant'] is None)
+        self.assertEqual(line['product_name'], 'Jacket 0')
+        self.assertEqual(line['product_image'], 'https://img.example.com/v0.jpg')
+        self.assertEqual(line['color_variant_details'], {'color_name': 'Olive', 'color_hex': '#000000', 'sku': 'JK-0'})
+        self.assertEqual(
+            [{k: v for k, v in item.items() if k not in ('variant', 'color_variant', 'variant_details')}
+             for item in after],
+            [{k: v for k, v in item.items() if k not in ('variant', 'color_variant', 'variant_details')}
+             for item in before],
+        )
+
+    def test_admin_list_and_detail_query_counts_are_bounded(self):
+        self.client.force_authenticate(self.admin)
+        self.add_orders(2)
+        few, _ = self.count_queries('/api/orders/')
+        self.add_orders(8)
+        many, _ = self.count_queries('/api/orders/')
+        self.assertEqual(few, many)
+
+        order = Order.objects.first()
+        OrderTracking.objects.create(order=order, status='order_placed', description='Placed')
+        queries, body = self.count_queries(f'/api/orders/{order.pk}/')
+        self.assertLessEqual(queries, 10)
+        self.assertEqual(len(body['items']), 3)
+        self.assertEqual(len(body['tracking']), 1)
+
+    def test_snapshot_backfill_handles_missing_products_and_variants(self):
+        backfill = import_module('orders.migrations.0005_order_item_snapshots').backfill_snapshots
+        product, variant, color_variant = self.lines[0]
+        order = create_order(self.user)
+        orphan = OrderItem.objects.create(order=order, product=None, size='M', quantity=1, price=Decimal('1'))
+        plain = OrderItem.objects.create(order=order, product=product, quantity=1, price=Decimal('1'))
+        legacy = OrderItem.objects.create(order=order, product=product, variant=variant, quantity=1,
+                                          price=Decimal('1'))
+        OrderItem.objects.filter(order=order).update(product_name='', sku='', image_url='')
+
+        backfill(django_apps, None)
+
+        orphan.refresh_from_db()
+        plain.refresh_from_db()
+        legacy.refresh_from_db()
+        self.assertEqual((orphan.product_name, orphan.size), ('', 'M'))
+        self.assertEqual((plain.product_name, plain.sku, plain.image_url),
+                         ('Jacket 0', '', 'https://img.example.com/p0.jpg'))
+        self.assertEqual((legacy.sku, legacy.color_name, legacy.size), ('JK-0-L', 'Olive', 'L'))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class OrderTrackingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='tracker@example.com', password='x')
+        cls.other = CustomUser.objects.create_user(email='other@example.com', password='x')
+        cls.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.order = create_order(self.user)
+        OrderTracking.objects.create(order=self.order, status='order_placed', description='Placed')
+        self.path = f'/api/orders/{self.order.pk}/track/'
+
+    def test_unchanged_timeline_is_not_modified(self):
+        self.client.force_authenticate(self.user)
+        first = self.client.get(self.path)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.json()), 1)
+
+        with CaptureQueriesContext(connection) as captured:
+            again = self.client.get(self.path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(len(captured), 1)
+
+    def test_new_tracking_entry_changes_the_etag(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.path)['ETag']
+        state.transition(self.order, 'confirmed')
+
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([entry['description'] for entry in response.json()],
+                         ['Order has been confirmed', 'Placed'])
+
+    def test_if_none_match_is_compared_tag_by_tag(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.path)['ETag']
+
+        for header in (f'"stale", {etag}', f'W/{etag}', '*'):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get(self.path, HTTP_IF_NONE_MATCH=header).status_code, 304)
+        # only a well-formed tag in the list counts, not any text containing it
+        for header in (f'"stale{etag}', f'"stale-{etag}"', etag[1:-1]):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get(self.path, HTTP_IF_NONE_MATCH=header).status_code, 200)
+
+    def test_rewritten_tracking_time_changes_the_etag(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.path)['ETag']
+        OrderTracking.objects.filter(order=self.order).update(created_at=timezone.now() + timedelta(minutes=1))
+
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_customers_orders_are_not_found(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(self.path).status_code, 200)
+        self.assertEqual(self.client.get('/api/orders/999999/track/').status_code, 404)
+
+
+def parse_event(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return int(fields['id']), json.loads(fields['data'])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], ORDER_EVENTS_POLL_INTERVAL=0)
+class OrderEventsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='watcher@example.com', password='x')
+        cls.other = CustomUser.objects.create_user(email='bystander@example.com', password='x')
+
+    def setUp(self):
+        self.order = create_order(self.user)
+        self.placed = OrderTracking.objects.create(order=self.order, status='order_placed', description='Placed')
+
+    def transition(self, order, target):
+        with self.captureOnCommitCallbacks(execute=True):
+            state.transition(order, target)
+
+    async def next_event(self, stream):
+        return parse_event(await asyncio.wait_for(anext(stream), timeout=5))
+
+    async def test_transitions_reach_the_owners_stream_only(self):
+        stream = events.stream(self.user.pk)
+        others = events.stream(self.other.pk)
+        # Streams subscribe when first awaited
+        first = asyncio.ensure_future(anext(stream))
+        other = asyncio.ensure_future(anext(others))
+        await asyncio.sleep(0)
+
+        await sync_to_async(self.transition)(self.order, 'confirmed')
+        event_id, data = parse_event(await asyncio.wait_for(first, timeout=5))
+        self.assertEqual(data['order_number'], self.order.order_number)
+        self.assertEqual(data['description'], 'Order has been confirmed')
+        self.assertEqual(event_id, data['id'])
+        self.assertFalse(other.done())
+
+        other.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await other
+        await stream.aclose()
+        self.assertFalse(events.broker.has_subscribers())
+
+    async def test_reconnect_replays_missed_entries(self):
+        await sync_to_async(self.transition)(self.order, 'confirmed')
+        await sync_to_async(self.transition)(self.order, 'shipped')
+        stream = events.stream(self.user.pk, last_event_id=self.placed.pk)
+        try:
+            descriptions = [(await self.next_event(stream))[1]['description'] for _ in range(2)]
+        finally:
+            await stream.aclose()
+        self.assertEqual(descriptions, ['Order has been confirmed', 'Order has been shipped'])
+
+    async def test_slow_client_is_disconnected(self):
+        stream = events.stream(self.user.pk)
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        payload = {'id': 1, 'description': 'x'}
+        events.broker.publish([(self.user.pk, payload)] * (events.QUEUE_SIZE + 1))
+        await asyncio.sleep(0)
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(pending, timeout=5)
+        self.assertFalse(events.broker.has_subscribers())
+
+    @override_settings(ORDER_EVENTS_POLL_INTERVAL=0.01)
+    async def test_polling_picks_up_rows_written_elsewhere(self):
+        stream = events.stream(self.user.pk)
+        pending = asyncio.ensure_future(anext(stream))
+        # Let the poller read the latest id before the new row lands
+        await asyncio.sleep(0.05)
+        entry = await OrderTracking.objects.acreate(order=self.order, status='order_shipped', description='Shipped')
+        try:
+            event_id, _ = parse_event(await asyncio.wait_for(pending, timeout=5))
+        finally:
+            await stream.aclose()
+        self.assertEqual(event_id, entry.pk)
+
+    async def test_stream_requires_a_token(self):
+        response = await self.async_client.get('/api/orders/events/')
+        self.assertEqual(response.status_code, 401)
+
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        response = await self.async_client.get(
+            f'/api/orders/events/?token={token}', headers={'Last-Event-ID': '0'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        try:
+            event_id, data = parse_event((await asyncio.wait_for(anext(content), timeout=5)).decode())
+        finally:
+            await content.aclose()
+        self.assertEqual(event_id, self.placed.pk)
+
+
+class OrderNumberingTests(SimpleTestCase):
+
+    def test_concurrent_numbers_are_unique_and_increasing(self):
+        generator = numbering.SnowflakeGenerator(worker_id=7)
+        threads, per_thread = 16, 5000
+        issued = [[] for _ in range(threads)]
+        start = threading.Barrier(threads)
+
+        def issue(out):
+            start.wait()
+            for _ in range(per_thread):
+                out.append(generator.next_id())
+
+        workers = [threading.Thread(target=issue, args=(out,)) for out in issued]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        every = [number for out in issued for number in out]
+        self.assertEqual(len(set(every)), threads * per_thread)
+        for out in issued:
+            self.assertEqual(out, sorted(out))
+            self.assertEqual(len(set(out)), len(out))
+        # Order numbers sort like the ids they encode
+        formatted = [numbering.format_number(number) for number in sorted(every)]
+        self.assertEqual(formatted, sorted(formatted))
+
+    def test_workers_never_collide(self):
+        clock = lambda: numbering.EPOCH_MS + 1000
+        first = numbering.SnowflakeGenerator(1, clock=clock)
+        second = numbering.SnowflakeGenerator(2, clock=clock)
+        self.assertFalse(
+            {first.next_id() for _ in range(1000)} & {second.next_id() for _ in range(1000)}
+        )
+
+    def test_sequence_overflow_waits_for_the_next_millisecond(self):
+        ticks = iter([numbering.EPOCH_MS] * (numbering.MAX_SEQUENCE + 3) + [numbering.EPOCH_MS + 1] * 2)
+        generator = numbering.SnowflakeGenerator(0, clock=lambda: next(ticks))
+        ids = [generator.next_id() for _ in range(numbering.MAX_SEQUENCE + 2)]
+
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[-1] >> (numbering.WORKER_BITS + numbering.SEQUENCE_BITS), 1)
+
+    def test_clock_going_backwards_does_not_repeat(self):
+        ticks = iter([numbering.EPOCH_MS + 50, numbering.EPOCH_MS + 10, numbering.EPOCH_MS + 10])
+        generator = numbering.SnowflakeGenerator(0, clock=lambda: next(ticks))
+        ids = [generator.next_id() for _ in range(3)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_order_number_format(self):
+        self.assertRegex(numbering.next_order_number(), r'^ORD\d{19}$')
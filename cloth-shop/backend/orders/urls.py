@@ -8,6 +8,8 @@ router.register('', views.OrderViewSet, basename='order')
 
 urlpatterns = [
     path('create/', views.create_order, name='create-order'),
+    path('bulk-status/', views.bulk_update_status, name='bulk-update-status'),
+    path('events/', views.order_events, name='order-events'),
     path('<int:order_id>/track/', views.track_order, name='track-order'),
     path('<int:order_id>/cancel/', views.cancel_order, name='cancel-order'),
     path('', include(router.urls)),
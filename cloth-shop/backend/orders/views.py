@@ -1,25 +1,40 @@
 # orders/views.py
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.db import transaction
-from decimal import Decimal
+from django.db.models import Count, Max
+from . import events, snapshots, state
 from .models import Order, OrderItem, OrderTracking
-from .serializers import OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer
+from .serializers import OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer, OrderTrackingSerializer
+from cart import holds, pricing
 from cart.models import Cart, CartItem
 from products.models import Product
 from payments.models import Payment
 
+logger = logging.getLogger(__name__)
+
+MAX_BULK_ORDERS = 1000
+
 class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderDetailSerializer
 
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return Order.objects.all().order_by('-created_at')
-        return self.request.user.orders.all().order_by('-created_at')
+        queryset = Order.objects.for_detail() if self.action == 'retrieve' else Order.objects.for_listing()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset.order_by('-created_at')
 
     def get_serializer_class(self):
         if self.action == 'list' or self.action == 'my_orders':
@@ -43,7 +58,11 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
 def create_order(request):
     try:
         cart, created = Cart.objects.get_or_create(user=request.user)
-        if not cart.items.exists():
+        cart_items = list(
+            cart.items.select_related('product', 'color_variant', 'variant__color', 'hold')
+            .prefetch_related('product__images', 'color_variant__variant_images')
+        )
+        if not cart_items:
             return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
         
         address_id = request.data.get('address_id')
@@ -54,12 +73,17 @@ def create_order(request):
         
         address = request.user.addresses.get(id=address_id)
         
-        # Calculate totals (matching CartItem.get_total_price logic)
-        subtotal = sum(item.get_total_price() for item in cart.items.all())
-        # Apply same discount logic as frontend if needed, but for now just match basic calc
-        shipping_charge = Decimal('0') if subtotal >= 1000 else Decimal('100')
-        tax = round(subtotal * Decimal('0.05'), 2) # Sync with frontend 5%
-        total = subtotal + shipping_charge + tax
+        # Same pricing pass as the cart the customer just saw
+        quote = pricing.quote_items(cart_items)
+        
+        # The ordered units leave stock, and the cart holds with them
+        short = holds.sell(cart_items)
+        if short:
+            item, available = short
+            return Response({
+                'error': 'Insufficient stock',
+                'items': [{'item_id': item.id, 'error': f'Only {available} items available'}],
+            }, status=status.HTTP_409_CONFLICT)
         
         # Create order
         order = Order.objects.create(
@@ -68,60 +92,89 @@ def create_order(request):
             shipping_name=address.name,
             shipping_phone=address.phone,
             shipping_email=request.user.email,
-            subtotal=subtotal,
-            shipping_charge=shipping_charge,
-            tax=tax,
-            total=total,
+            subtotal=quote.subtotal,
+            shipping_charge=quote.shipping_charge,
+            tax=quote.tax,
+            total=quote.total,
             payment_method=payment_method,
-            status='pending'  # Both COD and Card start as pending
+            status='pending',  # Both COD and Card start as pending
+            stock_sold=True
         )
         
         # Add items to order
-        for cart_item in cart.items.all():
-            # Calculate actual unit price including adjustments
-            unit_price = cart_item.get_total_price() / cart_item.quantity
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
                 product=cart_item.product,
                 variant=cart_item.variant,
                 color_variant=cart_item.color_variant,
-                size=cart_item.size,
                 quantity=cart_item.quantity,
-                price=unit_price,
-                total=cart_item.get_total_price()
+                price=line.unit_price,
+                total=line.total,
+                **snapshots.line_snapshot(
+                    cart_item.product, cart_item.variant, cart_item.color_variant, cart_item.size
+                )
             )
+            for cart_item, line in zip(cart_items, quote.lines)
+        ])
         
         # Add tracking
-        OrderTracking.objects.create(
+        entry = OrderTracking.objects.create(
             order=order,
             status='order_placed',
             description='Your order has been placed successfully'
         )
+        events.tracking_created([entry])
         
-        # Clear cart
+        # Clear cart; its holds were consumed by holds.sell
         cart.items.all().delete()
+        logger.info("Order %s created for user %s (%s)", order.order_number, request.user.id, payment_method)
         
-        serializer = OrderDetailSerializer(order)
+        serializer = OrderDetailSerializer(Order.objects.for_detail().get(pk=order.pk))
         return Response({
             'message': 'Order created successfully',
             'order': serializer.data
         }, status=status.HTTP_201_CREATED)
     except Exception as e:
+        logger.exception("Error creating order")
+        # Answering normally would commit the stock already taken
+        transaction.set_rollback(True)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def track_order(request, order_id):
+    """
+    An order's tracking timeline, newest first. Responses carry an ETag built
+    from the latest tracking entry (id and created_at) and the entry count, so
+    a client polling with If-None-Match gets a 304 from a single aggregate
+    query until the timeline changes. Tracking rows are append-only (nothing
+    updates them), so created_at stands in for an updated_at.
+    """
     try:
-        order = Order.objects.get(id=order_id)
-        if order.user != request.user and not request.user.is_staff:
-            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-        
-        tracking = order.tracking.all().order_by('-created_at')
-        from .serializers import OrderTrackingSerializer
+        orders = Order.objects.filter(id=order_id)
+        if not request.user.is_staff:
+            orders = orders.filter(user=request.user)
+        timeline = orders.aggregate(
+            found=Count('id', distinct=True), latest=Max('tracking__id'),
+            changed=Max('tracking__created_at'), entries=Count('tracking__id'),
+        )
+        if not timeline['found']:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        changed = int(timeline['changed'].timestamp() * 1_000_000) if timeline['changed'] else 0
+        etag = f'"{order_id}-{timeline["latest"] or 0}-{changed}-{timeline["entries"]}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        # Weak comparison, as If-None-Match calls for
+        matches = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+        if etag in matches or '*' in matches:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        tracking = OrderTracking.objects.filter(order_id=order_id).order_by('-created_at')
         serializer = OrderTrackingSerializer(tracking, many=True)
-        return Response(serializer.data)
+        return Response(serializer.data, headers=headers)
     except Exception as e:
+        logger.exception("Error loading order tracking")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -132,19 +185,89 @@ def cancel_order(request, order_id):
         if order.user != request.user and not request.user.is_staff:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        if order.status in ['cancelled', 'delivered', 'shipped']:
+        try:
+            state.transition(order, 'cancelled')
+        except state.InvalidTransition:
             return Response({'error': 'Cannot cancel this order'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.status = 'cancelled'
-        order.save()
-        
-        OrderTracking.objects.create(
-            order=order,
-            status='cancelled',
-            description='Order has been cancelled'
-        )
+        logger.info("Order %s cancelled by user %s", order.order_number, request.user.id)
         
         serializer = OrderDetailSerializer(order)
         return Response(serializer.data)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        logger.exception("Error cancelling order")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_update_status(request):
+    """
+    Move many orders to one status (orders.state). Body:
+    ``{"order_ids": [...], "status": "shipped", "description": "..."}``.
+    Orders that may not make the move are reported and left as they are.
+    """
+    order_ids = request.data.get('order_ids')
+    target = request.data.get('status')
+    if not isinstance(order_ids, list) or not order_ids:
+        return Response({'error': 'order_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(order_ids) > MAX_BULK_ORDERS:
+        return Response({'error': f'At most {MAX_BULK_ORDERS} orders per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if target not in state.TRANSITIONS:
+        return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        order_ids = [int(order_id) for order_id in order_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'order_ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        outcomes = state.bulk_transition(order_ids, target, request.data.get('description') or None)
+    except Exception as e:
+        logger.exception("Error updating order statuses")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    results = [
+        {'order_id': order_id, 'result': outcome, 'previous_status': previous}
+        for order_id, (outcome, previous) in sorted(outcomes.items())
+    ]
+    updated = sum(1 for result in results if result['result'] == state.UPDATED)
+    logger.info("Admin %s moved %d/%d orders to %s", request.user.id, updated, len(results), target)
+    return Response({'status': target, 'updated': updated, 'results': results})
+
+
+def _stream_user(request):
+    # EventSource can not set headers, so the access token may also come as
+    # ?token=; keep it out of access logs where this is served
+    authentication = JWTAuthentication()
+    token = request.GET.get('token')
+    try:
+        if token:
+            return authentication.get_user(authentication.get_validated_token(token.encode()))
+        authenticated = authentication.authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return authenticated[0] if authenticated else None
+
+
+async def order_events(request):
+    """
+    Server-sent events with the tracking entries of the user's orders
+    (``orders.events``). A plain async view, not a DRF one, so under ASGI
+    an open stream holds no thread.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET['last_event_id'])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    response = StreamingHttpResponse(events.stream(user.pk, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
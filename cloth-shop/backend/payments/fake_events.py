@@ -0,0 +1,66 @@
+# payments/fake_events.py
+"""
+Local fake Stripe events, for tests and for exercising the webhook inbox
+without a Stripe account (see ``manage.py fake_stripe_events``).
+
+Events have Stripe's shape and are signed like Stripe signs them, so they
+pass ``stripe.Webhook.construct_event`` with the same secret.
+"""
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+
+def event(event_type, obj, event_id=None):
+    return {
+        'id': event_id or f'evt_fake_{uuid.uuid4().hex[:24]}',
+        'object': 'event',
+        'type': event_type,
+        'created': int(time.time()),
+        'livemode': False,
+        'data': {'object': obj},
+    }
+
+
+def payment_succeeded(payment, charge_id=None):
+    return event('payment_intent.succeeded', {
+        'id': payment.stripe_payment_intent_id,
+        'object': 'payment_intent',
+        'status': 'succeeded',
+        'amount': int(payment.amount * 100),
+        'latest_charge': charge_id or f'ch_fake_{payment.pk}',
+    })
+
+
+def payment_failed(payment, message='Your card was declined.'):
+    return event('payment_intent.payment_failed', {
+        'id': payment.stripe_payment_intent_id,
+        'object': 'payment_intent',
+        'status': 'requires_payment_method',
+        'last_payment_error': {'message': message},
+    })
+
+
+def charge_refunded(payment, refund_id=None):
+    return event('charge.refunded', {
+        'id': payment.stripe_charge_id,
+        'object': 'charge',
+        'refunded': True,
+        'refunds': {'data': [{'id': refund_id or f're_fake_{payment.pk}'}]},
+    })
+
+
+def sign(payload, secret, timestamp=None):
+    """``Stripe-Signature`` header value for ``payload`` (bytes)."""
+    timestamp = int(timestamp or time.time())
+    signed = f'{timestamp}.'.encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def encode(evt, secret):
+    """``(body, signature header)`` ready to POST to the webhook."""
+    payload = json.dumps(evt).encode()
+    return payload, sign(payload, secret)
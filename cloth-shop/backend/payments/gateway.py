@@ -0,0 +1,164 @@
+# payments/gateway.py
+"""
+Payment gateway used by the payment views.
+
+``StripeGateway`` wraps one ``stripe.StripeClient`` per process on a pooled
+``requests`` session, with connect/read timeouts so a slow Stripe response
+can not hold a worker indefinitely, and the SDK's retries (exponential
+backoff with jitter, honouring ``Stripe-Should-Retry``). Writes carry an
+idempotency key derived from the request parameters, so a retried request
+can never create a second charge object.
+
+``FakeGateway`` keeps intents in process memory and never touches the
+network; point ``PAYMENT_GATEWAY`` at it for load tests and local checkout
+runs. Intents it creates are confirmed on the next ``retrieve_intent``, as
+if the customer had completed Stripe.js.
+"""
+import hashlib
+import itertools
+import json
+import threading
+from functools import lru_cache
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from cart import pricing
+
+CURRENCY = 'usd'
+
+
+def intent_params(amount, receipt_email=None, metadata=None):
+    return {
+        'amount': pricing.to_minor_units(amount),
+        'currency': CURRENCY,
+        'receipt_email': receipt_email,
+        'metadata': metadata or {},
+        'statement_descriptor_suffix': 'Order',
+    }
+
+
+def intent_key(order, params, attempt):
+    """
+    Idempotency key for creating an intent with ``params`` for ``order``.
+
+    Retries of one attempt share the key. A new attempt (after a failed
+    payment) or any changed parameter gets a fresh one, rather than Stripe
+    replaying the earlier intent.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'order-{order.pk}-intent-{attempt}-{digest[:32]}'
+
+
+def update_key(intent_id, amount):
+    return f'{intent_id}-amount-{pricing.to_minor_units(amount)}'
+
+
+class StripeGateway:
+
+    def __init__(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.STRIPE_POOL_SIZE, pool_maxsize=settings.STRIPE_POOL_SIZE
+        )
+        session.mount('https://', adapter)
+        http_client = stripe.RequestsClient(
+            timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT), session=session
+        )
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=http_client,
+            max_network_retries=settings.STRIPE_MAX_RETRIES,
+        )
+
+    def create_intent(self, order, amount, receipt_email=None, metadata=None, attempt=0):
+        params = intent_params(amount, receipt_email, metadata)
+        return self.client.v1.payment_intents.create(
+            params=params, options={'idempotency_key': intent_key(order, params, attempt)},
+        )
+
+    def retrieve_intent(self, intent_id):
+        return self.client.v1.payment_intents.retrieve(intent_id)
+
+    def update_intent(self, intent_id, amount):
+        return self.client.v1.payment_intents.update(
+            intent_id,
+            params={'amount': pricing.to_minor_units(amount)},
+            options={'idempotency_key': update_key(intent_id, amount)},
+        )
+
+
+class FakeGateway:
+
+    def __init__(self):
+        self._intents = {}
+        self._keys = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_intent(self, order, amount, receipt_email=None, metadata=None, attempt=0):
+        params = intent_params(amount, receipt_email, metadata)
+        key = intent_key(order, params, attempt)
+        with self._lock:
+            if key in self._keys:
+                return dict(self._intents[self._keys[key]])
+            intent_id = f'pi_fake_{next(self._ids)}'
+            intent = {
+                'id': intent_id,
+                'object': 'payment_intent',
+                **params,
+                'client_secret': f'{intent_id}_secret_fake',
+                'status': 'requires_payment_method',
+                'latest_charge': None,
+            }
+            self._intents[intent_id] = intent
+            self._keys[key] = intent_id
+            return dict(intent)
+
+    def _get(self, intent_id):
+        try:
+            return self._intents[intent_id]
+        except KeyError:
+            raise stripe.InvalidRequestError(f'No such payment_intent: {intent_id}', 'intent')
+
+    def retrieve_intent(self, intent_id):
+        with self._lock:
+            intent = self._get(intent_id)
+            if intent['status'] == 'requires_payment_method':
+                intent['status'] = 'succeeded'
+                intent['latest_charge'] = f'ch_fake_{intent_id[len("pi_fake_"):]}'
+            return dict(intent)
+
+    def update_intent(self, intent_id, amount):
+        with self._lock:
+            intent = self._get(intent_id)
+            if intent['status'] == 'succeeded':
+                raise stripe.InvalidRequestError(
+                    'This PaymentIntent\'s amount could not be updated because it has a status of succeeded.',
+                    'amount',
+                )
+            intent['amount'] = pricing.to_minor_units(amount)
+            return dict(intent)
+
+    @property
+    def intents(self):
+        """Every intent created so far (for tests and load-test reports)."""
+        with self._lock:
+            return [dict(intent) for intent in self._intents.values()]
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """The process-wide gateway named by ``PAYMENT_GATEWAY``."""
+    return import_string(settings.PAYMENT_GATEWAY)()
+
+
+@receiver(setting_changed)
+def _reset_gateway(setting, **kwargs):
+    if setting == 'PAYMENT_GATEWAY' or setting.startswith('STRIPE_'):
+        get_gateway.cache_clear()
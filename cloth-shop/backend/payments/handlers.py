@@ -0,0 +1,118 @@
+# payments/handlers.py
+"""
+Stripe event handlers, run by the webhook inbox worker (``payments.inbox``).
+
+Handlers must be idempotent: an event can be delivered, and so processed,
+more than once. State changes are therefore conditional UPDATEs that only
+fire on the first delivery.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders import state
+from orders.models import Order
+from .models import Payment, Refund
+
+logger = logging.getLogger(__name__)
+
+# Order statuses with no way back to ``confirmed``: a payment landing on one
+# of these is recorded and then refunded
+REFUND_STATUSES = ('cancelled', 'refunded')
+
+
+def charge_id_of(intent):
+    charge_id = intent.get('latest_charge')
+    if not charge_id and intent.get('charges') and intent['charges'].get('data'):
+        charge_id = intent['charges']['data'][0].get('id')
+    return charge_id
+
+
+def record_paid(payments, description='Payment confirmed successfully'):
+    """
+    Mark the orders of ``payments`` (succeeded ``Payment`` rows) paid and
+    confirm them through ``orders.state``.
+
+    Orders already marked paid are skipped, so repeating a confirmation adds
+    no second tracking entry. An order that can no longer be confirmed (say,
+    cancelled while the customer was paying) keeps its status but is still
+    marked paid, and a refund of the charge is requested.
+    """
+    by_order = {payment.order_id: payment for payment in payments}
+    now = timezone.now()
+    with transaction.atomic():
+        unpaid = list(
+            Order.objects.select_for_update().filter(pk__in=by_order)
+            .exclude(payment_status='completed').values_list('pk', flat=True)
+        )
+        if not unpaid:
+            return
+        Order.objects.filter(pk__in=unpaid).update(payment_status='completed', payment_date=now, updated_at=now)
+        outcomes = state.bulk_transition(unpaid, 'confirmed', description, tracking_status='payment_confirmed')
+        stranded = [
+            by_order[pk] for pk, (outcome, previous) in outcomes.items()
+            if outcome == state.INVALID and previous in REFUND_STATUSES
+        ]
+        for payment in stranded:
+            logger.error("Payment %s landed on %s order %s; refund requested",
+                         payment.stripe_payment_intent_id, outcomes[payment.order_id][1], payment.order_id)
+        Refund.objects.bulk_create([
+            Refund(payment=payment, amount=payment.amount, reason='order_cancelled',
+                   description='Payment received after the order was closed', status='requested')
+            for payment in stranded
+        ])
+
+
+def payment_succeeded(intent):
+    payment = Payment.objects.filter(stripe_payment_intent_id=intent['id']).first()
+    if payment is None:
+        logger.warning("Payment record not found for intent: %s", intent['id'])
+        return
+    updated = Payment.objects.filter(pk=payment.pk).exclude(status='succeeded').update(
+        status='succeeded', stripe_charge_id=charge_id_of(intent), paid_at=timezone.now()
+    )
+    if updated:
+        record_paid([payment])
+        logger.info("Payment succeeded: %s", intent['id'])
+
+
+def payment_failed(intent):
+    error_msg = (intent.get('last_payment_error') or {}).get('message', 'Payment failed')
+    updated = Payment.objects.filter(stripe_payment_intent_id=intent['id']).exclude(
+        status__in=['succeeded', 'failed']
+    ).update(status='failed', error_message=error_msg, failed_at=timezone.now(), metadata=intent)
+    if updated:
+        logger.error("Payment failed: %s - %s", intent['id'], error_msg)
+    elif not Payment.objects.filter(stripe_payment_intent_id=intent['id']).exists():
+        logger.warning("Payment record not found for intent: %s", intent['id'])
+
+
+def charge_refunded(charge):
+    refunds = (charge.get('refunds') or {}).get('data') or []
+    refund_id = refunds[0]['id'] if refunds else None
+    refund = Refund.objects.filter(
+        payment__stripe_charge_id=charge['id'], status='processing'
+    ).order_by('created_at').first()
+    if refund:
+        refund.mark_succeeded(refund_id)
+        logger.info("Refund succeeded: %s", refund_id)
+
+
+def dispute_created(dispute):
+    logger.warning("Dispute created for charge: %s", dispute['charge'])
+
+
+HANDLERS = {
+    'payment_intent.succeeded': payment_succeeded,
+    'payment_intent.payment_failed': payment_failed,
+    'charge.refunded': charge_refunded,
+    'charge.dispute.created': dispute_created,
+}
+
+
+def handle(event):
+    """Dispatch a Stripe event (a dict); unknown types are ignored."""
+    handler = HANDLERS.get(event['type'])
+    if handler is not None:
+        handler(event['data']['object'])
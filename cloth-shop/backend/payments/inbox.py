@@ -0,0 +1,73 @@
+# payments/inbox.py
+"""
+Webhook inbox.
+
+The Stripe webhook only verifies the signature and stores the event with a
+single ``INSERT ... ON CONFLICT DO NOTHING`` keyed by the Stripe event id,
+then answers 200. Redelivered events therefore cost one no-op insert,
+however often Stripe retries.
+
+``drain`` (``manage.py process_stripe_events``) claims pending events in
+batches with ``select_for_update(skip_locked=True)``, so several workers can
+run side by side without processing an event twice, and runs them through
+``payments.handlers``. A failing event is retried on later drains until
+``STRIPE_EVENT_MAX_ATTEMPTS``, then left as ``failed`` for inspection.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import handlers
+from .models import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+
+def store(event):
+    """Record a verified Stripe event; an event id seen before is silently ignored."""
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def process(event):
+    """Run one stored event's handler and record the outcome."""
+    event.attempts += 1
+    try:
+        with transaction.atomic():
+            handlers.handle(event.payload)
+    except Exception as e:
+        logger.exception("Error processing Stripe event %s (%s)", event.event_id, event.type)
+        event.last_error = str(e)
+        if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+            event.status = 'failed'
+    else:
+        event.status = 'processed'
+        event.processed_at = timezone.now()
+        event.last_error = None
+    event.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+    return event.status == 'processed'
+
+
+def drain(batch_size=100):
+    """Process pending events, oldest first. Returns ``(processed, failed)`` counts."""
+    processed = failed = 0
+    retry_later = set()  # failed this drain but still pending
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='pending').exclude(pk__in=retry_later)
+                .order_by('received_at')[:batch_size]
+            )
+            if not batch:
+                return processed, failed
+            for event in batch:
+                if process(event):
+                    processed += 1
+                else:
+                    failed += 1
+                    retry_later.add(event.pk)
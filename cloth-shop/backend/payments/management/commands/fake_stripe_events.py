@@ -0,0 +1,50 @@
+# payments/management/commands/fake_stripe_events.py
+import random
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import fake_events, inbox
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = 'Generate fake Stripe events for open payments, optionally redelivered like a retry storm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10, help='Payments to send events for')
+        parser.add_argument('--redeliver', type=int, default=0, help='Extra deliveries of every event')
+        parser.add_argument('--fail-rate', type=float, default=0.1,
+                            help='Share of payments that get payment_failed instead of succeeded')
+        parser.add_argument('--url', help='POST signed events to this webhook URL instead of '
+                                          'queueing them in the inbox directly')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        payments = list(Payment.objects.exclude(status__in=['succeeded', 'failed'])[:options['count']])
+        if not payments:
+            raise CommandError('No open payments to send events for')
+        if options['url'] and not settings.STRIPE_WEBHOOK_SECRET:
+            raise CommandError('STRIPE_WEBHOOK_SECRET is needed to sign events')
+
+        events = [
+            fake_events.payment_failed(payment) if rng.random() < options['fail_rate']
+            else fake_events.payment_succeeded(payment)
+            for payment in payments
+        ]
+        deliveries = events * (options['redeliver'] + 1)
+        rng.shuffle(deliveries)
+        for event in deliveries:
+            if options['url']:
+                body, signature = fake_events.encode(event, settings.STRIPE_WEBHOOK_SECRET)
+                request = urllib.request.Request(options['url'], data=body, method='POST', headers={
+                    'Content-Type': 'application/json', 'Stripe-Signature': signature,
+                })
+                urllib.request.urlopen(request, timeout=10).close()
+            else:
+                inbox.store(event)
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {len(deliveries)} deliveries of {len(events)} events'
+        ))
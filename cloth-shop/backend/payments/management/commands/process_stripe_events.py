@@ -0,0 +1,30 @@
+# payments/management/commands/process_stripe_events.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments import inbox
+from payments.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = 'Process queued Stripe webhook events (payments.inbox)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--every', type=float, metavar='SECONDS',
+                            help='Keep running, draining every SECONDS, instead of draining once')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Requeue events that ran out of attempts before draining')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = StripeEvent.objects.filter(status='failed').update(status='pending', attempts=0)
+            self.stdout.write(self.style.SUCCESS(f'Requeued {requeued} failed events'))
+        while True:
+            processed, failed = inbox.drain(options['batch_size'])
+            if processed or failed or not options['every']:
+                self.stdout.write(self.style.SUCCESS(f'Processed {processed} events, {failed} failed'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,35 @@
+# payments/management/commands/reconcile_payments.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payments import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Settle payments left open by missed Stripe webhooks (payments.reconcile)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30, metavar='MINUTES',
+                            help='Only payments created at least MINUTES ago')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Intents fetched from Stripe concurrently')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = reconcile.reconcile(
+            older_than=timedelta(minutes=options['older_than']),
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Checked {report.checked} open payments in {elapsed:.1f}s')
+        for outcome, count in sorted(report.outcomes.items()):
+            self.stdout.write(f'  {outcome:<16} {count}')
+        for intent_id, message in report.errors:
+            self.stdout.write(self.style.WARNING(f'  {intent_id}: {message}'))
+        style = self.style.WARNING if report.errors else self.style.SUCCESS
+        self.stdout.write(style(f'{len(report.errors)} intents could not be fetched'))
@@ -1,5 +1,6 @@
 # payments/models.py
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from orders.models import Order
 
@@ -147,4 +148,35 @@ class Refund(models.Model):
         self.save()
         
     def __str__(self):
-        return f"Refund {self.stripe_refund_id} - {self.status}"
\ No newline at end of file
+        return f"Refund {self.stripe_refund_id} - {self.status}"
+
+
+class StripeEvent(models.Model):
+    """Inbox of received Stripe webhook events, drained by ``process_stripe_events``."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    )
+
+    # Stripe's event id; redelivered events hit the unique index and are dropped
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'stripe_events'
+        ordering = ['received_at']
+        indexes = [
+            # The worker only ever scans pending events, oldest first
+            models.Index(fields=['received_at'], condition=Q(status='pending'), name='stripe_events_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"StripeEvent {self.event_id} ({self.type}) - {self.status}"
@@ -0,0 +1,110 @@
+# payments/reconcile.py
+"""
+Payment reconciliation (``manage.py reconcile_payments``).
+
+Webhooks can be missed, leaving payments open forever. Reconciliation pages
+through payments still open after a grace period (keyset paging on the
+``status`` index), fetches their intents from the gateway on a bounded
+thread pool, and applies what Stripe reports with one ``bulk_update`` per
+page; paid orders are confirmed through ``handlers.record_paid``.
+
+Rows are re-read under ``select_for_update`` before the page is applied, so a
+payment the webhook worker settled while the intents were being fetched is
+left alone.
+"""
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import stripe
+from django.db import transaction
+from django.utils import timezone
+
+from . import handlers
+from .gateway import get_gateway
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('created', 'requires_action')
+
+
+@dataclass
+class Report:
+    checked: int = 0
+    outcomes: Counter = field(default_factory=Counter)  # new payment status (or 'unchanged') -> count
+    errors: list = field(default_factory=list)  # (intent id, message)
+
+
+def _fetch(intent_id):
+    try:
+        return get_gateway().retrieve_intent(intent_id), None
+    except stripe.StripeError as e:
+        return None, str(e)
+
+
+def _transition(payment, intent, now):
+    """Apply ``intent`` to ``payment`` in memory; returns the new status or None."""
+    intent_status = intent['status']
+    if intent_status == 'succeeded':
+        payment.status = 'succeeded'
+        payment.stripe_charge_id = handlers.charge_id_of(intent)
+        payment.paid_at = now
+    elif intent_status == 'canceled' or (
+        intent_status == 'requires_payment_method' and intent.get('last_payment_error')
+    ):
+        payment.status = 'failed'
+        payment.error_message = (intent.get('last_payment_error') or {}).get('message', 'Payment intent canceled')
+        payment.failed_at = now
+    elif intent_status == 'requires_action' and payment.status != 'requires_action':
+        payment.status = 'requires_action'
+    else:
+        return None
+    return payment.status
+
+
+def _apply(page, fetched, report):
+    now = timezone.now()
+    changed = []
+    with transaction.atomic():
+        payments = Payment.objects.select_for_update().filter(
+            pk__in=[pk for pk, _ in page], status__in=OPEN_STATUSES
+        )
+        for payment in payments:
+            intent, error = fetched[payment.stripe_payment_intent_id]
+            if intent is None:
+                report.errors.append((payment.stripe_payment_intent_id, error))
+                continue
+            new_status = _transition(payment, intent, now)
+            report.outcomes[new_status or 'unchanged'] += 1
+            if new_status is not None:
+                changed.append(payment)
+
+        Payment.objects.bulk_update(
+            changed, ['status', 'stripe_charge_id', 'paid_at', 'error_message', 'failed_at']
+        )
+        handlers.record_paid(
+            [payment for payment in changed if payment.status == 'succeeded'],
+            description='Payment confirmed by reconciliation',
+        )
+
+
+def reconcile(older_than=timedelta(minutes=30), batch_size=100, workers=8):
+    """Settle payments left open for longer than ``older_than``; returns a ``Report``."""
+    report = Report()
+    cutoff = timezone.now() - older_than
+    stale = Payment.objects.filter(status__in=OPEN_STATUSES, created_at__lt=cutoff).order_by('pk')
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            page = list(stale.filter(pk__gt=last_pk).values_list('pk', 'stripe_payment_intent_id')[:batch_size])
+            if not page:
+                return report
+            last_pk = page[-1][0]
+            intent_ids = [intent_id for _, intent_id in page]
+            fetched = dict(zip(intent_ids, pool.map(_fetch, intent_ids)))
+            report.checked += len(page)
+            _apply(page, fetched, report)
+            logger.info("Reconciled %d payments up to id %d", len(page), last_pk)
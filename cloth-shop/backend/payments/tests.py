@@ -1,3 +1,428 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import stripe
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderTracking
+from payments import fake_events, gateway, inbox, reconcile
+from payments.models import Payment, Refund, StripeEvent
+from users.models import CustomUser
+
+WEBHOOK_SECRET = 'whsec_test'
+WEBHOOK_URL = '/api/payments/webhook/stripe/'
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_EVENT_MAX_ATTEMPTS=2)
+class StripeWebhookInboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(email='buyer@example.com', password='x')
+        cls.order = Order.objects.create(
+            user=user, shipping_name='Buyer', shipping_phone='9999999999', shipping_email=user.email,
+            subtotal=Decimal('500.00'), total=Decimal('625.00'), payment_method='card',
+        )
+        cls.payment = Payment.objects.create(
+            order=cls.order, stripe_payment_intent_id='pi_fake_1',
+            stripe_client_secret='pi_fake_1_secret', amount=Decimal('625.00'),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def deliver(self, event, secret=WEBHOOK_SECRET):
+        body, signature = fake_events.encode(event, secret)
+        return self.client.generic(
+            'POST', WEBHOOK_URL, body, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+        )
+
+    def test_webhook_only_queues_the_event(self):
+        event = fake_events.payment_succeeded(self.payment)
+        response = self.deliver(event)
+
+        self.assertEqual(response.status_code, 200)
+        stored = StripeEvent.objects.get()
+        self.assertEqual((stored.event_id, stored.status), (event['id'], 'pending'))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'created')
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(fake_events.payment_succeeded(self.payment), secret='whsec_other')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_retry_storm_is_processed_once(self):
+        event = fake_events.payment_succeeded(self.payment, charge_id='ch_fake_1')
+        for _ in range(5):
+            self.assertEqual(self.deliver(event).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(inbox.drain(), (1, 0))
+        self.assertEqual(inbox.drain(), (0, 0))
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.stripe_charge_id), ('succeeded', 'ch_fake_1'))
+        self.assertEqual((self.order.status, self.order.payment_status), ('confirmed', 'completed'))
+        self.assertEqual(OrderTracking.objects.filter(order=self.order, status='payment_confirmed').count(), 1)
+        self.assertEqual(StripeEvent.objects.get().status, 'processed')
+
+    def test_events_with_new_ids_for_the_same_payment_are_idempotent(self):
+        # Stripe may also send distinct events describing the same change
+        for _ in range(3):
+            self.deliver(fake_events.payment_succeeded(self.payment))
+
+        self.assertEqual(inbox.drain(batch_size=2), (3, 0))
+        self.assertEqual(OrderTracking.objects.filter(order=self.order, status='payment_confirmed').count(), 1)
+
+    def test_late_failure_does_not_undo_success(self):
+        self.deliver(fake_events.payment_succeeded(self.payment))
+        self.deliver(fake_events.payment_failed(self.payment))
+        inbox.drain()
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'succeeded')
+
+    def test_payment_on_a_cancelled_order_is_recorded_and_refunded(self):
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+        self.deliver(fake_events.payment_succeeded(self.payment))
+        self.deliver(fake_events.payment_succeeded(self.payment))
+
+        with self.assertLogs('payments.handlers', 'ERROR'):
+            inbox.drain()
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), ('cancelled', 'completed'))
+        refund = Refund.objects.get()
+        self.assertEqual((refund.payment_id, refund.amount), (self.payment.pk, Decimal('625.00')))
+        self.assertEqual((refund.status, refund.reason), ('requested', 'order_cancelled'))
+        self.assertFalse(OrderTracking.objects.filter(order=self.order).exists())
+
+    def test_failing_event_is_retried_then_parked(self):
+        inbox.store(fake_events.payment_succeeded(self.payment))
+        with mock.patch.dict('payments.handlers.HANDLERS', {'payment_intent.succeeded': lambda intent: 1 / 0}):
+            self.assertEqual(inbox.drain(), (0, 1))
+            stored = StripeEvent.objects.get()
+            self.assertEqual((stored.status, stored.attempts), ('pending', 1))
+            self.assertEqual(inbox.drain(), (0, 1))
+
+        stored.refresh_from_db()
+        self.assertEqual((stored.status, stored.attempts), ('failed', 2))
+        self.assertIn('division by zero', stored.last_error)
+
+        call_command('process_stripe_events', '--retry-failed', stdout=mock.MagicMock())
+        stored.refresh_from_db()
+        self.assertEqual(stored.status, 'processed')
+
+    def test_unknown_event_types_are_acknowledged(self):
+        self.deliver(fake_events.event('customer.created', {'id': 'cus_fake'}))
+
+        self.assertEqual(inbox.drain(), (1, 0))
+
+    def test_fake_stripe_events_command(self):
+        call_command('fake_stripe_events', '--redeliver', '3', '--fail-rate', '0', stdout=mock.MagicMock())
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        call_command('process_stripe_events', stdout=mock.MagicMock())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'succeeded')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PAYMENT_GATEWAY='payments.gateway.FakeGateway')
+class GatewayTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='payer@example.com', password='x')
+        cls.order = Order.objects.create(
+            user=cls.user, shipping_name='Payer', shipping_phone='9999999999', shipping_email=cls.user.email,
+            subtotal=Decimal('1000.00'), total=Decimal('1050.00'), payment_method='card',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(PAYMENT_GATEWAY='payments.gateway.StripeGateway', STRIPE_SECRET_KEY='sk_test_fake',
+                       STRIPE_CONNECT_TIMEOUT=2, STRIPE_READ_TIMEOUT=7, STRIPE_MAX_RETRIES=0)
+    def test_stripe_gateway_sends_timeouts_and_idempotency_key(self):
+        stripe_gateway = gateway.get_gateway()
+        response = mock.Mock(
+            status_code=200, headers={},
+            content=b'{"id": "pi_1", "object": "payment_intent", "status": "requires_payment_method"}',
+        )
+        with mock.patch('requests.Session.request', return_value=response) as request:
+            intent = stripe_gateway.create_intent(self.order, self.order.total)
+
+        self.assertEqual(intent['id'], 'pi_1')
+        kwargs = request.call_args.kwargs
+        self.assertEqual(kwargs['timeout'], (2, 7))
+        params = gateway.intent_params(self.order.total)
+        self.assertEqual(kwargs['headers']['Idempotency-Key'], gateway.intent_key(self.order, params, 0))
+        self.assertIn('amount=105000', kwargs['data'])
+        self.assertIs(gateway.get_gateway(), stripe_gateway)
+
+    def test_idempotency_key_covers_every_parameter_and_the_attempt(self):
+        params = gateway.intent_params(self.order.total, 'payer@example.com', {'order_id': self.order.pk})
+        key = gateway.intent_key(self.order, params, 0)
+
+        self.assertEqual(gateway.intent_key(self.order, dict(reversed(params.items())), 0), key)
+        self.assertNotEqual(gateway.intent_key(self.order, params, 1), key)
+        for changed in ({'receipt_email': 'other@example.com'}, {'metadata': {'order_id': 0}}):
+            self.assertNotEqual(gateway.intent_key(self.order, {**params, **changed}, 0), key)
+
+    def test_checkout_runs_against_the_fake_gateway(self):
+        response = self.client.post('/api/payments/create/', {'order_id': self.order.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        intent_id = response.json()['payment_intent_id']
+        self.assertTrue(intent_id.startswith('pi_fake_'))
+
+        response = self.client.post('/api/payments/confirm/', {'payment_intent_id': intent_id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'succeeded')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'completed')
+
+    def test_repeated_confirm_records_the_payment_once(self):
+        response = self.client.post('/api/payments/create/', {'order_id': self.order.id}, format='json')
+        intent_id = response.json()['payment_intent_id']
+        for _ in range(3):
+            response = self.client.post('/api/payments/confirm/', {'payment_intent_id': intent_id}, format='json')
+            self.assertEqual(response.status_code, 200)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertEqual(OrderTracking.objects.filter(order=self.order, status='payment_confirmed').count(), 1)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PAYMENT_GATEWAY='payments.gateway.FakeGateway')
+class PaymentIntentReuseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='clicker@example.com', password='x')
+        cls.order = Order.objects.create(
+            user=cls.user, shipping_name='Clicker', shipping_phone='9999999999', shipping_email=cls.user.email,
+            subtotal=Decimal('800.00'), total=Decimal('940.00'), payment_method='card',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        gateway.get_gateway.cache_clear()  # a fresh fake per test
+        self.gateway = gateway.get_gateway()
+
+    def create_payment(self):
+        return self.client.post('/api/payments/create/', {'order_id': self.order.id}, format='json')
+
+    def test_repeated_attempts_reuse_the_open_intent(self):
+        first = self.create_payment()
+        self.assertEqual(first.status_code, 201)
+        with mock.patch.object(self.gateway, 'create_intent') as create_intent:
+            for _ in range(3):
+                again = self.create_payment()
+                self.assertEqual(again.status_code, 200)
+                self.assertEqual(again.json()['client_secret'], first.json()['client_secret'])
+                self.assertEqual(again.json()['status'], 'requires_payment_method')
+        create_intent.assert_not_called()
+        self.assertEqual(len(self.gateway.intents), 1)
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+
+    def test_changed_total_updates_the_intent_in_place(self):
+        intent_id = self.create_payment().json()['payment_intent_id']
+        Order.objects.filter(pk=self.order.pk).update(total=Decimal('990.50'))
+
+        response = self.create_payment()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['payment_intent_id'], intent_id)
+        self.assertEqual(response.json()['amount'], '990.50')
+        self.assertEqual([intent['amount'] for intent in self.gateway.intents], [99050])
+        self.assertEqual(Payment.objects.get(order=self.order).amount, Decimal('990.50'))
+
+    def test_gateway_is_called_outside_the_order_lock(self):
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def record_depth(call):
+            def wrapper(*args, **kwargs):
+                seen.append(len(connection.atomic_blocks))
+                return call(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(self.gateway, 'create_intent', record_depth(self.gateway.create_intent)):
+            self.create_payment()
+        Order.objects.filter(pk=self.order.pk).update(total=Decimal('950.00'))
+        with mock.patch.object(self.gateway, 'update_intent', record_depth(self.gateway.update_intent)):
+            self.create_payment()
+
+        self.assertEqual(seen, [depth, depth])
+
+    def test_intent_awaiting_authentication_is_reused(self):
+        intent_id = self.create_payment().json()['payment_intent_id']
+        Payment.objects.filter(stripe_payment_intent_id=intent_id).update(status='requires_action')
+
+        response = self.create_payment()
+
+        self.assertEqual(response.json()['payment_intent_id'], intent_id)
+        self.assertEqual(response.json()['status'], 'requires_action')
+
+    def test_failed_payment_gets_a_new_intent(self):
+        intent_id = self.create_payment().json()['payment_intent_id']
+        Payment.objects.filter(stripe_payment_intent_id=intent_id).update(status='failed')
+
+        response = self.create_payment()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.json()['payment_intent_id'], intent_id)
+        self.assertEqual(len(self.gateway.intents), 2)
+
+    def test_replayed_intent_resets_its_failed_payment(self):
+        intent = self.gateway.create_intent(self.order, self.order.total)
+        Payment.objects.create(
+            order=self.order, stripe_payment_intent_id=intent['id'], stripe_client_secret='stale',
+            amount=Decimal('1.00'), status='failed', error_message='Card declined', failed_at=timezone.now(),
+        )
+
+        with mock.patch.object(self.gateway, 'create_intent', return_value=intent):
+            response = self.create_payment()
+
+        self.assertEqual(response.status_code, 201)
+        payment = Payment.objects.get()
+        self.assertEqual((payment.status, payment.amount), ('created', self.order.total))
+        self.assertEqual(payment.stripe_client_secret, intent['client_secret'])
+        self.assertIsNone(payment.error_message)
+        self.assertEqual(self.create_payment().json()['payment_intent_id'], intent['id'])
+
+    def test_concurrent_first_attempt_reads_the_stored_intent(self):
+        create_intent = self.gateway.create_intent
+
+        def lose_the_race(order, *args, **kwargs):
+            # the other request, sending the same idempotency key, stores the intent first
+            intent = create_intent(order, *args, **kwargs)
+            Payment.objects.create(
+                order=order, stripe_payment_intent_id=intent['id'], stripe_client_secret=intent['client_secret'],
+                amount=order.total,
+            )
+            return intent
+
+        with mock.patch.object(self.gateway, 'create_intent', side_effect=lose_the_race):
+            response = self.create_payment()
+
+        self.assertEqual(response.status_code, 201)
+        payment = Payment.objects.get()
+        self.assertEqual(response.json()['payment_intent_id'], payment.stripe_payment_intent_id)
+        self.assertEqual(response.json()['client_secret'], payment.stripe_client_secret)
+        self.assertEqual(payment.status, 'created')
+
+    def test_paid_order_is_rejected(self):
+        intent_id = self.create_payment().json()['payment_intent_id']
+        Payment.objects.filter(stripe_payment_intent_id=intent_id).update(status='succeeded')
+
+        response = self.create_payment()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.gateway.intents), 1)
+
+
+class ReconcilePaymentsTests(TestCase):
+
+    INTENTS = {
+        'pi_paid': {'status': 'succeeded', 'latest_charge': 'ch_paid'},
+        'pi_canceled': {'status': 'canceled'},
+        'pi_declined': {'status': 'requires_payment_method', 'last_payment_error': {'message': 'Card declined'}},
+        'pi_3ds': {'status': 'requires_action'},
+        'pi_processing': {'status': 'processing'},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(email='stale@example.com', password='x')
+        cls.orders = {}
+        for intent_id in [*cls.INTENTS, 'pi_missing', 'pi_recent']:
+            order = Order.objects.create(
+                user=user, shipping_name='Stale', shipping_phone='9999999999', shipping_email=user.email,
+                subtotal=Decimal('100.00'), total=Decimal('205.00'), payment_method='card',
+            )
+            Payment.objects.create(
+                order=order, stripe_payment_intent_id=intent_id, stripe_client_secret=f'{intent_id}_secret',
+                amount=order.total,
+            )
+            cls.orders[intent_id] = order
+        Payment.objects.exclude(stripe_payment_intent_id='pi_recent').update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+
+    def retrieve_intent(self, intent_id):
+        if intent_id not in self.INTENTS:
+            raise stripe.InvalidRequestError(f'No such payment_intent: {intent_id}', 'intent')
+        return {'id': intent_id, **self.INTENTS[intent_id]}
+
+    def reconcile(self, **kwargs):
+        fake = mock.Mock(retrieve_intent=mock.Mock(side_effect=self.retrieve_intent))
+        with mock.patch('payments.reconcile.get_gateway', return_value=fake):
+            return reconcile.reconcile(batch_size=2, workers=3, **kwargs), fake
+
+    def status_of(self, intent_id):
+        return Payment.objects.get(stripe_payment_intent_id=intent_id).status
+
+    def test_stale_payments_follow_their_intents(self):
+        report, fake = self.reconcile()
+
+        self.assertEqual(report.checked, 6)
+        self.assertEqual(fake.retrieve_intent.call_count, 6)
+        self.assertEqual(report.outcomes, {'succeeded': 1, 'failed': 2, 'requires_action': 1, 'unchanged': 1})
+        self.assertEqual([intent_id for intent_id, _ in report.errors], ['pi_missing'])
+
+        self.assertEqual(self.status_of('pi_paid'), 'succeeded')
+        self.assertEqual(self.status_of('pi_canceled'), 'failed')
+        self.assertEqual(Payment.objects.get(stripe_payment_intent_id='pi_declined').error_message, 'Card declined')
+        self.assertEqual(self.status_of('pi_3ds'), 'requires_action')
+        self.assertEqual(self.status_of('pi_processing'), 'created')
+        self.assertEqual(self.status_of('pi_missing'), 'created')
+        self.assertEqual(self.status_of('pi_recent'), 'created')
+
+        paid = Order.objects.get(pk=self.orders['pi_paid'].pk)
+        self.assertEqual((paid.status, paid.payment_status), ('confirmed', 'completed'))
+        self.assertEqual(list(OrderTracking.objects.values_list('order_id', flat=True)), [paid.pk])
+
+    def test_second_run_only_revisits_open_payments(self):
+        self.reconcile()
+        report, _ = self.reconcile()
+
+        self.assertEqual(report.checked, 3)  # 3ds, processing, missing (recent is too new)
+        self.assertEqual(report.outcomes, {'unchanged': 2})
+        self.assertEqual(OrderTracking.objects.count(), 1)
+
+    def test_payment_settled_meanwhile_is_left_alone(self):
+        apply = reconcile._apply
+
+        def settle_then_apply(page, fetched, report):
+            # The webhook worker gets there between the fetch and the apply
+            Payment.objects.filter(stripe_payment_intent_id='pi_canceled').update(status='succeeded')
+            apply(page, fetched, report)
+
+        with mock.patch('payments.reconcile._apply', settle_then_apply):
+            report, _ = self.reconcile()
+
+        self.assertEqual(report.outcomes['failed'], 1)
+        self.assertEqual(self.status_of('pi_canceled'), 'succeeded')
+
+    def test_command_prints_a_summary(self):
+        out = StringIO()
+        fake = mock.Mock(retrieve_intent=mock.Mock(side_effect=self.retrieve_intent))
+        with mock.patch('payments.reconcile.get_gateway', return_value=fake):
+            call_command('reconcile_payments', '--workers', '2', stdout=out)
+
+        self.assertIn('Checked 6 open payments', out.getvalue())
+        self.assertIn('succeeded        1', out.getvalue())
+        self.assertIn('pi_missing', out.getvalue())
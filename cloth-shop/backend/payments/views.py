@@ -1,4 +1,5 @@
 # payments/views.py
+import json
 import stripe
 import logging
 from decimal import Decimal
@@ -7,9 +8,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from django.utils import timezone
+from django.db import IntegrityError, transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
+from . import handlers, inbox
+from .gateway import CURRENCY, get_gateway
 from .models import Payment, Refund
 from .serializers import (
     PaymentSerializer,
@@ -19,17 +22,24 @@ from .serializers import (
     RefundRequestSerializer,
     PaymentIntentResponseSerializer,
 )
-from orders.models import Order, OrderTracking
+from orders.models import Order
 
 logger = logging.getLogger(__name__)
-stripe.api_key = settings.STRIPE_SECRET_KEY
+
+# Payment statuses whose intent can still be paid, with the matching
+# Stripe intent status
+OPEN_INTENT_STATUS = {
+    'created': 'requires_payment_method',
+    'requires_action': 'requires_action',
+}
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_payment(request):
     """
-    Create a Stripe PaymentIntent for an order.
+    Create a Stripe PaymentIntent for an order, or return the order's open
+    one (updating its amount if the order total changed).
     Demo test cards:
     - 4242 4242 4242 4242 (Success)
     - 5555 5555 5555 4444 (Visa)
@@ -44,60 +54,93 @@ def create_payment(request):
         order_id = serializer.validated_data['order_id']
         receipt_email = serializer.validated_data.get('receipt_email', request.user.email)
 
-        try:
-            order = Order.objects.get(id=order_id, user=request.user)
-        except Order.DoesNotExist:
-            return Response(
-                {'error': 'Order not found'},
-                status=status.HTTP_404_NOT_FOUND
+        with transaction.atomic():
+            # Short claim step: lock the order only to read its payments.
+            # The gateway is called after the lock is released; concurrent
+            # clicks of one attempt send the same idempotency key, so they
+            # still share one intent
+            try:
+                order = Order.objects.select_for_update().get(id=order_id, user=request.user)
+            except Order.DoesNotExist:
+                return Response(
+                    {'error': 'Order not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # Check if payment already exists for this order; the failed
+            # ones count as earlier attempts
+            payments = list(Payment.objects.filter(order=order).order_by('-created_at'))
+            existing_payment = next(
+                (payment for payment in payments if payment.status in ('succeeded', *OPEN_INTENT_STATUS)), None
             )
 
-        # Check if payment already exists for this order
-        existing_payment = Payment.objects.filter(
-            order=order,
-            status__in=['created', 'succeeded']
-        ).first()
-
         if existing_payment and existing_payment.status == 'succeeded':
             return Response(
                 {'error': 'Order already paid'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create Stripe PaymentIntent
-        intent = stripe.PaymentIntent.create(
-            amount=int(order.total * 100),  # Convert to cents
-            currency='usd',
+        if existing_payment:
+            # Reuse the open intent; only an amount change needs Stripe
+            intent_status = OPEN_INTENT_STATUS[existing_payment.status]
+            if existing_payment.amount != order.total:
+                intent = get_gateway().update_intent(existing_payment.stripe_payment_intent_id, order.total)
+                intent_status = intent['status']
+                Payment.objects.filter(pk=existing_payment.pk).update(amount=order.total)
+                logger.info("PaymentIntent updated: %s for order %s", intent['id'], order.order_number)
+
+            response_serializer = PaymentIntentResponseSerializer({
+                'client_secret': existing_payment.stripe_client_secret,
+                'payment_intent_id': existing_payment.stripe_payment_intent_id,
+                'amount': order.total,
+                'currency': existing_payment.currency,
+                'status': intent_status
+            })
+            return Response(response_serializer.data)
+
+        # Create Stripe PaymentIntent; a new attempt gets a fresh intent
+        intent = get_gateway().create_intent(
+            order,
+            order.total,
             receipt_email=receipt_email,
             metadata={
                 'order_id': order.id,
                 'order_number': order.order_number,
                 'user_id': request.user.id,
             },
-            statement_descriptor_suffix='Order'
+            attempt=len(payments),
         )
 
-        # Create or update Payment record
-        payment, created = Payment.objects.get_or_create(
-            stripe_payment_intent_id=intent['id'],
-            defaults={
-                'order': order,
-                'stripe_client_secret': intent['client_secret'],
-                'amount': order.total,
-                'currency': 'usd',
-                'receipt_email': receipt_email,
-                'status': 'created',
-                'metadata': {'intent_created': True}
-            }
-        )
+        # Create the Payment record. The intent may already be stored: a
+        # concurrent first attempt sent the same idempotency key and won the
+        # insert, or the gateway handed back an intent seen before. Re-read
+        # that row, starting it over if it is terminal
+        defaults = {
+            'order': order,
+            'stripe_client_secret': intent['client_secret'],
+            'amount': order.total,
+            'currency': CURRENCY,
+            'receipt_email': receipt_email,
+            'status': 'created',
+            'metadata': {'intent_created': True}
+        }
+        try:
+            with transaction.atomic():
+                Payment.objects.create(stripe_payment_intent_id=intent['id'], **defaults)
+        except IntegrityError:
+            payment = Payment.objects.get(stripe_payment_intent_id=intent['id'])
+            if payment.status not in OPEN_INTENT_STATUS:
+                for field, value in {**defaults, 'error_message': None, 'failed_at': None}.items():
+                    setattr(payment, field, value)
+                payment.save()
 
-        logger.info(f"PaymentIntent created: {intent['id']} for order {order.order_number}")
+        logger.info("PaymentIntent created: %s for order %s", intent['id'], order.order_number)
 
         response_serializer = PaymentIntentResponseSerializer({
             'client_secret': intent['client_secret'],
             'payment_intent_id': intent['id'],
             'amount': order.total,
-            'currency': 'usd',
+            'currency': CURRENCY,
             'status': intent['status']
         })
 
@@ -138,17 +181,15 @@ def confirm_payment(request):
             )
 
         # Retrieve current intent status from Stripe
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        intent = get_gateway().retrieve_intent(payment_intent_id)
 
         if intent['status'] == 'succeeded':
-            # Payment already succeeded
-            charge_id = intent.get('latest_charge')
-            if not charge_id and intent.get('charges') and intent['charges'].get('data'):
-                charge_id = intent['charges']['data'][0].get('id')
-            
-            payment.mark_succeeded(charge_id)
-            _update_order_status(payment.order, 'confirmed', 'payment_confirmed')
-            
+            # Payment already succeeded; a repeated confirm (or one racing
+            # the webhook) records nothing twice
+            if payment.status != 'succeeded':
+                payment.mark_succeeded(handlers.charge_id_of(intent))
+            handlers.record_paid([payment])
+
             serializer = PaymentSerializer(payment)
             return Response(serializer.data)
 
@@ -291,7 +332,8 @@ def get_payment(request, order_id):
 @csrf_exempt
 def stripe_webhook(request):
     """
-    Handle Stripe webhooks for payment confirmations and refunds.
+    Receive Stripe webhooks: verify the signature, queue the event in the
+    inbox (payments.inbox) and acknowledge.
     """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
@@ -309,85 +351,7 @@ def stripe_webhook(request):
         logger.error(f"Invalid webhook signature: {str(e)}")
         return JsonResponse({'error': 'Invalid signature'}, status=400)
 
-    # Handle different event types
-    if event['type'] == 'payment_intent.succeeded':
-        _handle_payment_succeeded(event['data']['object'])
-
-    elif event['type'] == 'payment_intent.payment_failed':
-        _handle_payment_failed(event['data']['object'])
-
-    elif event['type'] == 'charge.refunded':
-        _handle_charge_refunded(event['data']['object'])
-
-    elif event['type'] == 'charge.dispute.created':
-        _handle_dispute_created(event['data']['object'])
-
+    # Acknowledge straight away; process_stripe_events does the work and
+    # redelivered event ids are dropped by the inbox's unique index
+    inbox.store(json.loads(payload))
     return JsonResponse({'status': 'success'})
-
-
-def _handle_payment_succeeded(intent):
-    """Handle successful payment."""
-    try:
-        payment = Payment.objects.get(stripe_payment_intent_id=intent['id'])
-        
-        if payment.status != 'succeeded':
-            charge_id = intent.get('latest_charge')
-            if not charge_id and intent.get('charges') and intent['charges'].get('data'):
-                charge_id = intent['charges']['data'][0].get('id')
-            
-            payment.mark_succeeded(charge_id)
-            _update_order_status(payment.order, 'confirmed', 'payment_confirmed')
-            logger.info(f"Payment succeeded: {intent['id']}")
-    except Payment.DoesNotExist:
-        logger.warning(f"Payment record not found for intent: {intent['id']}")
-
-
-def _handle_payment_failed(intent):
-    """Handle failed payment."""
-    try:
-        payment = Payment.objects.get(stripe_payment_intent_id=intent['id'])
-        
-        error_msg = intent.get('last_payment_error', {}).get('message', 'Payment failed')
-        payment.mark_failed(error_msg, error_data=intent)
-        logger.error(f"Payment failed: {intent['id']} - {error_msg}")
-    except Payment.DoesNotExist:
-        logger.warning(f"Payment record not found for intent: {intent['id']}")
-
-
-def _handle_charge_refunded(charge):
-    """Handle refunded charge."""
-    try:
-        payment = Payment.objects.get(stripe_charge_id=charge['id'])
-        
-        # Find pending refund
-        refund = Refund.objects.filter(
-            payment=payment,
-            status='processing'
-        ).first()
-
-        if refund:
-            # Get refund ID from charge
-            refund_id = charge['refunds']['data'][0]['id'] if charge['refunds']['data'] else None
-            refund.mark_succeeded(refund_id)
-            logger.info(f"Refund succeeded: {refund_id}")
-    except Payment.DoesNotExist:
-        logger.warning(f"Payment record not found for charge: {charge['id']}")
-
-
-def _handle_dispute_created(dispute):
-    """Handle chargeback/dispute."""
-    logger.warning(f"Dispute created for charge: {dispute['charge']}")
-
-
-def _update_order_status(order, status, tracking_status):
-    """Helper to update order status and tracking."""
-    order.status = status
-    order.payment_status = 'completed'
-    order.payment_date = timezone.now()
-    order.save()
-
-    OrderTracking.objects.create(
-        order=order,
-        status=tracking_status,
-        description=f'Payment confirmed successfully'
-    )
\ No newline at end of file
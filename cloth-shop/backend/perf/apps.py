@@ -0,0 +1,13 @@
+# perf/apps.py
+from django.apps import AppConfig
+
+
+class PerfConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'perf'
+
+    def ready(self):
+        from . import metrics
+
+        if metrics.get_setting('ENABLED', True):
+            metrics.install_serializer_timing()
@@ -0,0 +1,377 @@
+# perf/benchmarks.py
+"""
+Endpoint benchmark harness.
+
+Seeds a small deterministic dataset (via ``seed_perf_data``), hits the hot
+storefront/admin endpoints with Django's test client and records p50/p95
+latency and SQL query counts per endpoint. Results are compared against the
+budgets checked in at ``perf/benchmark_baseline.json``.
+
+Used by ``perf.tests`` (``manage.py test perf``) and the ``run_benchmarks``
+management command.
+"""
+import gc
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Optional
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+# Dataset used for budgeted runs. Query counts depend on data shape, so the
+# baseline is only meaningful against exactly this profile.
+DATASET = {
+    'users': 40,
+    'products': 48,
+    'colors': 3,
+    'images': 2,
+    'orders': 400,
+    'reviews': 120,
+    'carts': 0.5,
+    'seed': 1234,
+}
+
+# Extra headroom applied to measured latency when writing a new baseline, so
+# the budget tolerates slower CI machines but still catches big regressions.
+LATENCY_HEADROOM = 3.0
+LATENCY_FLOOR_MS = 25.0
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: Callable[['BenchmarkContext'], str]
+    auth: str = 'anon'  # anon, user or admin
+    data: Optional[Callable[['BenchmarkContext'], dict]] = None
+    setup: Optional[Callable[['BenchmarkContext'], None]] = None
+    expect: int = 200
+
+
+@dataclass
+class BenchmarkContext:
+    user: object
+    admin: object
+    product: object
+    address: object
+    cart_lines: list = field(default_factory=list)
+
+
+@dataclass
+class Result:
+    name: str
+    timings_ms: list
+    queries: int
+    status_code: int
+
+    @property
+    def p50_ms(self):
+        return percentile(self.timings_ms, 50)
+
+    @property
+    def p95_ms(self):
+        return percentile(self.timings_ms, 95)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; good enough for a few dozen samples."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _fill_cart(ctx):
+    from cart import holds
+    from cart.models import Cart, CartItem
+
+    cart, _ = Cart.objects.get_or_create(user=ctx.user)
+    holds.release_items(cart.items.values_list('id', flat=True))
+    cart.items.all().delete()
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product_id=product_id, color_variant_id=variant_id, size=size, quantity=1)
+        for product_id, variant_id, size in ctx.cart_lines
+    ])
+
+
+def _cart_quantity_changes(ctx):
+    from cart.models import CartItem
+
+    # Filled once so item ids stay stable; each iteration only resets quantities
+    _fill_cart(ctx)
+    item_ids = CartItem.objects.filter(cart__user=ctx.user).values_list('id', flat=True)
+    return {'items': [{'item_id': item_id, 'quantity': 2} for item_id in item_ids]}
+
+
+def _reset_cart_quantities(ctx):
+    from cart.models import CartItem
+
+    CartItem.objects.filter(cart__user=ctx.user).update(quantity=1)
+
+
+def _empty_cart(ctx):
+    from cart import holds
+    from cart.models import CartItem
+
+    items = CartItem.objects.filter(cart__user=ctx.user)
+    holds.release_items(items.values_list('id', flat=True))
+    items.delete()
+
+
+def _pending_order(ctx):
+    from orders.models import Order
+
+    order = Order.objects.create(
+        user=ctx.user, shipping_address=ctx.address, shipping_name=ctx.address.name,
+        shipping_phone=ctx.address.phone, shipping_email=ctx.user.email,
+        subtotal=1000, total=1050, payment_method='card',
+    )
+    return {'order_id': order.id}
+
+
+def _tracking_path(ctx):
+    from orders.models import Order
+
+    order = Order.objects.filter(user=ctx.user).order_by('-created_at').first()
+    return f'/api/orders/{order.id}/track/'
+
+
+def _clear_payments(ctx):
+    from payments.models import Payment
+
+    # Without this every iteration after the first reuses the open intent
+    Payment.objects.filter(order__user=ctx.user).delete()
+
+
+ENDPOINTS = [
+    Endpoint('product_list', 'get', lambda ctx: '/api/products/products/'),
+    Endpoint('product_detail', 'get', lambda ctx: f'/api/products/products/{ctx.product.slug}/'),
+    Endpoint('product_search', 'get', lambda ctx: '/api/products/search/?q=Classic'),
+    Endpoint('product_related', 'get', lambda ctx: f'/api/products/products/{ctx.product.slug}/related/'),
+    Endpoint('cart_get', 'get', lambda ctx: '/api/cart/', auth='user', setup=_fill_cart),
+    Endpoint(
+        'cart_add', 'post', lambda ctx: '/api/cart/add/', auth='user', setup=_empty_cart, expect=201,
+        data=lambda ctx: {
+            'product_id': ctx.cart_lines[0][0],
+            'variant_id': ctx.cart_lines[0][1],
+            'size': ctx.cart_lines[0][2],
+            'quantity': 1,
+        },
+    ),
+    Endpoint(
+        'cart_update_items', 'patch', lambda ctx: '/api/cart/items/', auth='user',
+        setup=_reset_cart_quantities, data=_cart_quantity_changes,
+    ),
+    Endpoint(
+        'create_order', 'post', lambda ctx: '/api/orders/create/', auth='user', setup=_fill_cart, expect=201,
+        data=lambda ctx: {'address_id': ctx.address.id, 'payment_method': 'cod'},
+    ),
+    Endpoint('my_orders', 'get', lambda ctx: '/api/orders/my-orders/', auth='user'),
+    Endpoint('admin_orders', 'get', lambda ctx: '/api/orders/', auth='admin'),
+    Endpoint('order_tracking', 'get', _tracking_path, auth='user'),
+    Endpoint('payment_create', 'post', lambda ctx: '/api/payments/create/', auth='user', expect=201,
+             setup=_clear_payments, data=_pending_order),
+    Endpoint(
+        'viewer_state', 'get', auth='user', setup=_fill_cart,
+        path=lambda ctx: '/api/products/viewer-state/?ids=' + ','.join(str(line[0]) for line in ctx.cart_lines),
+    ),
+    Endpoint('dashboard_stats', 'get', lambda ctx: '/api/admin-panel/dashboard-stats/', auth='admin'),
+    Endpoint('home_banners', 'get', lambda ctx: '/api/products/banners/'),
+    Endpoint('home_category_cards', 'get', lambda ctx: '/api/products/category-cards/'),
+    Endpoint('home_mens_hoodie_grid', 'get', lambda ctx: '/api/products/mens-hoodie-grid/'),
+    Endpoint('home_jackets_grid', 'get', lambda ctx: '/api/products/jackets-grid/'),
+    Endpoint('home_tshirt_grid', 'get', lambda ctx: '/api/products/tshirt-grid/'),
+    Endpoint('home_shoes_grid', 'get', lambda ctx: '/api/products/shoes-grid/'),
+]
+
+
+def prepare_dataset():
+    """Seed the benchmark dataset into the current database and return a context."""
+    from products.models import (
+        Banner, CategoryCard, MensHoodieGrid, JacketsGrid, TshirtGrid, ShoesGrid, SizeStock
+    )
+    from users.models import CustomUser
+
+    call_command('seed_perf_data', stdout=StringIO(), **DATASET)
+
+    image = 'https://res.cloudinary.com/demo/image/upload/v1/perf/home.jpg'
+    Banner.objects.bulk_create([Banner(title=f'Slide {i}', image=image, order=i) for i in range(4)])
+    CategoryCard.objects.bulk_create([CategoryCard(title=f'Card {i}', image=image, order=i) for i in range(6)])
+    MensHoodieGrid.objects.bulk_create([MensHoodieGrid(title=f'Hoodie {i}', image=image, position=i) for i in range(1, 6)])
+    JacketsGrid.objects.bulk_create([JacketsGrid(title=f'Jacket {i}', image=image, position=i) for i in range(1, 6)])
+    TshirtGrid.objects.bulk_create([TshirtGrid(title=f'Tee {i}', image=image, order=i) for i in range(8)])
+    ShoesGrid.objects.bulk_create([ShoesGrid(title=f'Shoe {i}', image=image, order=i) for i in range(6)])
+
+    user = CustomUser.objects.filter(email__endswith='@perf.example.com').order_by('id').first()
+    admin = CustomUser.objects.create_superuser(email='bench-admin@perf.example.com', password='perf-password')
+    stocks = (
+        SizeStock.objects.filter(quantity__gte=10, variant__product__is_active=True)
+        .select_related('variant').order_by('id')[:3]
+    )
+    return BenchmarkContext(
+        user=user,
+        admin=admin,
+        product=stocks[0].variant.product,
+        address=user.addresses.first(),
+        cart_lines=[(stock.variant.product_id, stock.variant_id, stock.size) for stock in stocks],
+    )
+
+
+def run(ctx, endpoints=None, iterations=20, warmup=2):
+    """Run each endpoint ``iterations`` times and return a list of ``Result``."""
+    client = Client()
+    tokens = {
+        'anon': None,
+        'user': str(AccessToken.for_user(ctx.user)),
+        'admin': str(AccessToken.for_user(ctx.admin)),
+    }
+    results = []
+    # Rate limits would turn later iterations into 429s, and one access log
+    # line per iteration only buries the report.
+    request_log = logging.getLogger('perf.requests')
+    level = request_log.level
+    request_log.setLevel(logging.WARNING)
+    try:
+        # Payments go through the in-process fake gateway, never the network
+        with mock.patch.object(APIView, 'check_throttles', lambda self, request: None), \
+                override_settings(PAYMENT_GATEWAY='payments.gateway.FakeGateway'):
+            for endpoint in endpoints or ENDPOINTS:
+                results.append(_run_endpoint(client, ctx, endpoint, tokens[endpoint.auth], iterations, warmup))
+    finally:
+        request_log.setLevel(level)
+    return results
+
+
+def _run_endpoint(client, ctx, endpoint, token, iterations, warmup):
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+    path = endpoint.path(ctx)
+    data = endpoint.data(ctx) if endpoint.data else None
+    call = getattr(client, endpoint.method)
+    timings = []
+    queries = 0
+    status_code = None
+
+    # Like timeit: a full GC pass (tens of ms once the dataset is loaded)
+    # landing in one iteration would decide p95 on its own.
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(warmup + iterations):
+            if endpoint.setup:
+                endpoint.setup(ctx)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if data is None:
+                    response = call(path, **headers)
+                else:
+                    response = call(path, data, content_type='application/json', **headers)
+                elapsed = (time.perf_counter() - started) * 1000
+            status_code = response.status_code
+            if status_code != endpoint.expect:
+                raise AssertionError(
+                    f'{endpoint.name}: expected {endpoint.expect}, got {status_code}: {response.content[:300]!r}'
+                )
+            if i >= warmup:
+                timings.append(elapsed)
+                queries = max(queries, len(captured.captured_queries))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return Result(endpoint.name, timings, queries, status_code)
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def write_baseline(results, path=BASELINE_PATH, raise_queries=False):
+    """
+    Write budgets for ``results``; other endpoints keep their current budgets.
+
+    A query budget is the intended query count of the endpoint, so measuring
+    more queries than it allows never raises it unless ``raise_queries`` is
+    set (the extra queries are deliberate). Fewer queries lower it. Returns
+    the names of endpoints whose budget was held back.
+    """
+    budgets = {}
+    if Path(path).exists():
+        current = load_baseline(path)
+        if current.get('dataset') == DATASET:
+            names = {endpoint.name for endpoint in ENDPOINTS}
+            budgets = {name: budget for name, budget in current['endpoints'].items() if name in names}
+    held_back = []
+    for result in results:
+        max_queries = result.queries
+        if result.name in budgets and not raise_queries and max_queries > budgets[result.name]['max_queries']:
+            max_queries = budgets[result.name]['max_queries']
+            held_back.append(result.name)
+        budgets[result.name] = {
+            'max_queries': max_queries,
+            'p95_ms': round(max(result.p95_ms * LATENCY_HEADROOM, LATENCY_FLOOR_MS), 1),
+        }
+    with open(path, 'w') as fh:
+        json.dump({'dataset': DATASET, 'endpoints': budgets}, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+    return held_back
+
+
+def compare(results, baseline, check_latency=True):
+    """Return a list of human readable budget violations (empty when all pass)."""
+    failures = []
+    budgets = baseline.get('endpoints', {})
+    for result in results:
+        budget = budgets.get(result.name)
+        if budget is None:
+            failures.append(f'{result.name}: no budget in baseline')
+            continue
+        if result.queries > budget['max_queries']:
+            failures.append(f'{result.name}: {result.queries} queries > budget {budget["max_queries"]}')
+        if check_latency and result.p95_ms > budget['p95_ms']:
+            failures.append(f'{result.name}: p95 {result.p95_ms:.1f}ms > budget {budget["p95_ms"]}ms')
+    return failures
+
+
+def recheck_latency(ctx, results, baseline, iterations=30):
+    """
+    Re-measure endpoints whose p95 is over budget with more iterations.
+
+    With a handful of samples p95 is effectively the slowest request, so one
+    scheduler hiccup fails a run; a real regression stays slow when sampled
+    again. Query counts are deterministic and never re-run.
+    """
+    budgets = baseline.get('endpoints', {})
+    by_name = {endpoint.name: endpoint for endpoint in ENDPOINTS}
+    slow = [
+        by_name[result.name] for result in results
+        if result.name in budgets and result.name in by_name and result.p95_ms > budgets[result.name]['p95_ms']
+    ]
+    if not slow:
+        return results
+    rerun = {result.name: result for result in run(ctx, slow, iterations=iterations)}
+    return [rerun.get(result.name, result) for result in results]
+
+
+def format_table(results, baseline=None):
+    budgets = (baseline or {}).get('endpoints', {})
+    lines = [f'{"endpoint":<24}{"p50 ms":>10}{"p95 ms":>10}{"queries":>10}{"budget q":>10}{"budget p95":>12}']
+    for result in results:
+        budget = budgets.get(result.name, {})
+        lines.append(
+            f'{result.name:<24}{result.p50_ms:>10.1f}{result.p95_ms:>10.1f}{result.queries:>10}'
+            f'{budget.get("max_queries", "-"):>10}{budget.get("p95_ms", "-"):>12}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,58 @@
+# perf/management/commands/run_benchmarks.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from perf import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot endpoints against a seeded test database and check the checked-in budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only run these endpoints')
+        parser.add_argument('--no-latency', action='store_true', help='Only enforce query-count budgets')
+        parser.add_argument('--update-baseline', action='store_true', help='Write current results as the new budgets')
+        parser.add_argument('--raise-query-budgets', action='store_true',
+                            help='With --update-baseline, also raise query budgets an endpoint now exceeds')
+
+    def handle(self, *args, **options):
+        endpoints = benchmarks.ENDPOINTS
+        if options['endpoints']:
+            endpoints = [e for e in endpoints if e.name in options['endpoints']]
+            if not endpoints:
+                raise CommandError('No matching endpoints')
+
+        # Always run against a throwaway test database seeded with the fixed
+        # benchmark profile, so numbers are comparable with the baseline.
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            ctx = benchmarks.prepare_dataset()
+            results = benchmarks.run(ctx, endpoints, options['iterations'], options['warmup'])
+            if not options['update_baseline'] and not options['no_latency']:
+                results = benchmarks.recheck_latency(ctx, results, benchmarks.load_baseline())
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['update_baseline']:
+            held_back = benchmarks.write_baseline(results, raise_queries=options['raise_query_budgets'])
+            self.stdout.write(benchmarks.format_table(results, benchmarks.load_baseline()))
+            if held_back:
+                self.stdout.write(self.style.WARNING(
+                    '\nQuery budgets kept for ' + ', '.join(held_back)
+                    + '; fix the extra queries or pass --raise-query-budgets if they are intended'
+                ))
+            self.stdout.write(self.style.SUCCESS(f'\nBaseline written to {benchmarks.BASELINE_PATH}'))
+            return
+
+        baseline = benchmarks.load_baseline()
+        self.stdout.write(benchmarks.format_table(results, baseline))
+        failures = benchmarks.compare(results, baseline, check_latency=not options['no_latency'])
+        if failures:
+            raise CommandError('Benchmark budgets exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('\nAll endpoints within budget.'))
@@ -0,0 +1,155 @@
+# perf/metrics.py
+"""
+In-process request metrics.
+
+``RequestMetrics`` collects per-request numbers (DB queries/time, serializer
+time) while a request is in flight; ``EndpointStats`` keeps a rolling
+histogram per route. The registry is per process, so under gunicorn each
+worker reports its own view of the traffic it served.
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('perf_request_metrics', default=None)
+
+
+def get_setting(name, default=None):
+    return getattr(settings, 'PERF_METRICS', {}).get(name, default)
+
+
+class RequestMetrics:
+    """Numbers gathered for a single request."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self._serializer_depth = 0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook that times every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def current():
+    """Metrics of the request being handled on this thread/task, if any."""
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def _timed_data(prop):
+    """Wrap ``Serializer.data`` so only the outermost call is timed."""
+    fget = prop.fget
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return fget(self)
+        metrics._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            metrics._serializer_depth -= 1
+            if metrics._serializer_depth == 0:
+                metrics.serializer_time += time.perf_counter() - started
+
+    data._perf_timed = True
+    return property(data)
+
+
+def install_serializer_timing():
+    """Time DRF serialization. Called once from ``PerfConfig.ready``."""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, '_perf_timed', False):
+            cls.data = _timed_data(prop)
+
+
+class EndpointStats:
+    """Rolling latency histogram and totals for one route."""
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.db_queries = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+
+    def record(self, total_ms, db_ms, db_queries, status_code):
+        self.count += 1
+        self.errors += status_code >= 500
+        self.total_ms += total_ms
+        self.db_ms += db_ms
+        self.db_queries += db_queries
+        self.buckets[bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+        self.recent.append(total_ms)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            if not recent:
+                return None
+            return round(recent[min(len(recent) - 1, int(p / 100 * len(recent)))], 2)
+
+        labels = [f'<={bound}ms' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}ms']
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'avg_db_ms': round(self.db_ms / self.count, 2) if self.count else None,
+            'avg_queries': round(self.db_queries / self.count, 2) if self.count else None,
+            'p50_ms': pct(50),
+            'p95_ms': pct(95),
+            'p99_ms': pct(99),
+            'histogram': dict(zip(labels, self.buckets)),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, route, total_ms, db_ms, db_queries, status_code):
+        with self._lock:
+            stats = self._stats.get(route)
+            if stats is None:
+                stats = self._stats[route] = EndpointStats(get_setting('WINDOW', 500))
+            stats.record(total_ms, db_ms, db_queries, status_code)
+
+    def snapshot(self):
+        with self._lock:
+            return {route: stats.snapshot() for route, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = Registry()
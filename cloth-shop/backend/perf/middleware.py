@@ -0,0 +1,130 @@
+# perf/middleware.py
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import metrics, queries
+
+logger = logging.getLogger('perf.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request: wall time, DB query count and time, DRF
+    serializer time and response size.
+
+    Adds a ``Server-Timing`` header, logs one structured line per request (at
+    ``PERF_METRICS['LOG_LEVEL']``, DEBUG unless configured) and feeds the
+    per-route histogram served by the admin metrics endpoint. Should be the
+    first entry in MIDDLEWARE so the total covers the others. Sync and async
+    capable, like Django's own middleware, so an ASGI server does not put an
+    adapter in front of every request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.get_setting('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.server_timing = metrics.get_setting('SERVER_TIMING', True)
+        self.log_level = logging.getLevelName(metrics.get_setting('LOG_LEVEL', 'DEBUG').upper())
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, request_metrics, started)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics.db_wrapper):
+                response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, response, request_metrics, started)
+
+    def finish(self, request, response, request_metrics, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = request_metrics.db_time * 1000
+        serializer_ms = request_metrics.serializer_time * 1000
+        route = self.route_name(request)
+        size = None if response.streaming else len(response.content)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{request_metrics.db_queries} queries", '
+                f'ser;dur={serializer_ms:.1f}, total;dur={total_ms:.1f}'
+            )
+        metrics.registry.record(route, total_ms, db_ms, request_metrics.db_queries, response.status_code)
+        logger.log(
+            self.log_level,
+            'route=%s method=%s status=%s total_ms=%.1f db_ms=%.1f queries=%d ser_ms=%.1f bytes=%s',
+            route, request.method, response.status_code, total_ms, db_ms,
+            request_metrics.db_queries, serializer_ms, size,
+        )
+        return response
+
+    @staticmethod
+    def route_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
+
+
+class QueryInspectorMiddleware:
+    """
+    Opt-in N+1 / slow query detection per request (settings.PERF_QUERY_INSPECTOR).
+
+    Logs repeated query shapes with their call sites, or raises
+    ``DuplicateQueryError`` when ``RAISE`` is set so CI runs fail loudly.
+    Sync and async capable.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not queries.get_setting('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.raise_on_duplicates = queries.get_setting('RAISE', False)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        inspector = queries.QueryInspector()
+        with connection.execute_wrapper(inspector):
+            response = self.get_response(request)
+        return self.finish(request, response, inspector)
+
+    async def __acall__(self, request):
+        inspector = queries.QueryInspector()
+        with connection.execute_wrapper(inspector):
+            response = await self.get_response(request)
+        return self.finish(request, response, inspector)
+
+    def finish(self, request, response, inspector):
+        report = inspector.log(f'{request.method} {request.path}', duplicates=not self.raise_on_duplicates)
+        if report and self.raise_on_duplicates:
+            raise queries.DuplicateQueryError(report)
+        return response
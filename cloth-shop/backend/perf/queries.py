@@ -0,0 +1,136 @@
+# perf/queries.py
+"""
+Duplicate (N+1) and slow query detection.
+
+``QueryInspector`` is a ``connection.execute_wrapper`` hook that groups the
+queries of one unit of work (a request, a test block) by normalized SQL
+shape and remembers the first project call site of each shape. It is opt-in
+because resolving call sites walks the stack on every query.
+
+    with inspect_queries(threshold=3):       # raises DuplicateQueryError
+        client.get('/api/products/products/')
+"""
+import logging
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('perf.queries')
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+# Frames from these places are never reported as the call site.
+IGNORED_PATHS = (
+    'site-packages', 'dist-packages', 'manage.py',
+    __file__,
+    str(Path(__file__).with_name('middleware.py')),
+    str(Path(__file__).with_name('metrics.py')),
+)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class DuplicateQueryError(AssertionError):
+    """Raised when a query shape repeats more often than the threshold allows."""
+
+
+def get_setting(name, default=None):
+    return getattr(settings, 'PERF_QUERY_INSPECTOR', {}).get(name, default)
+
+
+def normalize_sql(sql):
+    """Reduce SQL to its shape: literals and placeholders become ``?``, IN lists collapse."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """Innermost frame inside the project (not Django, DRF or the inspector), as ``file:line in func``."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = frame.filename
+        if filename.startswith(PROJECT_ROOT) and not any(part in filename for part in IGNORED_PATHS):
+            return f'{Path(filename).relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class QueryShape:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.time = 0.0
+        self.sites = {}
+
+    def add(self, elapsed, site):
+        self.count += 1
+        self.time += elapsed
+        self.sites[site] = self.sites.get(site, 0) + 1
+
+
+class QueryInspector:
+    def __init__(self, threshold=None, slow_ms=None):
+        self.threshold = threshold if threshold is not None else get_setting('THRESHOLD', 5)
+        self.slow_ms = slow_ms if slow_ms is not None else get_setting('SLOW_MS', 100)
+        self.shapes = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            site = call_site()
+            shape = normalize_sql(sql)
+            entry = self.shapes.get(shape)
+            if entry is None:
+                entry = self.shapes[shape] = QueryShape(shape)
+            entry.add(elapsed, site)
+            if elapsed * 1000 >= self.slow_ms:
+                self.slow.append((elapsed * 1000, sql, site))
+
+    @property
+    def duplicates(self):
+        """Shapes that ran more than ``threshold`` times, worst first."""
+        return sorted(
+            (shape for shape in self.shapes.values() if shape.count > self.threshold),
+            key=lambda shape: shape.count, reverse=True,
+        )
+
+    def report(self, label):
+        lines = []
+        for shape in self.duplicates:
+            sites = ', '.join(f'{site} (x{count})' for site, count in shape.sites.items())
+            lines.append(f'{shape.count}x {shape.sql[:300]}\n    from {sites}')
+        if not lines:
+            return ''
+        return f'{label}: {len(lines)} repeated query shape(s) over threshold {self.threshold}\n' + '\n'.join(lines)
+
+    def log(self, label, duplicates=True):
+        for elapsed_ms, sql, site in self.slow:
+            logger.warning('%s: slow query %.1fms at %s: %s', label, elapsed_ms, site, sql[:500])
+        report = self.report(label)
+        if report and duplicates:
+            logger.warning('%s', report)
+        return report
+
+
+@contextmanager
+def inspect_queries(threshold=None, slow_ms=None, raise_on_duplicates=True, label='block'):
+    """Inspect queries run inside the block; raise or log when shapes repeat."""
+    inspector = QueryInspector(threshold, slow_ms)
+    with connection.execute_wrapper(inspector):
+        yield inspector
+    report = inspector.log(label, duplicates=not raise_on_duplicates)
+    if report and raise_on_duplicates:
+        raise DuplicateQueryError(report)
@@ -0,0 +1,226 @@
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+
+from django.conf import settings
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from perf import benchmarks, metrics
+from perf.middleware import QueryInspectorMiddleware, RequestMetricsMiddleware
+from perf.queries import DuplicateQueryError, inspect_queries, normalize_sql
+from products.models import Product
+from users.models import CustomUser
+
+
+class EndpointBenchmarkTests(TestCase):
+    """
+    Fails when a hot endpoint exceeds its checked-in query budget, or its
+    latency budget when BENCHMARK_LATENCY is set.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = benchmarks.prepare_dataset()
+
+    def test_endpoints_within_budget(self):
+        baseline = benchmarks.load_baseline()
+        results = benchmarks.run(self.ctx, iterations=10 if settings.BENCHMARK_LATENCY else 1)
+        if settings.BENCHMARK_LATENCY:
+            results = benchmarks.recheck_latency(self.ctx, results, baseline)
+        failures = benchmarks.compare(results, baseline, check_latency=settings.BENCHMARK_LATENCY)
+        self.assertEqual(failures, [], '\n' + benchmarks.format_table(results, baseline))
+
+    def test_every_endpoint_has_a_budget(self):
+        budgets = benchmarks.load_baseline()['endpoints']
+        self.assertEqual(sorted(budgets), sorted(e.name for e in benchmarks.ENDPOINTS))
+
+
+class WriteBaselineTests(SimpleTestCase):
+    """``--update-baseline`` refreshes latency but never raises a query budget by itself."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'baseline.json'
+        benchmarks.write_baseline([self.result('product_list', 6), self.result('cart_get', 11)], self.path)
+
+    def result(self, name, queries, timing_ms=10.0):
+        return benchmarks.Result(name, [timing_ms], queries, 200)
+
+    def budget(self, name):
+        return benchmarks.load_baseline(self.path)['endpoints'][name]
+
+    def test_more_queries_keep_the_budget(self):
+        held_back = benchmarks.write_baseline([self.result('product_list', 206, timing_ms=40.0)], self.path)
+
+        self.assertEqual(held_back, ['product_list'])
+        self.assertEqual(self.budget('product_list'), {'max_queries': 6, 'p95_ms': 120.0})
+        self.assertEqual(self.budget('cart_get')['max_queries'], 11)
+
+    def test_fewer_queries_lower_the_budget(self):
+        self.assertEqual(benchmarks.write_baseline([self.result('cart_get', 9)], self.path), [])
+        self.assertEqual(self.budget('cart_get')['max_queries'], 9)
+
+    def test_raising_a_budget_is_explicit(self):
+        held_back = benchmarks.write_baseline([self.result('cart_get', 14)], self.path, raise_queries=True)
+
+        self.assertEqual(held_back, [])
+        self.assertEqual(self.budget('cart_get')['max_queries'], 14)
+
+
+class QueryGrowthTests(TestCase):
+    """Query counts of listing and cart endpoints must not grow with page or cart size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = benchmarks.prepare_dataset()
+
+    def queries(self, name, ctx=None, **changes):
+        endpoint = replace(next(e for e in benchmarks.ENDPOINTS if e.name == name), **changes)
+        [result] = benchmarks.run(ctx or self.ctx, endpoints=[endpoint], iterations=1, warmup=1)
+        return result.queries
+
+    def test_product_list_is_independent_of_page_size(self):
+        small = self.queries('product_list', path=lambda ctx: '/api/products/products/?page_size=2')
+        large = self.queries('product_list', path=lambda ctx: '/api/products/products/?page_size=24')
+        self.assertEqual(small, large)
+
+    def test_cart_endpoints_are_independent_of_cart_size(self):
+        one_line = replace(self.ctx, cart_lines=self.ctx.cart_lines[:1])
+        for name in ('cart_get', 'cart_update_items'):
+            with self.subTest(endpoint=name):
+                self.assertEqual(self.queries(name, one_line), self.queries(name))
+
+
+class QueryInspectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.prepare_dataset()
+
+    def test_normalize_sql_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize_sql('SELECT  *  FROM "products" WHERE "id" IN (%s, %s, %s) AND name = \'x\' LIMIT 21'),
+            'SELECT * FROM "products" WHERE "id" IN (...) AND name = ? LIMIT ?',
+        )
+        self.assertEqual(
+            normalize_sql('SELECT 1 FROM t WHERE id = %s'),
+            normalize_sql('SELECT 1 FROM t WHERE id = 42'),
+        )
+
+    def test_repeated_queries_are_reported_with_call_site(self):
+        products = list(Product.objects.all()[:5])
+        with self.assertRaises(DuplicateQueryError) as raised:
+            with inspect_queries(threshold=3):
+                for product in products:
+                    list(product.images.all())
+        self.assertIn('perf/tests.py', str(raised.exception))
+        self.assertIn('test_repeated_queries_are_reported_with_call_site', str(raised.exception))
+
+    def test_under_threshold_passes(self):
+        with inspect_queries(threshold=3) as inspector:
+            list(Product.objects.all()[:5])
+        self.assertEqual(inspector.duplicates, [])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def test_server_timing_header_reports_queries_and_totals(self):
+        response = self.client.get('/api/products/banners/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=\d+\.\d;desc="[1-9]\d* queries", ser;dur=\d+\.\d, total;dur=\d+\.\d$',
+        )
+
+    def test_requests_feed_the_per_route_histogram(self):
+        for _ in range(3):
+            self.client.get('/api/products/banners/')
+        self.client.get('/api/products/categories/')
+
+        snapshot = metrics.registry.snapshot()
+        self.assertEqual(snapshot['banner-list']['count'], 3)
+        self.assertEqual(sum(snapshot['banner-list']['histogram'].values()), 3)
+        self.assertEqual(snapshot['banner-list']['errors'], 0)
+        self.assertIn('category-list', snapshot)
+
+    def test_admin_endpoint_serves_and_resets_the_histograms(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='x')
+        client = APIClient()
+        client.force_authenticate(admin)
+        self.client.get('/api/products/banners/')
+
+        self.assertEqual(client.get('/api/admin-panel/request-metrics/').json()['banner-list']['count'], 1)
+        self.assertEqual(client.delete('/api/admin-panel/request-metrics/').status_code, 204)
+        self.assertNotIn('banner-list', client.get('/api/admin-panel/request-metrics/').json())
+
+    def test_request_line_is_logged_at_debug_by_default(self):
+        with self.assertNoLogs('perf.requests', level='INFO'):
+            self.client.get('/api/products/banners/')
+        with self.assertLogs('perf.requests', level='DEBUG') as logs:
+            self.client.get('/api/products/banners/')
+        self.assertIn('route=banner-list', logs.output[0])
+
+    @override_settings(PERF_METRICS={**settings.PERF_METRICS, 'LOG_LEVEL': 'info'})
+    def test_log_level_is_configurable(self):
+        with self.assertLogs('perf.requests', level='INFO'):
+            self.client.get('/api/products/banners/')
+
+    async def test_async_requests_are_measured(self):
+        response = await self.async_client.get('/api/products/banners/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=\d+\.\d;desc="[1-9]\d* queries"')
+        self.assertEqual(metrics.registry.snapshot()['banner-list']['count'], 1)
+
+
+class AsyncCapableMiddlewareTests(SimpleTestCase):
+    def test_middleware_follows_the_mode_of_the_handler(self):
+        async def async_view(request):
+            return HttpResponse('ok')
+
+        def sync_view(request):
+            return HttpResponse('ok')
+
+        with override_settings(PERF_QUERY_INSPECTOR={'ENABLED': True}):
+            for middleware_class in (RequestMetricsMiddleware, QueryInspectorMiddleware):
+                with self.subTest(middleware_class.__name__):
+                    self.assertTrue(middleware_class.async_capable)
+                    self.assertTrue(iscoroutinefunction(middleware_class(async_view)))
+                    self.assertFalse(iscoroutinefunction(middleware_class(sync_view)))
+
+
+class EndpointStatsTests(SimpleTestCase):
+    def test_latencies_land_in_their_buckets(self):
+        stats = metrics.EndpointStats(window=10)
+        for total_ms in (1, 5, 7, 300, 9000):
+            stats.record(total_ms, db_ms=1, db_queries=2, status_code=200)
+        stats.record(20, db_ms=1, db_queries=2, status_code=502)
+
+        snapshot = stats.snapshot()
+        histogram = snapshot['histogram']
+        self.assertEqual(histogram['<=5ms'], 2)
+        self.assertEqual(histogram['<=10ms'], 1)
+        self.assertEqual(histogram['<=25ms'], 1)
+        self.assertEqual(histogram['<=500ms'], 1)
+        self.assertEqual(histogram['>5000ms'], 1)
+        self.assertEqual(snapshot['count'], 6)
+        self.assertEqual(snapshot['errors'], 1)
+        self.assertEqual(snapshot['avg_queries'], 2)
+
+    def test_percentiles_use_the_recent_window(self):
+        stats = metrics.EndpointStats(window=3)
+        for total_ms in (1000, 1, 2, 3):
+            stats.record(total_ms, db_ms=0, db_queries=0, status_code=200)
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['p50_ms'], 2)
+        self.assertEqual(snapshot['p99_ms'], 3)
@@ -25,7 +25,16 @@ class ColorVariantAdmin(admin.ModelAdmin):
 
 @admin.register(SizeStock)
 class SizeStockAdmin(admin.ModelAdmin):
-    list_display = ('variant', 'size', 'quantity')
+    list_display = ('variant', 'size', 'quantity', 'held_quantity')
+    # Maintained by cart.holds; sweep_expired_holds --rebuild repairs it
+    readonly_fields = ('held_quantity',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Only the edited columns, so holds taken meanwhile are kept
+            obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        else:
+            super().save_model(request, obj, form, change)
 
 @admin.register(Banner)
 class BannerAdmin(admin.ModelAdmin):
@@ -0,0 +1,427 @@
+# products/management/commands/seed_perf_data.py
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from orders import purchases
+from orders.models import Order, OrderItem, OrderTracking
+from payments.models import Payment
+from products.models import (
+    Category, Product, ProductImage, ColorVariant, VariantImage, SizeStock
+)
+from reviews import ratings
+from reviews.models import Review
+from users.models import CustomUser, UserAddress
+
+# Everything this command creates is tagged with these prefixes so that
+# --clear can remove a previous run without touching real data.
+EMAIL_DOMAIN = 'perf.example.com'
+SLUG_PREFIX = 'perf-'
+ORDER_PREFIX = 'PERF'
+
+CATEGORIES = [
+    ('Perf Hoodies', 'hoodies', ['S', 'M', 'L', 'XL', 'XXL']),
+    ('Perf T-Shirts', 'tshirts', ['XS', 'S', 'M', 'L', 'XL']),
+    ('Perf Shirts', 'shirts', ['S', 'M', 'L', 'XL']),
+    ('Perf Pants', 'pants', ['28', '30', '32', '34', '36']),
+    ('Perf Shoes', 'shoes', ['6', '7', '8', '9', '10', '11']),
+    ('Perf Accessories', 'accessories', ['OS']),
+]
+
+COLORS = [
+    ('Black', '#000000'), ('White', '#FFFFFF'), ('Navy Blue', '#1E3A5F'),
+    ('Forest Green', '#228B22'), ('Maroon', '#800000'), ('Grey', '#808080'),
+    ('Beige', '#F5F5DC'), ('Mustard', '#FFDB58'),
+]
+
+ADJECTIVES = ['Classic', 'Essential', 'Relaxed', 'Urban', 'Vintage', 'Premium', 'Everyday', 'Heavyweight']
+BRANDS = ['Pogiee', 'Northwind', 'Basecamp', 'Linea', 'Stitchworks']
+CITIES = [('Kochi', 'Kerala'), ('Bengaluru', 'Karnataka'), ('Mumbai', 'Maharashtra'), ('Chennai', 'Tamil Nadu')]
+
+# Weighted so the dataset looks like a shop that has been trading for a while.
+ORDER_STATUSES = ['delivered'] * 5 + ['shipped'] * 2 + ['confirmed', 'processing', 'pending', 'cancelled']
+TRACKING_FLOW = {
+    'pending': ['order_placed'],
+    'confirmed': ['order_placed', 'payment_confirmed'],
+    'processing': ['order_placed', 'payment_confirmed', 'order_processing'],
+    'shipped': ['order_placed', 'payment_confirmed', 'order_processing', 'order_shipped'],
+    'delivered': ['order_placed', 'payment_confirmed', 'order_processing', 'order_shipped', 'delivered'],
+    'cancelled': ['order_placed', 'cancelled'],
+}
+TRACKING_DESCRIPTIONS = dict(OrderTracking.STATUS_CHOICES)
+IMAGE_URL = 'https://res.cloudinary.com/demo/image/upload/v1/perf/{}.jpg'
+SNAPSHOT_FIELDS = ('product_name', 'sku', 'color_name', 'color_hex', 'image_url')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the backdated created_at/updated_at values we generate."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic, production-sized dataset for load and benchmark runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--colors', type=int, default=3, help='Color variants per product')
+        parser.add_argument('--images', type=int, default=2, help='Images per color variant')
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--max-items', type=int, default=4, help='Maximum lines per order')
+        parser.add_argument('--carts', type=float, default=0.3, help='Fraction of users with a non-empty cart')
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete data from a previous run first')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['products'] < 1:
+            raise CommandError('--users and --products must be at least 1')
+        if not 1 <= options['colors'] <= len(COLORS):
+            raise CommandError(f'--colors must be between 1 and {len(COLORS)}')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        if options['clear']:
+            self.clear()
+        elif CustomUser.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists():
+            raise CommandError('Perf data already exists, re-run with --clear to replace it')
+
+        with explicit_timestamps(Order, OrderItem, OrderTracking, Payment, Review), transaction.atomic():
+            users, addresses = self.seed_users(options['users'])
+            catalog = self.seed_catalog(options['products'], options['colors'], options['images'])
+            self.seed_carts(users, catalog, options['carts'])
+            delivered = self.seed_orders(users, addresses, catalog, options['orders'], options['max_items'], options['days'])
+            self.log('purchased products', purchases.rebuild([user.id for user in users]))
+            self.seed_reviews(delivered, options['reviews'])
+
+        self.stdout.write(self.style.SUCCESS(f'\nDone in {time.perf_counter() - started:.1f}s'))
+
+    # ------------------------------------------------------------------ helpers
+
+    def log(self, label, count):
+        self.stdout.write(f'  {label}: {count}')
+
+    def bulk(self, model, objs):
+        return model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def insert(self, model, fields, rows):
+        """
+        INSERT ``rows`` (tuples of values for ``fields``) with ``executemany``.
+
+        For the big child tables, whose ids nothing reads back: no model
+        instances and no per-value SQL compilation, which is most of what
+        ``bulk_create`` spends. Datetimes are adapted for the backend; other
+        values go to the driver as they are. Columns not in ``fields`` get
+        their model default.
+        """
+        opts = model._meta
+        given = [opts.get_field(name) for name in fields]
+        rest = [field for field in opts.concrete_fields if field not in given and not field.primary_key]
+        defaults = tuple(field.get_db_prep_save(field.get_default(), connection) for field in rest)
+        datetimes = [i for i, field in enumerate(given) if isinstance(field, models.DateTimeField)]
+        adapt = connection.ops.adapt_datetimefield_value
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table),
+            ', '.join(quote(field.column) for field in given + rest),
+            ', '.join(['%s'] * (len(given) + len(rest))),
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                if datetimes:
+                    batch = [list(row) for row in batch]
+                    for row in batch:
+                        for i in datetimes:
+                            row[i] = adapt(row[i])
+                cursor.executemany(sql, [tuple(row) + defaults for row in batch])
+        return len(rows)
+
+    def past(self, days):
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def clear(self):
+        self.stdout.write('Clearing previous perf data...')
+        Order.objects.filter(order_number__startswith=ORDER_PREFIX).delete()
+        Product.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        Category.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        CustomUser.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+    # ------------------------------------------------------------------ seeders
+
+    def seed_users(self, count):
+        # Hash once; every seeded account shares the password "perf-password".
+        password = make_password('perf-password')
+        users = self.bulk(CustomUser, [
+            CustomUser(
+                email=f'user{i}@{EMAIL_DOMAIN}',
+                password=password,
+                first_name=f'Perf{i}',
+                last_name='User',
+                is_verified=True,
+            )
+            for i in range(count)
+        ])
+        addresses = self.bulk(UserAddress, [
+            UserAddress(
+                user=user,
+                name=f'{user.first_name} {user.last_name}',
+                phone=f'9{self.rng.randint(100000000, 999999999)}',
+                address_line1=f'{self.rng.randint(1, 999)} Market Road',
+                city=city,
+                state=state,
+                pincode=f'{self.rng.randint(100000, 999999)}',
+                is_default=True,
+            )
+            for user, (city, state) in ((u, self.rng.choice(CITIES)) for u in users)
+        ])
+        self.log('users', len(users))
+        return users, addresses
+
+    def seed_catalog(self, count, colors_per_product, images_per_variant):
+        categories = self.bulk(Category, [
+            Category(name=name, slug=f'{SLUG_PREFIX}{category_type}', category_type=category_type)
+            for name, category_type, _ in CATEGORIES
+        ])
+        sizes_by_category = {cat.id: sizes for cat, (_, _, sizes) in zip(categories, CATEGORIES)}
+
+        products = []
+        for i in range(count):
+            category = self.rng.choice(categories)
+            base_price = Decimal(self.rng.randrange(499, 4999, 50))
+            discount_price = None
+            discount_percentage = 0
+            if self.rng.random() < 0.4:
+                discount_price = (base_price * Decimal(self.rng.choice(['0.9', '0.8', '0.7']))).quantize(Decimal('1'))
+                discount_percentage = int((base_price - discount_price) / base_price * 100)
+            name = f'{self.rng.choice(ADJECTIVES)} {category.name.split(" ", 1)[1]} {i}'
+            products.append(Product(
+                category=category,
+                name=name,
+                slug=f'{SLUG_PREFIX}product-{i}',
+                description=f'{name} made for everyday wear.',
+                brand=self.rng.choice(BRANDS),
+                base_price=base_price,
+                discount_price=discount_price,
+                discount_percentage=discount_percentage,
+                fabric=self.rng.choice(Product.FABRIC_CHOICES)[0],
+                fit=self.rng.choice(Product.FIT_CHOICES)[0],
+                is_featured=self.rng.random() < 0.1,
+                is_new_arrival=self.rng.random() < 0.15,
+            ))
+        products = self.bulk(Product, products)
+
+        product_images = []
+        variants = []
+        for product in products:
+            product_images.append(ProductImage(
+                product=product, image=IMAGE_URL.format(f'p{product.id}'), is_primary=True
+            ))
+            for position, (color_name, color_hex) in enumerate(self.rng.sample(COLORS, colors_per_product)):
+                variants.append(ColorVariant(
+                    product=product,
+                    color_name=color_name,
+                    color_hex=color_hex,
+                    sku=f'{SLUG_PREFIX}{product.id}-{position}'.upper(),
+                    price_adjustment=Decimal(self.rng.choice([0, 0, 0, 50, 100])),
+                    is_default=position == 0,
+                ))
+        self.bulk(ProductImage, product_images)
+        variants = self.bulk(ColorVariant, variants)
+
+        product_by_id = {product.id: product for product in products}
+        variant_images = []
+        size_stocks = []
+        stock_by_product = dict.fromkeys(product_by_id, 0)
+        for variant in variants:
+            for position in range(images_per_variant):
+                variant_images.append(VariantImage(
+                    variant=variant,
+                    image=IMAGE_URL.format(f'v{variant.id}-{position}'),
+                    is_primary=position == 0,
+                    order=position,
+                ))
+            for size in sizes_by_category[product_by_id[variant.product_id].category_id]:
+                quantity = self.rng.choice([0, 3, 10, 25, 50, 100])
+                stock_by_product[variant.product_id] += quantity
+                size_stocks.append(SizeStock(variant=variant, size=size, quantity=quantity))
+        self.bulk(VariantImage, variant_images)
+        size_stocks = self.bulk(SizeStock, size_stocks)
+
+        for product in products:
+            product.total_stock = stock_by_product[product.id]
+        Product.objects.bulk_update(products, ['total_stock'], batch_size=self.batch_size)
+
+        self.log('products', len(products))
+        self.log('color variants', len(variants))
+        self.log('size stocks', len(size_stocks))
+        self.log('images', len(product_images) + len(variant_images))
+
+        # Order line snapshots per color variant, the values orders.snapshots.line_snapshot
+        # takes at checkout (the variant's primary image, else the product's).
+        # Tuples in SNAPSHOT_FIELDS order.
+        self.snapshots = {
+            variant.id: (
+                product_by_id[variant.product_id].name,
+                variant.sku,
+                variant.color_name,
+                variant.color_hex,
+                IMAGE_URL.format(f'v{variant.id}-0' if images_per_variant else f'p{variant.product_id}'),
+            )
+            for variant in variants
+        }
+
+        # Purchasable lines as plain tuples: (product_id, variant_id, size, unit_price).
+        # Later seeders assign *_id columns directly, which keeps model __init__ cheap.
+        variant_by_id = {variant.id: variant for variant in variants}
+        catalog = []
+        for stock in size_stocks:
+            variant = variant_by_id[stock.variant_id]
+            product = product_by_id[variant.product_id]
+            price = (product.discount_price or product.base_price) + variant.price_adjustment
+            catalog.append((product.id, variant.id, stock.size, price))
+        return catalog
+
+    def seed_carts(self, users, catalog, fraction):
+        shoppers = [user for user in users if self.rng.random() < fraction]
+        carts = self.bulk(Cart, [Cart(user=user) for user in shoppers])
+        items = []
+        for cart in carts:
+            for product_id, variant_id, size, _ in self.rng.sample(catalog, min(len(catalog), self.rng.randint(1, 4))):
+                items.append(CartItem(
+                    cart_id=cart.id, product_id=product_id, color_variant_id=variant_id, size=size,
+                    quantity=self.rng.randint(1, 3),
+                ))
+        self.bulk(CartItem, items)
+        self.log('carts', len(carts))
+        self.log('cart items', len(items))
+
+    def seed_orders(self, users, addresses, catalog, count, max_items, days):
+        orders = []
+        lines = []
+        for i in range(count):
+            index = self.rng.randrange(len(users))
+            user, address = users[index], addresses[index]
+            picked = self.rng.sample(catalog, min(len(catalog), self.rng.randint(1, max_items)))
+            order_lines = [(*line, self.rng.randint(1, 3)) for line in picked]
+            subtotal = sum(price * quantity for _, _, _, price, quantity in order_lines)
+            shipping_charge = Decimal('0') if subtotal >= 1000 else Decimal('100')
+            tax = round(subtotal * Decimal('0.05'), 2)
+            status = self.rng.choice(ORDER_STATUSES)
+            created_at = self.past(days)
+            orders.append(Order(
+                user_id=user.id,
+                order_number=f'{ORDER_PREFIX}{i:010d}',
+                shipping_address_id=address.id,
+                shipping_name=address.name,
+                shipping_phone=address.phone,
+                shipping_email=user.email,
+                subtotal=subtotal,
+                shipping_charge=shipping_charge,
+                tax=tax,
+                total=subtotal + shipping_charge + tax,
+                payment_method=self.rng.choice(['cod', 'credit_card', 'credit_card', 'upi']),
+                payment_status='pending' if status in ('pending', 'cancelled') else 'completed',
+                status=status,
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+            lines.append(order_lines)
+        orders = self.bulk(Order, orders)
+
+        # Child rows as plain tuples for self.insert
+        items = []
+        tracking = []
+        payments = []
+        delivered = []
+        for order, order_lines in zip(orders, lines):
+            for product_id, variant_id, size, price, quantity in order_lines:
+                items.append((
+                    order.id, product_id, variant_id, size, quantity, price, price * quantity,
+                    *self.snapshots[variant_id],
+                ))
+            for step, tracking_status in enumerate(TRACKING_FLOW[order.status]):
+                tracking.append((
+                    order.id, tracking_status, TRACKING_DESCRIPTIONS[tracking_status],
+                    order.created_at + timedelta(days=step),
+                ))
+            if order.payment_method != 'cod':
+                paid = order.payment_status == 'completed'
+                payments.append((
+                    order.id, f'pi_perf_{order.id}', f'pi_perf_{order.id}_secret',
+                    f'ch_perf_{order.id}' if paid else None, order.total,
+                    'succeeded' if paid else 'created', order.shipping_email,
+                    order.created_at, order.created_at if paid else None,
+                ))
+            if order.status == 'delivered':
+                delivered.append((order, order_lines))
+
+        self.insert(OrderItem, (
+            'order', 'product', 'color_variant', 'size', 'quantity', 'price', 'total', *SNAPSHOT_FIELDS,
+        ), items)
+        self.insert(OrderTracking, ('order', 'status', 'description', 'created_at'), tracking)
+        self.insert(Payment, (
+            'order', 'stripe_payment_intent_id', 'stripe_client_secret', 'stripe_charge_id', 'amount',
+            'status', 'receipt_email', 'created_at', 'paid_at',
+        ), payments)
+        self.log('orders', len(orders))
+        self.log('order items', len(items))
+        self.log('tracking events', len(tracking))
+        self.log('payments', len(payments))
+        return delivered
+
+    def seed_reviews(self, delivered, count):
+        reviews = []
+        seen = set()
+        rng = self.rng
+        for order, order_lines in rng.sample(delivered, min(len(delivered), count)):
+            product_id = order_lines[0][0]
+            if (product_id, order.user_id) in seen:
+                continue
+            seen.add((product_id, order.user_id))
+            rating = rng.choice([5, 5, 5, 4, 4, 3, 2, 1])
+            # Seeded votes have no ReviewVote rows, so they are all baseline
+            helpful = rng.randint(0, 50)
+            created_at = order.created_at + timedelta(days=rng.randint(5, 30))
+            reviews.append(Review(
+                product_id=product_id,
+                user_id=order.user_id,
+                rating=rating,
+                title=['Poor', 'Meh', 'Okay', 'Good', 'Great'][rating - 1],
+                comment='Seeded review for load testing.',
+                verified_purchase=True,
+                helpful_count=helpful,
+                helpful_baseline=helpful,
+                is_approved=True,
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        self.bulk(Review, reviews)
+
+        # Keep the rating rollup and denormalized product columns consistent with the reviews.
+        ratings.recompute({review.product_id for review in reviews}, batch_size=self.batch_size)
+        self.log('reviews', len(reviews))
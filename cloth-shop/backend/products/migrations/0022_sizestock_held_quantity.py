@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sizestock',
+            name='held_quantity',
+            field=models.IntegerField(default=0),
+        ),
+    ]
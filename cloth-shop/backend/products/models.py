@@ -69,6 +69,24 @@ class ColorOption(models.Model):
     def __str__(self):
         return self.name
 
+def first_primary(images):
+    """The primary image in ``images`` (a manager, prefetched or not), else the first one."""
+    images = images.all()
+    return next((image for image in images if image.is_primary), None) or next(iter(images), None)
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Everything ProductListSerializer walks, in a fixed number of queries per page."""
+        return self.select_related('category').prefetch_related(
+            'images', 'color_variants__variant_images', 'color_variants__size_stocks',
+        )
+
+    def for_detail(self):
+        """As ``for_listing``, plus the legacy variants ProductDetailSerializer adds."""
+        return self.for_listing().prefetch_related('variants__color')
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     name = models.CharField(max_length=255)
@@ -129,6 +147,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = 'products'
         verbose_name_plural = 'Products'
@@ -142,6 +162,23 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def default_color_variant(self):
+        """The default color variant, else the first one (uses prefetched variants)."""
+        variants = self.color_variants.all()
+        return next((variant for variant in variants if variant.is_default), None) or next(iter(variants), None)
+
+    @property
+    def primary_image(self):
+        """Primary image URL: the default color variant's first, then the legacy product images."""
+        variant = self.default_color_variant
+        if variant:
+            image = first_primary(variant.variant_images)
+            if image and image.image:
+                return image.image
+        image = first_primary(self.images)
+        return image.image if image and image.image else None
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -220,9 +257,7 @@ class ColorVariant(models.Model):
     
     @property
     def primary_image(self):
-        img = self.variant_images.filter(is_primary=True).first()
-        if not img:
-            img = self.variant_images.first()
+        img = first_primary(self.variant_images)
         return img.image if img else None
 
 
@@ -254,6 +289,8 @@ class SizeStock(models.Model):
     variant = models.ForeignKey(ColorVariant, on_delete=models.CASCADE, related_name='size_stocks')
     size = models.CharField(max_length=10)  # S, M, L, XL, XXL
     quantity = models.IntegerField(default=0)
+    # Units reserved by unexpired cart holds (cart.holds keeps it in sync)
+    held_quantity = models.IntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -266,6 +303,11 @@ class SizeStock(models.Model):
     def __str__(self):
         return f"{self.variant.color_name} - Size {self.size} ({self.quantity})"
 
+    @property
+    def available_quantity(self):
+        """Available to sell: on hand minus units held in carts."""
+        return max(self.quantity - self.held_quantity, 0)
+
 
 class Banner(models.Model):
     title = models.CharField(max_length=255)
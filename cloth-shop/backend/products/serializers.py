@@ -53,6 +53,14 @@ class SizeStockSerializer(serializers.ModelSerializer):
             'variant': {'required': True},
         }
 
+    def update(self, instance, validated_data):
+        # Write only the edited columns: saving the whole row would put back a
+        # stale held_quantity over holds taken meanwhile (cart.holds)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
 
 class VariantImageSerializer(serializers.ModelSerializer):
     """Serializer for images per color variant."""
@@ -107,28 +115,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     def get_primary_image(self, obj):
         """Return the primary image URL - checks color variants first, then legacy images."""
-        # First, check color variants (new system)
-        default_variant = obj.color_variants.filter(is_default=True).first()
-        if not default_variant:
-            default_variant = obj.color_variants.first()
-        
-        if default_variant:
-            variant_image = default_variant.variant_images.filter(is_primary=True).first()
-            if not variant_image:
-                variant_image = default_variant.variant_images.first()
-            if variant_image and variant_image.image:
-                return variant_image.image
-        
-        # Fallback to legacy product images
-        image = obj.images.filter(is_primary=True).first()
-        if not image:
-            image = obj.images.first()
-        
-        if image and image.image:
-            return image.image
-        
-        # Return a placeholder if no image exists
-        return None
+        return obj.primary_image
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
@@ -152,9 +139,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     
     def get_default_variant(self, obj):
         """Return the default color variant or first variant."""
-        variant = obj.color_variants.filter(is_default=True).first()
-        if not variant:
-            variant = obj.color_variants.first()
+        variant = obj.default_color_variant
         if variant:
             return ColorVariantSerializer(variant).data
         return None
@@ -323,22 +308,7 @@ class RelatedProductCardSerializer(serializers.ModelSerializer):
     
     def get_primary_image(self, obj):
         """Return the primary image URL."""
-        default_variant = obj.color_variants.filter(is_default=True).first()
-        if not default_variant:
-            default_variant = obj.color_variants.first()
-        
-        if default_variant:
-            variant_image = default_variant.variant_images.filter(is_primary=True).first()
-            if not variant_image:
-                variant_image = default_variant.variant_images.first()
-            if variant_image and variant_image.image:
-                return variant_image.image
-        
-        image = obj.images.filter(is_primary=True).first()
-        if not image:
-            image = obj.images.first()
-        
-        return image.image if image else None
+        return obj.primary_image
 
 
 class RelatedProductSerializer(serializers.ModelSerializer):
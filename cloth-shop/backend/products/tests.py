@@ -1,3 +1,83 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from orders.models import PurchasedProduct
+from products.models import Category, Product
+from products.views import VIEWER_STATE_MAX_IDS
+from reviews.models import Review
+from users.models import CustomUser
+from wishlist.models import Wishlist
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ViewerStateTests(TestCase):
+    """``/api/products/viewer-state/``: one call per product grid, however large."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Hoodies', slug='hoodies', category_type='hoodies')
+        cls.products = Product.objects.bulk_create([
+            Product(category=category, name=f'Hoodie {i}', slug=f'hoodie-{i}', description='',
+                    base_price=Decimal('900.00'))
+            for i in range(VIEWER_STATE_MAX_IDS + 1)
+        ])
+        cls.user = CustomUser.objects.create_user(email='viewer@example.com', password='x')
+        wishlisted, in_cart, purchased, reviewed = cls.products[:4]
+        Wishlist.objects.create(user=cls.user).products.add(wishlisted)
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.create(cart=cart, product=in_cart, size='M', quantity=2)
+        CartItem.objects.create(cart=cart, product=in_cart, size='L', quantity=1)
+        PurchasedProduct.objects.create(user=cls.user, product=purchased, first_delivered_at=timezone.now())
+        cls.review = Review.objects.create(product=reviewed, user=cls.user, rating=4, title='Warm', is_approved=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, products):
+        return self.client.get('/api/products/viewer-state/?ids=' + ','.join(str(p.pk) for p in products))
+
+    def test_reports_each_products_state(self):
+        wishlisted, in_cart, purchased, reviewed, untouched = self.products[:5]
+        state = self.get(self.products[:5]).json()
+
+        self.assertEqual(state[str(wishlisted.pk)]['wishlisted'], True)
+        self.assertEqual(state[str(in_cart.pk)]['in_cart'], True)
+        self.assertEqual(state[str(in_cart.pk)]['cart_quantity'], 3)
+        self.assertEqual(state[str(purchased.pk)]['can_review'], True)
+        self.assertEqual(state[str(reviewed.pk)]['has_reviewed'], True)
+        self.assertEqual(state[str(reviewed.pk)]['review_id'], self.review.pk)
+        self.assertEqual(state[str(untouched.pk)], {
+            'wishlisted': False, 'in_cart': False, 'cart_quantity': 0,
+            'can_review': False, 'has_reviewed': False, 'review_id': None,
+        })
+
+    def test_query_count_does_not_grow_with_ids(self):
+        # Four lookups: wishlist, cart, reviews, purchases
+        with self.assertNumQueries(4):
+            self.assertEqual(self.get(self.products[:1]).status_code, 200)
+        with self.assertNumQueries(4):
+            response = self.get(self.products[:VIEWER_STATE_MAX_IDS])
+        self.assertEqual(len(response.json()), VIEWER_STATE_MAX_IDS)
+
+    def test_more_than_the_cap_is_rejected(self):
+        with self.assertNumQueries(0):
+            response = self.get(self.products[:VIEWER_STATE_MAX_IDS + 1])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(VIEWER_STATE_MAX_IDS), response.json()['error'])
+
+    def test_duplicate_ids_count_once_toward_the_cap(self):
+        products = self.products[:VIEWER_STATE_MAX_IDS] + self.products[:5]
+        self.assertEqual(self.get(products).status_code, 200)
+
+    def test_bad_or_missing_ids_are_rejected(self):
+        self.assertEqual(self.client.get('/api/products/viewer-state/?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/viewer-state/').status_code, 400)
+
+    def test_requires_login(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.get(self.products[:1]).status_code, 401)
@@ -30,6 +30,7 @@ router.register('related-products', views.RelatedProductViewSet, basename='relat
 urlpatterns = [
     path('', include(router.urls)),
     path('search/', views.search_products, name='search'),
+    path('viewer-state/', views.viewer_state, name='viewer-state'),
     # Hybrid related products API endpoint
     path('products/<slug:slug>/related/', views.get_related_products, name='get-related-products'),
 ]
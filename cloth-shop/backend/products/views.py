@@ -1,4 +1,6 @@
 # products/views.py
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -6,7 +8,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Q, Sum, prefetch_related_objects
 import cloudinary
 import cloudinary.uploader
 from .models import (
@@ -25,6 +27,9 @@ from .serializers import (
     PromotionalBannerSerializer, TshirtGridSerializer, ShoesGridSerializer, ShoesCardSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+
 class ProductPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
@@ -52,6 +57,13 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset.for_listing()
+        if self.action == 'retrieve':
+            return queryset.for_detail()
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -64,13 +76,11 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Debug: Print request data and validation errors
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
-            print("=== PRODUCT CREATE VALIDATION ERRORS ===")
-            print(f"Request Data: {request.data}")
-            print(f"Errors: {serializer.errors}")
-            print("=========================================")
+            logger.warning("Product create validation failed: %s", serializer.errors)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Product create request data: %s", dict(request.data))
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         return super().create(request, *args, **kwargs)
@@ -79,25 +89,21 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Debug: Print update data
-        print("=== PRODUCT UPDATE DEBUG ===")
-        print(f"Request data: {request.data}")
-        print(f"Updating product: {kwargs.get('slug')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updating product %s with data: %s", kwargs.get('slug'), dict(request.data))
         
         try:
             # Validate the data
             serializer = self.get_serializer(self.get_object(), data=request.data, partial=True)
             if not serializer.is_valid():
-                print(f"ERROR: Validation failed: {serializer.errors}")
+                logger.warning("Product update validation failed: %s", serializer.errors)
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
             response = super().update(request, *args, **kwargs)
-            print(f"✅ Product updated successfully")
+            logger.info("Product updated: %s", kwargs.get('slug'))
             return response
         except Exception as e:
-            print(f"ERROR: Exception during update: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating product %s", kwargs.get('slug'))
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def destroy(self, request, *args, **kwargs):
@@ -114,9 +120,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                     public_id = extract_public_id_from_url(image.image)
                     if public_id:
                         delete_image_from_cloudinary(public_id)
-                        print(f"✅ Deleted product image from Cloudinary: {public_id}")
+                        logger.info("Deleted product image from Cloudinary: %s", public_id)
                 except Exception as e:
-                    print(f"⚠️ Failed to delete product image: {str(e)}")
+                    logger.warning("Failed to delete product image: %s", e)
         
         # 2. Delete all ColorVariant images from Cloudinary (new system)
         for variant in product.color_variants.all():
@@ -126,11 +132,11 @@ class ProductViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(image.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted variant image from Cloudinary: {public_id}")
+                            logger.info("Deleted variant image from Cloudinary: %s", public_id)
                     except Exception as e:
-                        print(f"⚠️ Failed to delete variant image: {str(e)}")
+                        logger.warning("Failed to delete variant image: %s", e)
         
-        print(f"🗑️ Product '{product.name}' and all images deleted from Cloudinary")
+        logger.info("Product '%s' and all images deleted from Cloudinary", product.name)
         return super().destroy(request, *args, **kwargs)
 
 @api_view(['GET'])
@@ -140,7 +146,7 @@ def search_products(request):
     if not query or len(query) < 2:
         return Response({'error': 'Query too short'}, status=status.HTTP_400_BAD_REQUEST)
     
-    products = Product.objects.filter(
+    products = Product.objects.for_listing().filter(
         Q(name__icontains=query) | Q(description__icontains=query) | Q(brand__icontains=query),
         is_active=True
     )[:20]
@@ -148,6 +154,58 @@ def search_products(request):
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
 
+VIEWER_STATE_MAX_IDS = 100
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def viewer_state(request):
+    """Per-product wishlist / cart / review state for the logged-in user.
+
+    ``?ids=1,2,3`` (up to 100) is answered in four queries no matter
+    how many ids are asked for, so product grids need one call instead of a
+    wishlist, cart and can-review request per card.
+    """
+    from cart.models import CartItem
+    from orders import purchases
+    from reviews.models import Review
+    from wishlist.models import Wishlist
+
+    try:
+        ids = {int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return Response({'error': 'ids must be a comma separated list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if not ids:
+        return Response({'error': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > VIEWER_STATE_MAX_IDS:
+        return Response({'error': f'At most {VIEWER_STATE_MAX_IDS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    wishlisted = set(
+        Wishlist.products.through.objects.filter(wishlist__user=user, product_id__in=ids)
+        .values_list('product_id', flat=True)
+    )
+    in_cart = dict(
+        CartItem.objects.filter(cart__user=user, product_id__in=ids)
+        .order_by().values('product_id').annotate(quantity=Sum('quantity'))
+        .values_list('product_id', 'quantity')
+    )
+    reviewed = dict(
+        Review.objects.filter(user=user, product_id__in=ids).values_list('product_id', 'id')
+    )
+    purchased = purchases.purchased_among(user, ids)
+    
+    return Response({
+        str(product_id): {
+            'wishlisted': product_id in wishlisted,
+            'in_cart': product_id in in_cart,
+            'cart_quantity': in_cart.get(product_id, 0),
+            'can_review': product_id in purchased,
+            'has_reviewed': product_id in reviewed,
+            'review_id': reviewed.get(product_id),
+        }
+        for product_id in sorted(ids)
+    })
+
 class ColorOptionViewSet(viewsets.ModelViewSet):
     queryset = ColorOption.objects.filter(is_active=True)
     serializer_class = ColorOptionSerializer
@@ -185,10 +243,10 @@ class BannerViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')  # In case URL is passed directly
             
             if image_file:
-                print(f"📤 Uploading banner image to Cloudinary...")
+                logger.debug("Uploading banner image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='banners')
                 image_url = result['secure_url']
-                print(f"✅ Banner image uploaded: {image_url}")
+                logger.info("Banner image uploaded: %s", image_url)
             
             # Create banner
             banner = Banner.objects.create(
@@ -204,9 +262,7 @@ class BannerViewSet(viewsets.ModelViewSet):
             return Response(BannerSerializer(banner).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating banner: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating banner")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def update(self, request, *args, **kwargs):
@@ -227,15 +283,15 @@ class BannerViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(banner.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old banner image: {public_id}")
+                            logger.info("Deleted old banner image: %s", public_id)
                     except Exception as e:
-                        print(f"⚠️ Failed to delete old image: {str(e)}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
-                print(f"📤 Uploading new banner image...")
+                logger.debug("Uploading new banner image")
                 result = upload_image_to_cloudinary(image_file, folder='banners')
                 banner.image = result['secure_url']
-                print(f"✅ New banner image uploaded: {banner.image}")
+                logger.info("New banner image uploaded: %s", banner.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 # URL passed directly (no file upload)
                 banner.image = request.data['image']
@@ -259,9 +315,7 @@ class BannerViewSet(viewsets.ModelViewSet):
             return Response(BannerSerializer(banner).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            print(f"❌ Error updating banner: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating banner")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -276,9 +330,9 @@ class BannerViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(banner.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted banner image from Cloudinary: {public_id}")
+                    logger.info("Deleted banner image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"⚠️ Failed to delete banner image: {str(e)}")
+                logger.warning("Failed to delete banner image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
     
@@ -305,10 +359,10 @@ class BottomStyleViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')
             
             if image_file:
-                print(f"📤 Uploading bottom style image to Cloudinary...")
+                logger.debug("Uploading bottom style image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='bottom_styles')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             # Parse is_active
             is_active_val = request.data.get('is_active', 'true')
@@ -327,9 +381,7 @@ class BottomStyleViewSet(viewsets.ModelViewSet):
             return Response(BottomStyleSerializer(bottom_style).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating bottom style: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating bottom style")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def update(self, request, *args, **kwargs):
@@ -349,15 +401,15 @@ class BottomStyleViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(bottom_style.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old bottom style image: {public_id}")
+                            logger.info("Deleted old bottom style image: %s", public_id)
                     except Exception as e:
-                        print(f"⚠️ Failed to delete old image: {str(e)}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
-                print(f"📤 Uploading new bottom style image...")
+                logger.debug("Uploading new bottom style image")
                 result = upload_image_to_cloudinary(image_file, folder='bottom_styles')
                 bottom_style.image = result['secure_url']
-                print(f"✅ New image uploaded: {bottom_style.image}")
+                logger.info("New image uploaded: %s", bottom_style.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 bottom_style.image = request.data['image']
             
@@ -380,9 +432,7 @@ class BottomStyleViewSet(viewsets.ModelViewSet):
             return Response(BottomStyleSerializer(bottom_style).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            print(f"❌ Error updating bottom style: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating bottom style")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -396,9 +446,9 @@ class BottomStyleViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(bottom_style.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted bottom style image from Cloudinary: {public_id}")
+                    logger.info("Deleted bottom style image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"⚠️ Failed to delete image: {str(e)}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -455,9 +505,7 @@ class CategoryCardViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            import traceback
-            print(f"Error creating category card: {e}")
-            traceback.print_exc()
+            logger.exception("Error creating category card")
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     def update(self, request, *args, **kwargs):
@@ -528,15 +576,13 @@ class ProductImageViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            # Debug: Print request data
-            print("=== IMAGE UPLOAD DEBUG ===")
-            print(f"Request data: {request.data}")
-            print(f"Request files: {request.FILES}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Image upload data: %s files: %s", dict(request.data), list(request.FILES))
             
             # Validate image file
             image_file = request.FILES.get('image')
             if not image_file:
-                print("ERROR: No image file in request")
+                logger.warning("Image upload without an image file")
                 return Response(
                     {'error': 'No image file provided'}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -564,21 +610,20 @@ class ProductImageViewSet(viewsets.ModelViewSet):
             from django.core.exceptions import ValidationError as DjangoValidationError
             
             try:
-                print(f"🔄 Uploading to Cloudinary...")
+                logger.debug("Uploading to Cloudinary")
                 cloudinary_result = upload_image_to_cloudinary(
                     image_file,
                     folder=f'products/{product.slug}'
                 )
-                print(f"✅ Cloudinary upload successful!")
-                print(f"   URL: {cloudinary_result['secure_url']}")
+                logger.info("Cloudinary upload successful: %s", cloudinary_result['secure_url'])
             except DjangoValidationError as e:
-                print(f"ERROR: Image validation failed: {str(e)}")
+                logger.warning("Image validation failed: %s", e)
                 return Response(
                     {'error': str(e)}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             except Exception as e:
-                print(f"ERROR: Cloudinary upload failed: {str(e)}")
+                logger.exception("Cloudinary upload failed")
                 return Response(
                     {'error': f'Cloudinary upload failed: {str(e)}'}, 
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -593,7 +638,7 @@ class ProductImageViewSet(viewsets.ModelViewSet):
                 order=int(request.data.get('order', 0))
             )
             
-            print(f"✅ ProductImage created with Cloudinary URL in database")
+            logger.info("ProductImage created with Cloudinary URL in database")
             
             return Response(
                 {
@@ -610,9 +655,7 @@ class ProductImageViewSet(viewsets.ModelViewSet):
             )
             
         except Exception as e:
-            print(f"ERROR: Exception occurred: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Exception occurred")
             return Response(
                 {'error': f'Failed to create product image: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -707,9 +750,9 @@ class ProductImageViewSet(viewsets.ModelViewSet):
             if public_id:
                 try:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted image from Cloudinary: {public_id}")
+                    logger.info("Deleted image from Cloudinary: %s", public_id)
                 except Exception as e:
-                    print(f"⚠️ Failed to delete from Cloudinary: {str(e)}")
+                    logger.warning("Failed to delete from Cloudinary: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -759,9 +802,9 @@ class ColorVariantViewSet(viewsets.ModelViewSet):
                     public_id = extract_public_id_from_url(image.image)
                     if public_id:
                         delete_image_from_cloudinary(public_id)
-                        print(f"✅ Deleted variant image from Cloudinary: {public_id}")
+                        logger.info("Deleted variant image from Cloudinary: %s", public_id)
                 except Exception as e:
-                    print(f"⚠️ Failed to delete variant image: {str(e)}")
+                    logger.warning("Failed to delete variant image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -795,9 +838,9 @@ class VariantImageViewSet(viewsets.ModelViewSet):
         
         try:
             # Upload to Cloudinary
-            print(f"📤 Uploading image for variant {variant_id}...")
+            logger.debug("Uploading image for variant %s", variant_id)
             result = upload_image_to_cloudinary(image_file, folder='variant_images')
-            print(f"✅ Cloudinary upload successful: {result['secure_url']}")
+            logger.info("Cloudinary upload successful: %s", result['secure_url'])
             
             # Convert is_primary from string to boolean
             is_primary_raw = request.data.get('is_primary', False)
@@ -815,13 +858,11 @@ class VariantImageViewSet(viewsets.ModelViewSet):
                 order=order
             )
             
-            print(f"✅ VariantImage created: {variant_image.id}")
+            logger.info("VariantImage created: %s", variant_image.id)
             return Response(VariantImageSerializer(variant_image).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            import traceback
-            print(f"❌ Error uploading variant image: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error uploading variant image")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -836,9 +877,9 @@ class VariantImageViewSet(viewsets.ModelViewSet):
             if public_id:
                 try:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted variant image from Cloudinary: {public_id}")
+                    logger.info("Deleted variant image from Cloudinary: %s", public_id)
                 except Exception as e:
-                    print(f"⚠️ Failed to delete: {str(e)}")
+                    logger.warning("Failed to delete: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -918,10 +959,10 @@ class MensHoodieGridViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')
             
             if image_file:
-                print(f"📤 Uploading hoodie grid image to Cloudinary...")
+                logger.debug("Uploading hoodie grid image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='mens_hoodie_grid')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             grid_item = MensHoodieGrid.objects.create(
                 title=request.data.get('title', ''),
@@ -934,9 +975,7 @@ class MensHoodieGridViewSet(viewsets.ModelViewSet):
             return Response(MensHoodieGridSerializer(grid_item).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating grid item: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def update(self, request, *args, **kwargs):
@@ -956,15 +995,15 @@ class MensHoodieGridViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(grid_item.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old image: {public_id}")
+                            logger.info("Deleted old image: %s", public_id)
                     except Exception as e:
-                        print(f"⚠️ Failed to delete old image: {str(e)}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
-                print(f"📤 Uploading new grid image...")
+                logger.debug("Uploading new grid image")
                 result = upload_image_to_cloudinary(image_file, folder='mens_hoodie_grid')
                 grid_item.image = result['secure_url']
-                print(f"✅ New image uploaded: {grid_item.image}")
+                logger.info("New image uploaded: %s", grid_item.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 grid_item.image = request.data['image']
             
@@ -982,9 +1021,7 @@ class MensHoodieGridViewSet(viewsets.ModelViewSet):
             return Response(MensHoodieGridSerializer(grid_item).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            print(f"❌ Error updating grid item: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -998,9 +1035,9 @@ class MensHoodieGridViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(grid_item.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted grid image from Cloudinary: {public_id}")
+                    logger.info("Deleted grid image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"⚠️ Failed to delete image: {str(e)}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1045,8 +1082,7 @@ class JacketsGridViewSet(viewsets.ModelViewSet):
             
             return Response(JacketsGridSerializer(grid_item).data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating jackets grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def update(self, request, *args, **kwargs):
@@ -1071,7 +1107,7 @@ class JacketsGridViewSet(viewsets.ModelViewSet):
                         if public_id:
                             delete_image_from_cloudinary(public_id)
                     except Exception as e:
-                        print(f"Failed to delete old image: {e}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
                 result = upload_image_to_cloudinary(image_file, folder='jackets_grid')
@@ -1087,7 +1123,7 @@ class JacketsGridViewSet(viewsets.ModelViewSet):
             # Handle background_color - check for various key formats
             background_color = request.data.get('background_color')
             if background_color:
-                print(f"📍 Received background_color: {background_color}")
+                logger.debug("Received background_color: %s", background_color)
                 grid_item.background_color = background_color
             
             if 'link' in request.data:
@@ -1098,13 +1134,12 @@ class JacketsGridViewSet(viewsets.ModelViewSet):
                 is_active_val = request.data['is_active']
                 grid_item.is_active = is_active_val in [True, 'true', 'True', '1', 1]
             
-            print(f"📍 Saving grid_item with background_color: {grid_item.background_color}")
+            logger.debug("Saving grid_item with background_color: %s", grid_item.background_color)
             grid_item.save()
             return Response(JacketsGridSerializer(grid_item).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating jackets grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -1119,7 +1154,7 @@ class JacketsGridViewSet(viewsets.ModelViewSet):
                 if public_id:
                     delete_image_from_cloudinary(public_id)
             except Exception as e:
-                print(f"Failed to delete image: {e}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1147,10 +1182,10 @@ class PromotionalBannerViewSet(viewsets.ModelViewSet):
             image_url = ''
             if 'image' in request.FILES:
                 image_file = request.FILES['image']
-                print(f"📤 Uploading promotional banner image to Cloudinary...")
+                logger.debug("Uploading promotional banner image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='promotional_banners')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             is_active = request.data.get('is_active', True)
             if isinstance(is_active, str):
@@ -1171,8 +1206,7 @@ class PromotionalBannerViewSet(viewsets.ModelViewSet):
             
             return Response(PromotionalBannerSerializer(banner).data, status=status.HTTP_201_CREATED)
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating promotional banner")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def update(self, request, *args, **kwargs):
@@ -1196,15 +1230,15 @@ class PromotionalBannerViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(banner.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old banner image: {public_id}")
+                            logger.info("Deleted old banner image: %s", public_id)
                     except Exception as e:
-                        print(f"Failed to delete old image: {e}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
-                print(f"📤 Uploading new banner image...")
+                logger.debug("Uploading new banner image")
                 result = upload_image_to_cloudinary(image_file, folder='promotional_banners')
                 banner.image = result['secure_url']
-                print(f"✅ New image uploaded: {banner.image}")
+                logger.info("New image uploaded: %s", banner.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 banner.image = request.data['image']
             
@@ -1233,8 +1267,7 @@ class PromotionalBannerViewSet(viewsets.ModelViewSet):
             return Response(PromotionalBannerSerializer(banner).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating promotional banner")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -1248,9 +1281,9 @@ class PromotionalBannerViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(banner.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted banner image from Cloudinary: {public_id}")
+                    logger.info("Deleted banner image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"Failed to delete image: {e}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1277,10 +1310,10 @@ class TshirtGridViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')
             
             if image_file:
-                print(f"📤 Uploading T-shirt grid image to Cloudinary...")
+                logger.debug("Uploading T-shirt grid image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='tshirt_grid')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             is_active_val = request.data.get('is_active', 'true')
             is_active = is_active_val in [True, 'true', 'True', '1', 1]
@@ -1298,9 +1331,7 @@ class TshirtGridViewSet(viewsets.ModelViewSet):
             return Response(TshirtGridSerializer(item).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating T-shirt grid item: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating T-shirt grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def partial_update(self, request, *args, **kwargs):
@@ -1321,15 +1352,15 @@ class TshirtGridViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(item.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old T-shirt grid image: {public_id}")
+                            logger.info("Deleted old T-shirt grid image: %s", public_id)
                     except Exception as e:
-                        print(f"Failed to delete old image: {e}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
                 # Upload new image
-                print(f"📤 Uploading new T-shirt grid image...")
+                logger.debug("Uploading new T-shirt grid image")
                 result = upload_image_to_cloudinary(image_file, folder='tshirt_grid')
                 item.image = result['secure_url']
-                print(f"✅ New image uploaded: {item.image}")
+                logger.info("New image uploaded: %s", item.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 item.image = request.data['image']
             
@@ -1352,8 +1383,7 @@ class TshirtGridViewSet(viewsets.ModelViewSet):
             return Response(TshirtGridSerializer(item).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating T-shirt grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -1367,9 +1397,9 @@ class TshirtGridViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(item.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted T-shirt grid image from Cloudinary: {public_id}")
+                    logger.info("Deleted T-shirt grid image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"Failed to delete image: {e}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1399,10 +1429,10 @@ class ShoesGridViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')
             
             if image_file:
-                print(f"📤 Uploading Shoes grid image to Cloudinary...")
+                logger.debug("Uploading Shoes grid image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='shoes_grid')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             is_active_val = request.data.get('is_active', 'true')
             is_active = is_active_val in [True, 'true', 'True', '1', 1]
@@ -1419,9 +1449,7 @@ class ShoesGridViewSet(viewsets.ModelViewSet):
             return Response(ShoesGridSerializer(item).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating Shoes grid item: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating Shoes grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def partial_update(self, request, *args, **kwargs):
@@ -1441,14 +1469,14 @@ class ShoesGridViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(item.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old Shoes grid image: {public_id}")
+                            logger.info("Deleted old Shoes grid image: %s", public_id)
                     except Exception as e:
-                        print(f"Failed to delete old image: {e}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
-                print(f"📤 Uploading new Shoes grid image...")
+                logger.debug("Uploading new Shoes grid image")
                 result = upload_image_to_cloudinary(image_file, folder='shoes_grid')
                 item.image = result['secure_url']
-                print(f"✅ New image uploaded: {item.image}")
+                logger.info("New image uploaded: %s", item.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 item.image = request.data['image']
             
@@ -1468,8 +1496,7 @@ class ShoesGridViewSet(viewsets.ModelViewSet):
             return Response(ShoesGridSerializer(item).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating Shoes grid item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -1483,9 +1510,9 @@ class ShoesGridViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(item.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted Shoes grid image from Cloudinary: {public_id}")
+                    logger.info("Deleted Shoes grid image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"Failed to delete image: {e}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1515,10 +1542,10 @@ class ShoesCardViewSet(viewsets.ModelViewSet):
             image_url = request.data.get('image', '')
             
             if image_file:
-                print(f"📤 Uploading Shoes card image to Cloudinary...")
+                logger.debug("Uploading Shoes card image to Cloudinary")
                 result = upload_image_to_cloudinary(image_file, folder='shoes_cards')
                 image_url = result['secure_url']
-                print(f"✅ Image uploaded: {image_url}")
+                logger.info("Image uploaded: %s", image_url)
             
             is_active_val = request.data.get('is_active', 'true')
             is_active = is_active_val in [True, 'true', 'True', '1', 1]
@@ -1537,9 +1564,7 @@ class ShoesCardViewSet(viewsets.ModelViewSet):
             return Response(ShoesCardSerializer(item).data, status=status.HTTP_201_CREATED)
             
         except Exception as e:
-            print(f"❌ Error creating Shoes card item: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating Shoes card item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def partial_update(self, request, *args, **kwargs):
@@ -1559,14 +1584,14 @@ class ShoesCardViewSet(viewsets.ModelViewSet):
                         public_id = extract_public_id_from_url(item.image)
                         if public_id:
                             delete_image_from_cloudinary(public_id)
-                            print(f"✅ Deleted old Shoes card image: {public_id}")
+                            logger.info("Deleted old Shoes card image: %s", public_id)
                     except Exception as e:
-                        print(f"Failed to delete old image: {e}")
+                        logger.warning("Failed to delete old image: %s", e)
                 
-                print(f"📤 Uploading new Shoes card image...")
+                logger.debug("Uploading new Shoes card image")
                 result = upload_image_to_cloudinary(image_file, folder='shoes_cards')
                 item.image = result['secure_url']
-                print(f"✅ New image uploaded: {item.image}")
+                logger.info("New image uploaded: %s", item.image)
             elif 'image' in request.data and isinstance(request.data['image'], str):
                 item.image = request.data['image']
             
@@ -1590,8 +1615,7 @@ class ShoesCardViewSet(viewsets.ModelViewSet):
             return Response(ShoesCardSerializer(item).data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error updating Shoes card item")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     def destroy(self, request, *args, **kwargs):
@@ -1605,9 +1629,9 @@ class ShoesCardViewSet(viewsets.ModelViewSet):
                 public_id = extract_public_id_from_url(item.image)
                 if public_id:
                     delete_image_from_cloudinary(public_id)
-                    print(f"✅ Deleted Shoes card image from Cloudinary: {public_id}")
+                    logger.info("Deleted Shoes card image from Cloudinary: %s", public_id)
             except Exception as e:
-                print(f"Failed to delete image: {e}")
+                logger.warning("Failed to delete image: %s", e)
         
         return super().destroy(request, *args, **kwargs)
 
@@ -1739,16 +1763,14 @@ def get_related_products(request, slug):
                 count=Count('product')
             ).order_by('-count')[:4]
             
+            also_products = Product.objects.in_bulk([item['product'] for item in also_bought])
             for item in also_bought:
                 if len(final_products) >= MAX_PRODUCTS:
                     break
-                try:
-                    also_product = Product.objects.get(id=item['product'])
-                    if also_product.id not in related_ids:
-                        final_products.append(also_product)
-                        related_ids.add(also_product.id)
-                except Product.DoesNotExist:
-                    continue
+                also_product = also_products.get(item['product'])
+                if also_product and also_product.id not in related_ids:
+                    final_products.append(also_product)
+                    related_ids.add(also_product.id)
     
     # 3. SAME CATEGORY PRODUCTS (content-based fallback)
     if len(final_products) < MAX_PRODUCTS:
@@ -1771,7 +1793,8 @@ def get_related_products(request, slug):
                 final_products.append(cat_product)
                 related_ids.add(cat_product.id)
     
-    # Serialize and return
+    # Serialize and return; the cards' images and categories in three queries
+    prefetch_related_objects(final_products, 'category', 'images', 'color_variants__variant_images')
     serializer = RelatedProductCardSerializer(final_products, many=True)
     
     return Response({
@@ -0,0 +1,73 @@
+# reviews/feed.py
+"""
+Product review feed: cursor pagination, sort modes and first-page caching.
+
+The first page of each sort is what every product page loads, so it is
+cached per product (``REVIEW_FEED_CACHE_TIMEOUT``) together with the rating
+summary, and dropped by ``invalidate`` once a review write commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.pagination import CursorPagination
+
+from .models import ProductRatingSummary
+
+# Trailing keys make the order total, which cursor pagination relies on.
+SORTS = {
+    'newest': ('-created_at', '-id'),
+    'helpful': ('-helpful_count', '-created_at', '-id'),
+    'highest': ('-rating', '-created_at', '-id'),
+    'lowest': ('rating', '-created_at', '-id'),
+}
+DEFAULT_SORT = 'newest'
+
+
+class ReviewCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = SORTS[DEFAULT_SORT]
+
+    def get_ordering(self, request, queryset, view):
+        return SORTS[get_sort(request)]
+
+
+def get_sort(request):
+    sort = request.query_params.get('sort', DEFAULT_SORT)
+    return sort if sort in SORTS else DEFAULT_SORT
+
+
+def is_first_page(request):
+    """Default first page, the only one cached."""
+    return not ({'cursor', ReviewCursorPagination.page_size_query_param} & set(request.query_params))
+
+
+def cache_key(product_id, sort):
+    return f'reviews:feed:{product_id}:{sort}'
+
+
+def get_cached(product_id, sort):
+    return cache.get(cache_key(product_id, sort))
+
+
+def set_cached(product_id, sort, payload):
+    cache.set(cache_key(product_id, sort), payload, settings.REVIEW_FEED_CACHE_TIMEOUT)
+
+
+def invalidate(product_id):
+    """Drop the cached first pages of a product once the current transaction commits."""
+    keys = [cache_key(product_id, sort) for sort in SORTS]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def rating_summary(product_id):
+    """Average, count and star histogram from the precomputed rollup."""
+    summary = ProductRatingSummary.objects.filter(product_id=product_id).first()
+    if summary is None:
+        summary = ProductRatingSummary(product_id=product_id)
+    return {
+        'average': round(summary.average, 2),
+        'count': summary.rating_count,
+        'histogram': {str(stars): count for stars, count in summary.histogram().items()},
+    }
@@ -0,0 +1,21 @@
+# reviews/management/commands/flush_review_votes.py
+from django.core.management.base import BaseCommand
+
+from reviews import votes
+
+
+class Command(BaseCommand):
+    help = 'Apply buffered helpful votes to Review.helpful_count (see REVIEW_VOTE_BUFFERED)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Also reset every helpful_count to its baseline (votes from before '
+                                 'vote rows were recorded) plus its recorded votes')
+
+    def handle(self, *args, **options):
+        applied = votes.flush(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Applied {applied} pending votes'))
+        if options['rebuild']:
+            changed = votes.rebuild(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt helpful_count on {changed} reviews'))
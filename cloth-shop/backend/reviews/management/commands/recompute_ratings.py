@@ -0,0 +1,22 @@
+# reviews/management/commands/recompute_ratings.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews import ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild product rating summaries and Product.rating/reviews_count from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Only this product id (repeatable); default is every product')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = ratings.recompute(options['products'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed ratings for {count} products in {time.perf_counter() - started:.1f}s'
+        ))
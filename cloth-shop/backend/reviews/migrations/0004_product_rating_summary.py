@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+STAR_FIELDS = ('one_star', 'two_star', 'three_star', 'four_star', 'five_star')
+
+
+def backfill_summaries(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ProductRatingSummary = apps.get_model('reviews', 'ProductRatingSummary')
+    stars = {field: Count('id', filter=Q(rating=i)) for i, field in enumerate(STAR_FIELDS, 1)}
+    rows = (
+        Review.objects.filter(is_approved=True).order_by().values('product_id')
+        .annotate(rating_sum=Sum('rating'), rating_count=Count('id'), **stars)
+    )
+    ProductRatingSummary.objects.bulk_create(
+        [ProductRatingSummary(**row) for row in rows.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_relatedproduct'),
+        ('reviews', '0003_alter_review_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='products.product')),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('one_star', models.PositiveIntegerField(default=0)),
+                ('two_star', models.PositiveIntegerField(default=0)),
+                ('three_star', models.PositiveIntegerField(default=0)),
+                ('four_star', models.PositiveIntegerField(default=0)),
+                ('five_star', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_rating_summaries',
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
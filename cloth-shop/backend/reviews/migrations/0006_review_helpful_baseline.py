@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:39
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_baseline(apps, schema_editor):
+    # Whatever helpful_count holds beyond the applied vote rows was counted
+    # before votes were recorded; keep it as the baseline so a rebuild does
+    # not zero it.
+    Review = apps.get_model('reviews', 'Review')
+    ReviewVote = apps.get_model('reviews', 'ReviewVote')
+    applied = (
+        ReviewVote.objects.filter(review=OuterRef('pk'), applied=True).order_by()
+        .values('review').annotate(count=Count('id')).values('count')
+    )
+    Review.objects.update(
+        helpful_baseline=Greatest(F('helpful_count') - Coalesce(Subquery(applied), Value(0)), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_review_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='helpful_baseline',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_baseline, migrations.RunPython.noop),
+    ]
@@ -12,6 +12,9 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)  # Optional
     verified_purchase = models.BooleanField(default=False)
     helpful_count = models.IntegerField(default=0)
+    # Helpful votes counted before ReviewVote rows existed (or imported);
+    # helpful_count is this plus the review's votes
+    helpful_baseline = models.IntegerField(default=0)
     is_approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -24,10 +27,62 @@ class Review(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.product.name}"
 
+class ReviewVote(models.Model):
+    """One "helpful" vote per user per review; the source of truth for ``Review.helpful_count``."""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='review_votes')
+    # False while the vote waits for flush_review_votes (REVIEW_VOTE_BUFFERED)
+    applied = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'review_votes'
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'user'], name='unique_review_vote'),
+        ]
+        indexes = [
+            models.Index(fields=['review'], condition=models.Q(applied=False), name='review_votes_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> review {self.review_id}"
+
 class ReviewImage(models.Model):
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='review_images/')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Review Image - {self.review.id}"
\ No newline at end of file
+        return f"Review Image - {self.review.id}"
+
+class ProductRatingSummary(models.Model):
+    """
+    Running rating rollup per product, kept in step with approved reviews by
+    ``reviews.ratings``. ``Product.rating``/``reviews_count`` are derived
+    from it; ``manage.py recompute_ratings`` rebuilds it from scratch.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    one_star = models.PositiveIntegerField(default=0)
+    two_star = models.PositiveIntegerField(default=0)
+    three_star = models.PositiveIntegerField(default=0)
+    four_star = models.PositiveIntegerField(default=0)
+    five_star = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    STAR_FIELDS = ('one_star', 'two_star', 'three_star', 'four_star', 'five_star')
+
+    class Meta:
+        db_table = 'product_rating_summaries'
+
+    def __str__(self):
+        return f"{self.product_id}: {self.rating_sum}/{self.rating_count}"
+
+    @property
+    def average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    def histogram(self):
+        """Star counts keyed by rating, 5 first."""
+        return {stars: getattr(self, self.STAR_FIELDS[stars - 1]) for stars in range(5, 0, -1)}
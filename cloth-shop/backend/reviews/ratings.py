@@ -0,0 +1,106 @@
+# reviews/ratings.py
+"""
+Incremental product rating rollup.
+
+Every approved review contributes to its product's ``ProductRatingSummary``
+(sum, count and 1-5 star histogram). Review writes apply a delta with
+F-expressions instead of re-aggregating all reviews, and copy the result to
+``Product.rating``/``reviews_count`` with a queryset ``update()`` so
+``Product.save()`` (discount math, ``updated_at``) is not involved.
+
+Call ``apply_change`` in the same transaction as the review write.
+``recompute`` rebuilds summaries from the reviews table for repair.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from products.models import Product
+from .models import Review, ProductRatingSummary
+
+SUMMARY_FIELDS = ('rating_sum', 'rating_count') + ProductRatingSummary.STAR_FIELDS
+
+
+def star_field(rating):
+    return ProductRatingSummary.STAR_FIELDS[rating - 1]
+
+
+def counted(review):
+    """The rating a review contributes to the rollup, or None if it does not count."""
+    return review.rating if review.is_approved else None
+
+
+def product_rating(rating_sum, rating_count):
+    if not rating_count:
+        return Decimal('0')
+    return (Decimal(rating_sum) / rating_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def apply_change(product_id, added=None, removed=None):
+    """
+    Move one review's contribution: ``added`` is the rating entering the
+    rollup, ``removed`` the rating leaving it (None for either side that
+    does not apply, e.g. ``removed`` for a new review).
+    """
+    if added == removed:
+        return
+    updates = {
+        'rating_sum': F('rating_sum') + ((added or 0) - (removed or 0)),
+        'rating_count': F('rating_count') + (int(added is not None) - int(removed is not None)),
+    }
+    if added is not None:
+        updates[star_field(added)] = F(star_field(added)) + 1
+    if removed is not None:
+        updates[star_field(removed)] = F(star_field(removed)) - 1
+
+    with transaction.atomic():
+        if not ProductRatingSummary.objects.filter(product_id=product_id).update(**updates):
+            # First review for this product: build the row from the reviews
+            # table, which already includes the write being applied.
+            recompute([product_id])
+            return
+        summary = ProductRatingSummary.objects.only('rating_sum', 'rating_count').get(product_id=product_id)
+        Product.objects.filter(pk=product_id).update(
+            rating=product_rating(summary.rating_sum, summary.rating_count),
+            reviews_count=summary.rating_count,
+        )
+
+
+def recompute(product_ids=None, batch_size=1000):
+    """Rebuild summaries and product rating columns from approved reviews. Returns the product count."""
+    products = Product.objects.all()
+    reviews = Review.objects.filter(is_approved=True)
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        reviews = reviews.filter(product_id__in=product_ids)
+
+    stars = {field: Count('id', filter=Q(rating=i)) for i, field in enumerate(ProductRatingSummary.STAR_FIELDS, 1)}
+    totals = {
+        row.pop('product_id'): row
+        for row in reviews.order_by().values('product_id').annotate(
+            rating_sum=Sum('rating'), rating_count=Count('id'), **stars
+        )
+    }
+    empty = dict.fromkeys(SUMMARY_FIELDS, 0)
+    summaries = [
+        ProductRatingSummary(product_id=product_id, **totals.get(product_id, empty))
+        for product_id in products.values_list('pk', flat=True)
+    ]
+    with transaction.atomic():
+        ProductRatingSummary.objects.bulk_create(
+            summaries, batch_size=batch_size, update_conflicts=True,
+            unique_fields=['product'], update_fields=list(SUMMARY_FIELDS) + ['updated_at'],
+        )
+        Product.objects.bulk_update(
+            [
+                Product(
+                    pk=summary.product_id,
+                    rating=product_rating(summary.rating_sum, summary.rating_count),
+                    reviews_count=summary.rating_count,
+                )
+                for summary in summaries
+            ],
+            ['rating', 'reviews_count'], batch_size=batch_size,
+        )
+    return len(summaries)
@@ -1,3 +1,254 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import PurchasedProduct
+from products.models import Category, Product
+from reviews import feed, ratings, votes
+from reviews.models import ProductRatingSummary, Review, ReviewVote
+from users.models import CustomUser
+
+
+def create_product(slug='runner'):
+    category, _ = Category.objects.get_or_create(name='Shoes', slug='shoes', category_type='shoes')
+    return Product.objects.create(
+        category=category, name=slug.title(), slug=slug, description='', base_price=Decimal('500.00'),
+    )
+
+
+def create_buyer(email, product):
+    user = CustomUser.objects.create_user(email=email, password='x')
+    PurchasedProduct.objects.create(user=user, product=product, first_delivered_at=timezone.now())
+    return user
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class RatingRollupTests(TestCase):
+    """Review writes keep the summary and ``Product.rating``/``reviews_count`` in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product()
+        cls.buyers = [create_buyer(f'buyer{i}@example.com', cls.product) for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def review(self, buyer, rating):
+        self.client.force_authenticate(buyer)
+        response = self.client.post(
+            '/api/reviews/create/', {'product_id': self.product.pk, 'rating': rating, 'title': 'Review'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def assertRollup(self, average, count, histogram):
+        self.product.refresh_from_db()
+        summary = ProductRatingSummary.objects.get(product=self.product)
+        self.assertEqual(self.product.rating, Decimal(average))
+        self.assertEqual(self.product.reviews_count, count)
+        self.assertEqual(summary.rating_count, count)
+        self.assertEqual(summary.histogram(), histogram)
+
+    def test_create_edit_and_delete_move_the_rollup(self):
+        first = self.review(self.buyers[0], 5)
+        self.assertRollup('5.00', 1, {5: 1, 4: 0, 3: 0, 2: 0, 1: 0})
+        second = self.review(self.buyers[1], 2)
+        self.review(self.buyers[2], 4)
+        self.assertRollup('3.67', 3, {5: 1, 4: 1, 3: 0, 2: 1, 1: 0})
+
+        self.client.force_authenticate(self.buyers[1])
+        response = self.client.put(f'/api/reviews/update/{second}/', {'rating': 3, 'title': 'Better'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollup('4.00', 3, {5: 1, 4: 1, 3: 1, 2: 0, 1: 0})
+
+        self.client.force_authenticate(self.buyers[0])
+        self.assertEqual(self.client.delete(f'/api/reviews/delete/{first}/').status_code, 200)
+        self.assertRollup('3.50', 2, {5: 0, 4: 1, 3: 1, 2: 0, 1: 0})
+
+    def test_deleting_the_last_review_resets_the_rating(self):
+        review_id = self.review(self.buyers[0], 4)
+        self.client.delete(f'/api/reviews/delete/{review_id}/')
+        self.assertRollup('0.00', 0, {5: 0, 4: 0, 3: 0, 2: 0, 1: 0})
+
+    def test_unapproved_reviews_do_not_count(self):
+        self.review(self.buyers[0], 5)
+        review_id = self.review(self.buyers[1], 1)
+        Review.objects.filter(pk=review_id).update(is_approved=False)
+        ratings.recompute([self.product.pk])
+        self.assertRollup('5.00', 1, {5: 1, 4: 0, 3: 0, 2: 0, 1: 0})
+
+        # Editing a hidden review leaves the rollup alone
+        self.client.force_authenticate(self.buyers[1])
+        self.client.put(f'/api/reviews/update/{review_id}/', {'rating': 2, 'title': 'Meh'}, format='json')
+        self.assertRollup('5.00', 1, {5: 1, 4: 0, 3: 0, 2: 0, 1: 0})
+
+    def test_incremental_rollup_matches_a_recompute(self):
+        for buyer, rating in zip(self.buyers, (5, 3, 1)):
+            self.review(buyer, rating)
+        incremental = ProductRatingSummary.objects.values().get(product=self.product)
+
+        ratings.recompute([self.product.pk])
+        rebuilt = ProductRatingSummary.objects.values().get(product=self.product)
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(incremental, rebuilt)
+        self.assertRollup('3.00', 3, {5: 1, 4: 0, 3: 1, 2: 0, 1: 1})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ReviewFeedTests(TestCase):
+    """Cursor pages of the review feed and the cached first page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product()
+        users = [CustomUser.objects.create_user(email=f'reader{i}@example.com', password=None) for i in range(25)]
+        Review.objects.bulk_create([
+            Review(product=cls.product, user=user, rating=i % 5 + 1, title=f'Review {i}', is_approved=True,
+                   helpful_count=i % 3)
+            for i, user in enumerate(users)
+        ])
+        # Ties on every sort key but id, so only the tie-breakers keep pages apart
+        created_at = timezone.now() - timedelta(days=1)
+        Review.objects.filter(pk__in=[review.pk for review in Review.objects.all()[:15]]).update(created_at=created_at)
+        ratings.recompute([cls.product.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def feed_url(self, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return f'/api/reviews/product/{self.product.pk}/?{query}'
+
+    def walk(self, sort):
+        ids = []
+        url = self.feed_url(sort=sort, page_size=7)
+        while url:
+            payload = self.client.get(url).json()
+            ids.extend(review['id'] for review in payload['results'])
+            url = payload['next']
+        return ids
+
+    def test_pages_follow_a_stable_total_order(self):
+        for sort, ordering in feed.SORTS.items():
+            with self.subTest(sort=sort):
+                expected = list(
+                    Review.objects.filter(product=self.product).order_by(*ordering).values_list('pk', flat=True)
+                )
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_pages_do_not_shift_when_a_review_lands_mid_walk(self):
+        first = self.client.get(self.feed_url(page_size=10)).json()
+        buyer = create_buyer('late@example.com', self.product)
+        self.client.force_authenticate(buyer)
+        self.client.post('/api/reviews/create/', {'product_id': self.product.pk, 'rating': 5, 'title': 'Late'}, format='json')
+        self.client.force_authenticate(None)
+
+        second = self.client.get(first['next']).json()
+        seen = [review['id'] for review in first['results'] + second['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_first_page_is_cached_until_a_review_is_written(self):
+        first = self.client.get(self.feed_url())
+        self.client.get(self.feed_url(sort='helpful'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.feed_url())
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(first.json()['summary']['count'], 25)
+
+        buyer = create_buyer('writer@example.com', self.product)
+        self.client.force_authenticate(buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/reviews/create/', {'product_id': self.product.pk, 'rating': 1, 'title': 'New'}, format='json'
+            )
+        self.client.force_authenticate(None)
+
+        for sort in feed.SORTS:
+            self.assertIsNone(feed.get_cached(self.product.pk, sort))
+        fresh = self.client.get(self.feed_url()).json()
+        self.assertEqual(fresh['results'][0]['id'], response.json()['id'])
+        self.assertEqual(fresh['summary']['count'], 26)
+
+    def test_bad_cursor_is_not_found(self):
+        response = self.client.get(self.feed_url(cursor='garbage'))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('error', response.json())
+        self.assertEqual(self.client.get(self.feed_url(cursor='')).status_code, 200)
+
+    def test_other_pages_are_not_cached(self):
+        self.client.get(self.feed_url(page_size=5))
+        self.assertIsNone(feed.get_cached(self.product.pk, feed.DEFAULT_SORT))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class HelpfulVoteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', password='x')
+        cls.voters = [CustomUser.objects.create_user(email=f'voter{i}@example.com', password='x') for i in range(3)]
+        cls.product = create_product()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.review = Review.objects.create(
+            product=self.product, user=self.author, rating=5, title='Great', is_approved=True,
+        )
+
+    def vote(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/reviews/helpful/{self.review.pk}/')
+
+    def test_second_vote_from_the_same_user_is_rejected(self):
+        first = self.vote(self.voters[0])
+        second = self.vote(self.voters[0])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['helpful_count'], 1)
+        self.assertEqual(second.status_code, 400)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 1)
+        self.assertEqual(self.review.votes.count(), 1)
+
+    @override_settings(REVIEW_VOTE_BUFFERED=True)
+    def test_buffered_votes_are_applied_by_flush(self):
+        for voter in self.voters:
+            self.assertEqual(self.vote(voter).status_code, 200)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 0)
+
+        out = StringIO()
+        call_command('flush_review_votes', stdout=out)
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 3)
+        self.assertIn('Applied 3 pending votes', out.getvalue())
+        self.assertFalse(ReviewVote.objects.filter(applied=False).exists())
+        self.assertEqual(votes.flush(), 0)
+
+    def test_rebuild_keeps_votes_counted_before_vote_rows(self):
+        legacy = Review.objects.create(
+            product=create_product('sandal'), user=self.author, rating=4, title='Good', is_approved=True,
+            helpful_count=7, helpful_baseline=7,
+        )
+        self.vote(self.voters[0])
+        Review.objects.filter(pk=self.review.pk).update(helpful_count=40)
+
+        out = StringIO()
+        call_command('flush_review_votes', '--rebuild', stdout=out)
+
+        legacy.refresh_from_db()
+        self.review.refresh_from_db()
+        self.assertEqual(legacy.helpful_count, 7)
+        self.assertEqual(self.review.helpful_count, 1)
+        self.assertIn('Rebuilt helpful_count on 1 reviews', out.getvalue())
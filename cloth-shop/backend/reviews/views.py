@@ -1,24 +1,52 @@
 # reviews/views.py
-from django.db import models
+import logging
+
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .models import Review
 from .serializers import ReviewSerializer, ReviewCreateSerializer
 from products.models import Product
-from orders.models import Order, OrderItem
+from orders import purchases
+from . import feed, ratings, votes
+
+logger = logging.getLogger(__name__)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_product_reviews(request, product_id):
+    """Cursor-paginated approved reviews with the product's rating summary.
+
+    Query params: ``sort`` (newest, helpful, highest, lowest), ``cursor``
+    and ``page_size``. The default first page of each sort is cached.
+    """
     try:
-        reviews = Review.objects.filter(
-            product_id=product_id,
-            is_approved=True
-        ).order_by('-created_at')
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        sort = feed.get_sort(request)
+        cacheable = feed.is_first_page(request)
+        if cacheable:
+            payload = feed.get_cached(product_id, sort)
+            if payload is not None:
+                return Response(payload)
+
+        reviews = (
+            Review.objects.filter(product_id=product_id, is_approved=True)
+            .select_related('user')
+            .prefetch_related('images')
+        )
+        paginator = feed.ReviewCursorPagination()
+        page = paginator.paginate_queryset(reviews, request)
+        payload = paginator.get_paginated_response(ReviewSerializer(page, many=True).data).data
+        payload['sort'] = sort
+        payload['summary'] = feed.rating_summary(product_id)
+        if cacheable:
+            feed.set_cached(product_id, sort, payload)
+        return Response(payload)
+    except APIException:
+        # e.g. NotFound for a malformed or tampered cursor
+        raise
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -30,11 +58,7 @@ def check_can_review(request, product_id):
         product = Product.objects.get(id=product_id)
         
         # Check if user has a delivered order for this product
-        has_delivered = OrderItem.objects.filter(
-            order__user=request.user,
-            order__status='delivered',
-            product=product
-        ).exists()
+        has_delivered = purchases.has_purchased(request.user, product.id)
         
         # Check if user already has a review
         existing_review = Review.objects.filter(
@@ -68,11 +92,7 @@ def create_review(request):
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Check if user has a delivered order for this product
-        has_delivered = OrderItem.objects.filter(
-            order__user=request.user,
-            order__status='delivered',
-            product=product
-        ).exists()
+        has_delivered = purchases.has_purchased(request.user, product.id)
         
         if not has_delivered:
             return Response({
@@ -92,24 +112,23 @@ def create_review(request):
         
         serializer = ReviewCreateSerializer(data=request.data)
         if serializer.is_valid():
-            review = Review.objects.create(
-                product=product,
-                user=request.user,
-                verified_purchase=True,  # Always true since we verified delivery
-                is_approved=True,
-                rating=serializer.validated_data.get('rating'),
-                title=serializer.validated_data.get('title', ''),
-                comment=serializer.validated_data.get('comment', '') or ''
-            )
-            
-            # Update product rating
-            update_product_rating(product)
+            with transaction.atomic():
+                review = Review.objects.create(
+                    product=product,
+                    user=request.user,
+                    verified_purchase=True,  # Always true since we verified delivery
+                    is_approved=True,
+                    rating=serializer.validated_data.get('rating'),
+                    title=serializer.validated_data.get('title', ''),
+                    comment=serializer.validated_data.get('comment', '') or ''
+                )
+                ratings.apply_change(product.id, added=ratings.counted(review))
+                feed.invalidate(product.id)
             
             return Response(ReviewSerializer(review).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating review")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['PUT'])
@@ -124,19 +143,19 @@ def update_review(request, review_id):
         
         serializer = ReviewCreateSerializer(data=request.data)
         if serializer.is_valid():
+            previous = ratings.counted(review)
             review.rating = serializer.validated_data.get('rating', review.rating)
             review.title = serializer.validated_data.get('title', review.title)
             review.comment = serializer.validated_data.get('comment', review.comment) or ''
-            review.save()
-            
-            # Update product rating
-            update_product_rating(review.product)
+            with transaction.atomic():
+                review.save()
+                ratings.apply_change(review.product_id, added=ratings.counted(review), removed=previous)
+                feed.invalidate(review.product_id)
             
             return Response(ReviewSerializer(review).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating review")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['DELETE'])
@@ -149,11 +168,10 @@ def delete_review(request, review_id):
         except Review.DoesNotExist:
             return Response({'error': 'Review not found or not yours'}, status=status.HTTP_404_NOT_FOUND)
         
-        product = review.product
-        review.delete()
-        
-        # Update product rating
-        update_product_rating(product)
+        with transaction.atomic():
+            review.delete()
+            ratings.apply_change(review.product_id, removed=ratings.counted(review))
+            feed.invalidate(review.product_id)
         
         return Response({'message': 'Review deleted successfully'})
     except Exception as e:
@@ -163,19 +181,16 @@ def delete_review(request, review_id):
 @permission_classes([IsAuthenticated])
 def mark_helpful(request, review_id):
     try:
-        review = Review.objects.get(id=review_id)
-        review.helpful_count += 1
-        review.save()
+        try:
+            review = Review.objects.get(id=review_id, is_approved=True)
+        except Review.DoesNotExist:
+            return Response({'error': 'Review not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not votes.record_vote(review, request.user):
+            return Response({'error': 'You have already marked this review as helpful'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        review.refresh_from_db(fields=['helpful_count'])
         serializer = ReviewSerializer(review)
         return Response(serializer.data)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-def update_product_rating(product):
-    """Helper function to update product rating and review count"""
-    avg_rating = Review.objects.filter(product=product, is_approved=True).aggregate(
-        avg=models.Avg('rating')
-    )['avg']
-    product.rating = avg_rating or 0
-    product.reviews_count = Review.objects.filter(product=product, is_approved=True).count()
-    product.save()
\ No newline at end of file
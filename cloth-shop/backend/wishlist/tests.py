@@ -1,3 +1,75 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from users.models import CustomUser
+from wishlist.models import Wishlist
+from wishlist.views import MAX_BULK_IDS
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class BulkWishlistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Shirts', slug='shirts', category_type='shirts')
+        cls.products = Product.objects.bulk_create([
+            Product(category=category, name=f'Shirt {i}', slug=f'shirt-{i}', description='',
+                    base_price=Decimal('700.00'))
+            for i in range(6)
+        ])
+        cls.ids = [product.pk for product in cls.products]
+        cls.user = CustomUser.objects.create_user(email='saver@example.com', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, expand=False, **body):
+        url = '/api/wishlist/bulk/' + ('?expand=products' if expand else '')
+        return self.client.post(url, body, format='json')
+
+    def test_add_creates_the_wishlist_and_ignores_duplicates_and_unknown_ids(self):
+        response = self.bulk(add=self.ids[:3] + [self.ids[0], 999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['product_ids']), self.ids[:3])
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+
+        # Repeating the merge (e.g. a retried login sync) changes nothing
+        again = self.bulk(add=self.ids[:3])
+        self.assertEqual(again.json()['product_ids'], response.json()['product_ids'])
+
+    def test_add_and_remove_in_one_request(self):
+        self.bulk(add=self.ids[:4])
+
+        response = self.bulk(add=self.ids[4:], remove=self.ids[:2] + [self.ids[5]])
+
+        self.assertEqual(sorted(response.json()['product_ids']), [self.ids[2], self.ids[3], self.ids[4]])
+
+    def test_expand_returns_product_cards_in_wishlist_order(self):
+        with CaptureQueriesContext(connection) as one_card:
+            self.bulk(expand=True, add=[self.ids[3]])
+        self.bulk(add=[self.ids[1]])
+        with CaptureQueriesContext(connection) as three_cards:
+            response = self.bulk(expand=True, add=[self.ids[5]])
+        self.assertEqual(len(three_cards), len(one_card))
+
+        cards = response.json()['products']
+        self.assertEqual([card['id'] for card in cards], [self.ids[3], self.ids[1], self.ids[5]])
+        self.assertEqual(response.json()['product_ids'], [self.ids[3], self.ids[1], self.ids[5]])
+
+    def test_get_matches_the_bulk_response(self):
+        bulk = self.bulk(expand=True, add=self.ids[:2]).json()
+        self.assertEqual(self.client.get('/api/wishlist/?expand=products').json(), bulk)
+
+    def test_invalid_payloads_are_rejected(self):
+        self.assertEqual(self.bulk(add='1,2').status_code, 400)
+        self.assertEqual(self.bulk(add=['x']).status_code, 400)
+        self.assertEqual(self.bulk(add=list(range(1, MAX_BULK_IDS + 2))).status_code, 400)
+        self.assertFalse(Wishlist.products.through.objects.exists())
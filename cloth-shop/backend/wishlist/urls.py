@@ -6,4 +6,5 @@ urlpatterns = [
     path('', views.get_wishlist, name='get-wishlist'),
     path('add/<int:product_id>/', views.add_to_wishlist, name='add-wishlist'),
     path('remove/<int:product_id>/', views.remove_from_wishlist, name='remove-wishlist'),
+    path('bulk/', views.bulk_update_wishlist, name='bulk-wishlist'),
 ]
\ No newline at end of file
@@ -1,31 +1,80 @@
 # wishlist/views.py
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 
 from .models import Wishlist
 from products.models import Product
-from  .serializers import WishlistSerializer
+from products.serializers import ProductListSerializer
+
+# Writes go straight to the M2M through table: one INSERT ... ON CONFLICT
+# DO NOTHING or one DELETE per request, no Wishlist.save().
+WishlistItem = Wishlist.products.through
+
+MAX_BULK_IDS = 200
+
+
+def _product_ids(user):
+    return list(
+        WishlistItem.objects.filter(wishlist__user=user).order_by('id').values_list('product_id', flat=True)
+    )
+
+
+def _wishlist_response(request):
+    product_ids = _product_ids(request.user)
+    data = {'product_ids': product_ids, 'count': len(product_ids)}
+    if request.query_params.get('expand') == 'products':
+        by_id = Product.objects.for_listing().in_bulk(product_ids)
+        data['products'] = ProductListSerializer(
+            [by_id[product_id] for product_id in product_ids if product_id in by_id], many=True
+        ).data
+    return Response(data)
+
+
+def _parse_ids(values):
+    if not isinstance(values, list):
+        raise ValueError('must be a list of product ids')
+    ids = {int(value) for value in values}
+    if len(ids) > MAX_BULK_IDS:
+        raise ValueError(f'at most {MAX_BULK_IDS} ids per request')
+    return ids
+
+
+def _add_products(user, product_ids):
+    """Add existing products to the user's wishlist; already wishlisted ids are ignored."""
+    product_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+    if not product_ids:
+        return
+    wishlist_id = Wishlist.objects.filter(user=user).values_list('id', flat=True).first()
+    if wishlist_id is None:
+        wishlist_id = Wishlist.objects.get_or_create(user=user)[0].id
+    WishlistItem.objects.bulk_create(
+        [WishlistItem(wishlist_id=wishlist_id, product_id=product_id) for product_id in product_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _remove_products(user, product_ids):
+    WishlistItem.objects.filter(wishlist__user=user, product_id__in=product_ids).delete()
+
 
 # GET WISHLIST
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_wishlist(request):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    serializer = WishlistSerializer(wishlist)
-    return Response(serializer.data)
+    """Wishlisted product ids; ``?expand=products`` adds full product cards."""
+    return _wishlist_response(request)
 
 
 # ADD PRODUCT TO WISHLIST
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_to_wishlist(request, product_id):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    product = get_object_or_404(Product, id=product_id)
-
-    wishlist.products.add(product)
-    wishlist.save()
+    if not Product.objects.filter(id=product_id).exists():
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    _add_products(request.user, [product_id])
 
     return Response({"message": "Product added to wishlist"})
 
@@ -33,10 +82,28 @@ def add_to_wishlist(request, product_id):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remove_from_wishlist(request, product_id):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    product = get_object_or_404(Product, id=product_id)
+    _remove_products(request.user, [product_id])
+
+    return Response({"message": "Product removed from wishlist"})
+
+# BULK ADD / REMOVE (e.g. syncing a guest wishlist on login)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_update_wishlist(request):
+    """``{"add": [ids], "remove": [ids]}``; idempotent, unknown ids are skipped.
+
+    Responds like ``get_wishlist`` (honours ``?expand=products``).
+    """
+    try:
+        add_ids = _parse_ids(request.data.get('add', []))
+        remove_ids = _parse_ids(request.data.get('remove', []))
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    wishlist.products.remove(product)
-    wishlist.save()
+    with transaction.atomic():
+        if add_ids:
+            _add_products(request.user, add_ids - remove_ids)
+        if remove_ids:
+            _remove_products(request.user, remove_ids)
 
-    return Response({"message": "Product removed from wishlist"})
\ No newline at end of file
+    return _wishlist_response(request)
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { BrowserRouter as Router, Routes, Route, Navigate, useLocation } from 'react-router-dom';
 import { useDispatch, useSelector } from 'react-redux';
 import { fetchCart } from './redux/slices/cartSlice';
-import { fetchWishlist } from './redux/slices/wishlistSlice';
+import { fetchWishlist, hasGuestWishlist, mergeGuestWishlist } from './redux/slices/wishlistSlice';
 import { GoogleOAuthProvider } from '@react-oauth/google';
 
 import Navbar from './components/Navbar';
@@ -48,7 +48,10 @@ function App() {
   useEffect(() => {
     if (isAuthenticated) {
       dispatch(fetchCart());
-      dispatch(fetchWishlist());
+      // Items wishlisted while logged out are merged once, on the first load after login
+      dispatch(hasGuestWishlist() ? mergeGuestWishlist() : fetchWishlist());
+    } else if (localStorage.getItem('guest_cart')) {
+      dispatch(fetchCart());
     }
   }, [isAuthenticated, dispatch]);
 
@@ -66,9 +69,9 @@ function App() {
             <Route path="/product/:slug" element={<ProductDetail />} />
             <Route path="/login" element={<Login />} />
             <Route path="/register" element={<Register />} />
+            <Route path="/cart" element={<Cart />} />
 
             {/* Protected User Pages */}
-            <Route path="/cart" element={<ProtectedRoute><Cart /></ProtectedRoute>} />
             <Route path="/checkout" element={<ProtectedRoute><Checkout /></ProtectedRoute>} />
             <Route path="/order-confirmation/:orderId" element={<ProtectedRoute><OrderConfirmation /></ProtectedRoute>} />
             <Route path="/profile" element={<ProtectedRoute><Profile /></ProtectedRoute>} />
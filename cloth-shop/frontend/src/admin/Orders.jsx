@@ -12,6 +12,9 @@ export default function Orders() {
   const [showModal, setShowModal] = useState(false);
   const [currentPage, setCurrentPage] = useState(1);
   const [updatingStatus, setUpdatingStatus] = useState(null);
+  const [selectedIds, setSelectedIds] = useState([]);
+  const [bulkStatus, setBulkStatus] = useState('');
+  const [bulkUpdating, setBulkUpdating] = useState(false);
 
   const itemsPerPage = 10;
 
@@ -51,11 +54,28 @@ export default function Orders() {
     setShowModal(true);
   };
 
+  // One request moves any number of orders; orders that may not make the
+  // move come back with result 'invalid_transition'
+  const updateStatuses = async (orderIds, newStatus) => {
+    const response = await API.post('/orders/bulk-status/', {
+      order_ids: orderIds,
+      status: newStatus,
+    });
+    return response.data;
+  };
+
   const handleStatusUpdate = async (orderId, newStatus) => {
     try {
       setUpdatingStatus(orderId);
-      await API.patch(`/orders/${orderId}/`, { status: newStatus });
-      toast.success('Order status updated');
+      const data = await updateStatuses([orderId], newStatus);
+      const [result] = data.results;
+      if (result.result === 'updated') {
+        toast.success('Order status updated');
+      } else {
+        toast.error(
+          `Cannot move order from ${getStatusLabel(result.previous_status)} to ${getStatusLabel(newStatus)}`
+        );
+      }
       fetchOrders();
       setSelectedOrder(null);
     } catch (error) {
@@ -66,6 +86,33 @@ export default function Orders() {
     }
   };
 
+  const handleBulkUpdate = async () => {
+    if (!bulkStatus || selectedIds.length === 0) return;
+    try {
+      setBulkUpdating(true);
+      const data = await updateStatuses(selectedIds, bulkStatus);
+      const skipped = data.results.length - data.updated;
+      toast.success(
+        `${data.updated} orders moved to ${getStatusLabel(bulkStatus)}` +
+          (skipped ? `, ${skipped} skipped` : '')
+      );
+      setSelectedIds([]);
+      setBulkStatus('');
+      fetchOrders();
+    } catch (error) {
+      toast.error('Failed to update orders');
+      console.error(error);
+    } finally {
+      setBulkUpdating(false);
+    }
+  };
+
+  const toggleSelected = (orderId) => {
+    setSelectedIds((ids) =>
+      ids.includes(orderId) ? ids.filter((id) => id !== orderId) : [...ids, orderId]
+    );
+  };
+
   const getStatusColor = (status) => {
     const statusObj = STATUS_OPTIONS.find((s) => s.value === status);
     return statusObj ? statusObj.color : 'gray';
@@ -133,6 +180,38 @@ export default function Orders() {
         </select>
       </div>
 
+      {/* Bulk Actions */}
+      {selectedIds.length > 0 && (
+        <div className="bg-indigo-50 border border-indigo-200 rounded-lg p-4 flex items-center gap-4 flex-wrap">
+          <span className="text-sm font-semibold text-indigo-800">{selectedIds.length} selected</span>
+          <select
+            value={bulkStatus}
+            onChange={(e) => setBulkStatus(e.target.value)}
+            className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-indigo-500 focus:outline-none"
+          >
+            <option value="">Move to...</option>
+            {STATUS_OPTIONS.map((status) => (
+              <option key={status.value} value={status.value}>
+                {status.label}
+              </option>
+            ))}
+          </select>
+          <button
+            onClick={handleBulkUpdate}
+            disabled={!bulkStatus || bulkUpdating}
+            className="px-4 py-2 bg-indigo-600 text-white rounded-lg font-semibold hover:bg-indigo-700 transition disabled:opacity-50"
+          >
+            {bulkUpdating ? 'Updating...' : 'Apply'}
+          </button>
+          <button
+            onClick={() => setSelectedIds([])}
+            className="text-sm text-gray-600 hover:text-gray-800"
+          >
+            Clear
+          </button>
+        </div>
+      )}
+
       {/* Orders Table */}
       <div className="bg-white rounded-lg shadow overflow-hidden">
         {loading ? (
@@ -144,6 +223,15 @@ export default function Orders() {
             <table className="w-full">
               <thead className="bg-gray-50 border-b">
                 <tr>
+                  <th className="px-4 py-3">
+                    <input
+                      type="checkbox"
+                      checked={filteredOrders.every((order) => selectedIds.includes(order.id))}
+                      onChange={(e) =>
+                        setSelectedIds(e.target.checked ? filteredOrders.map((order) => order.id) : [])
+                      }
+                    />
+                  </th>
                   <th className="px-6 py-3 text-left text-sm font-semibold text-gray-700">Order ID</th>
                   <th className="px-6 py-3 text-left text-sm font-semibold text-gray-700">Customer</th>
                   <th className="px-6 py-3 text-left text-sm font-semibold text-gray-700">Items</th>
@@ -157,6 +245,13 @@ export default function Orders() {
               <tbody className="divide-y">
                 {filteredOrders.map((order) => (
                   <tr key={order.id} className="hover:bg-gray-50 transition">
+                    <td className="px-4 py-4">
+                      <input
+                        type="checkbox"
+                        checked={selectedIds.includes(order.id)}
+                        onChange={() => toggleSelected(order.id)}
+                      />
+                    </td>
                     <td className="px-6 py-4">
                       <span className="font-mono font-semibold text-indigo-600">{order.order_number}</span>
                     </td>
@@ -4,6 +4,11 @@ export const cartAPI = {
   getCart: () => API.get('/cart/'),
   addToCart: (data) => API.post('/cart/add/', data),
   updateCart: (itemId, data) => API.put(`/cart/update/${itemId}/`, data),
+  // [{ item_id, quantity }], quantity 0 removes the line
+  updateCartItems: (items) => API.patch('/cart/items/', { items }),
   removeFromCart: (itemId) => API.delete(`/cart/remove/${itemId}/`),
   clearCart: () => API.post('/cart/clear/'),
+  // Guest carts live in a signed token until login
+  guestCart: (data) => API.post('/cart/guest/', data),
+  mergeCart: (token) => API.post('/cart/merge/', { token }),
 };
\ No newline at end of file
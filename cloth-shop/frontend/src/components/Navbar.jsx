@@ -13,7 +13,7 @@ export default function Navbar() {
   const dispatch = useDispatch();
   const { user, isAuthenticated, isAdmin } = useSelector((state) => state.auth);
   const { quantity: cartQuantity } = useSelector((state) => state.cart);
-  const { items: wishlistItems } = useSelector((state) => state.wishlist);
+  const { ids: wishlistIds } = useSelector((state) => state.wishlist);
 
   const [open, setOpen] = useState(false);
   const [profileOpen, setProfileOpen] = useState(false);
@@ -102,9 +102,9 @@ export default function Navbar() {
               {/* Wishlist Icon */}
               <Link to="/wishlist" className="relative p-2 hover:bg-gray-100 rounded-lg text-gray-900 transition">
                 <Heart size={22} strokeWidth={2.5} />
-                {wishlistItems.length > 0 && (
+                {wishlistIds.length > 0 && (
                   <span className="absolute -top-1 -right-1 bg-red-500 text-white text-xs font-bold w-5 h-5 flex items-center justify-center rounded-full">
-                    {wishlistItems.length}
+                    {wishlistIds.length}
                   </span>
                 )}
               </Link>
@@ -143,7 +143,7 @@ export default function Navbar() {
                           My Orders
                         </Link>
                         <Link to="/wishlist" className="block px-4 py-2 hover:bg-gray-100">
-                          Wishlist {wishlistItems.length > 0 && `(${wishlistItems.length})`}
+                          Wishlist {wishlistIds.length > 0 && `(${wishlistIds.length})`}
                         </Link>
                         {isAdmin && (
                           <Link
@@ -305,7 +305,7 @@ export default function Navbar() {
                         My Orders
                       </Link>
                       <Link to="/wishlist" className="block px-4 py-2 hover:bg-gray-100">
-                        Wishlist {wishlistItems.length > 0 && `(${wishlistItems.length})`}
+                        Wishlist {wishlistIds.length > 0 && `(${wishlistIds.length})`}
                       </Link>
                       {isAdmin && (
                         <Link
@@ -11,18 +11,12 @@ const ProductCardNew = ({ product }) => {
   const dispatch = useDispatch();
   const navigate = useNavigate();
   const { isAuthenticated } = useSelector((state) => state.auth);
-  const wishlistItems = useSelector((state) => state.wishlist.items);
+  const wishlistIds = useSelector((state) => state.wishlist.ids);
   const [quantity, setQuantity] = useState(1);
 
-  const isWishlisted = wishlistItems.some((item) => item.id === product.id);
+  const isWishlisted = wishlistIds.includes(product.id);
 
   const handleAddToCart = async () => {
-    if (!isAuthenticated) {
-      toast.error('Please login to add items to cart');
-      navigate('/login');
-      return;
-    }
-
     await dispatch(
       addToCart({
         product_id: product.id,
@@ -7,6 +7,9 @@ import toast from 'react-hot-toast';
 export default function ProductReviews({ productId }) {
   const { user, isAuthenticated } = useSelector((state) => state.auth);
   const [reviews, setReviews] = useState([]);
+  const [summary, setSummary] = useState({ average: 0, count: 0, histogram: {} });
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [rating, setRating] = useState(0);
@@ -32,7 +35,9 @@ export default function ProductReviews({ productId }) {
     try {
       setLoading(true);
       const response = await API.get(`/reviews/product/${productId}/`);
-      setReviews(response.data);
+      setReviews(response.data.results);
+      setSummary(response.data.summary);
+      setNextPage(response.data.next);
     } catch (error) {
       console.error('Failed to load reviews:', error);
     } finally {
@@ -40,6 +45,20 @@ export default function ProductReviews({ productId }) {
     }
   };
 
+  const fetchMoreReviews = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const response = await API.get(nextPage);
+      setReviews((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Failed to load more reviews:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const checkCanReview = async () => {
     try {
       const response = await API.get(`/reviews/can-review/${productId}/`);
@@ -99,9 +118,7 @@ export default function ProductReviews({ productId }) {
     } catch (error) { toast.error('Failed to delete review'); }
   };
 
-  const avgRating = reviews.length > 0
-    ? (reviews.reduce((sum, r) => sum + r.rating, 0) / reviews.length).toFixed(1)
-    : 0;
+  const avgRating = Number(summary.average || 0).toFixed(1);
 
   const displayedReviews = expanded ? reviews : reviews.slice(0, 2);
 
@@ -113,7 +130,7 @@ export default function ProductReviews({ productId }) {
           <MessageSquare size={20} className="text-indigo-600" />
           <h3 className="font-bold text-gray-900">Reviews</h3>
         </div>
-        {reviews.length > 0 && (
+        {summary.count > 0 && (
           <div className="flex items-center gap-2">
             <div className="flex gap-0.5">
               {[...Array(5)].map((_, i) => (
@@ -121,7 +138,7 @@ export default function ProductReviews({ productId }) {
               ))}
             </div>
             <span className="text-sm font-bold text-gray-800">{avgRating}</span>
-            <span className="text-xs text-gray-500">({reviews.length})</span>
+            <span className="text-xs text-gray-500">({summary.count})</span>
           </div>
         )}
       </div>
@@ -231,12 +248,22 @@ export default function ProductReviews({ productId }) {
             </div>
           ))}
 
-          {reviews.length > 2 && (
+          {expanded && nextPage && (
+            <button
+              onClick={fetchMoreReviews}
+              disabled={loadingMore}
+              className="w-full py-2 text-sm text-indigo-600 font-medium hover:bg-indigo-50 rounded-lg transition disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          )}
+
+          {summary.count > 2 && (
             <button
               onClick={() => setExpanded(!expanded)}
               className="w-full py-2 text-sm text-indigo-600 font-medium hover:bg-indigo-50 rounded-lg transition flex items-center justify-center gap-1"
             >
-              {expanded ? <><ChevronUp size={16} /> Show Less</> : <><ChevronDown size={16} /> Show All ({reviews.length})</>}
+              {expanded ? <><ChevronUp size={16} /> Show Less</> : <><ChevronDown size={16} /> Show All ({summary.count})</>}
             </button>
           )}
         </div>
@@ -11,9 +11,9 @@ const RelatedProductCard = ({ product }) => {
     const navigate = useNavigate();
     const dispatch = useDispatch();
     const { isAuthenticated } = useSelector((state) => state.auth);
-    const wishlistItems = useSelector((state) => state.wishlist.items);
+    const wishlistIds = useSelector((state) => state.wishlist.ids);
 
-    const isWishlisted = wishlistItems.some((item) => item.id === product.id);
+    const isWishlisted = wishlistIds.includes(product.id);
 
     const handleWishlist = (e) => {
         e.stopPropagation();
@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useSelector, useDispatch } from 'react-redux';
 import { useNavigate } from 'react-router-dom';
-import { removeFromCart, updateCartItem } from '../redux/slices/cartSlice';
+import { removeFromCart, updateCartItems } from '../redux/slices/cartSlice';
 import { Trash2, Plus, Minus, ShoppingCart, ArrowRight, Gift, Sparkles } from 'lucide-react';
 import toast from 'react-hot-toast';
 
@@ -24,24 +24,55 @@ export default function Cart() {
   const taxAmount = subtotal * taxRate;
   const grandTotal = subtotal - autoDiscount + shippingCost + taxAmount;
 
-  useEffect(() => {
+  // Guests may fill a cart, but checkout needs an account. The guest cart
+  // token stays in localStorage and is merged on the first fetch after login.
+  const handleCheckout = () => {
     if (!isAuthenticated) {
-      navigate('/login');
-      toast.error('Please login to view cart');
+      toast.error('Please login to checkout');
+      navigate('/login', { state: { from: '/checkout' } });
+      return;
     }
-  }, [isAuthenticated, navigate]);
+    navigate('/checkout');
+  };
 
   const handleRemove = (itemId) => {
     dispatch(removeFromCart(itemId));
     toast.success('Item removed from cart');
   };
 
+  // Quantity clicks are collected and sent as one batch once they settle
+  const [pendingQuantities, setPendingQuantities] = useState({});
+  const flushTimer = useRef(null);
+
+  useEffect(() => {
+    if (Object.keys(pendingQuantities).length === 0) return undefined;
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(async () => {
+      const operations = Object.entries(pendingQuantities).map(([item_id, quantity]) => ({
+        item_id,
+        quantity,
+      }));
+      await dispatch(updateCartItems(operations));
+      // Keep clicks that arrived while the request was in flight
+      setPendingQuantities((pending) => {
+        const next = { ...pending };
+        operations.forEach(({ item_id, quantity }) => {
+          if (next[item_id] === quantity) delete next[item_id];
+        });
+        return next;
+      });
+    }, 400);
+    return () => clearTimeout(flushTimer.current);
+  }, [pendingQuantities, dispatch]);
+
+  const quantityOf = (item) => pendingQuantities[item.id] ?? item.quantity;
+
   const handleQuantityChange = (itemId, quantity) => {
     if (quantity < 1) {
       handleRemove(itemId);
       return;
     }
-    dispatch(updateCartItem({ item_id: itemId, quantity }));
+    setPendingQuantities((pending) => ({ ...pending, [itemId]: quantity }));
   };
 
   if (items.length === 0) {
@@ -133,14 +164,14 @@ export default function Cart() {
 
                   <div className="flex items-center gap-2 bg-gray-100 rounded-lg px-3 py-2 h-fit">
                     <button
-                      onClick={() => handleQuantityChange(item.id, item.quantity - 1)}
+                      onClick={() => handleQuantityChange(item.id, quantityOf(item) - 1)}
                       className="p-1 hover:bg-gray-200 rounded"
                     >
                       <Minus size={16} />
                     </button>
-                    <span className="px-3 font-semibold">{item.quantity}</span>
+                    <span className="px-3 font-semibold">{quantityOf(item)}</span>
                     <button
-                      onClick={() => handleQuantityChange(item.id, item.quantity + 1)}
+                      onClick={() => handleQuantityChange(item.id, quantityOf(item) + 1)}
                       className="p-1 hover:bg-gray-200 rounded"
                     >
                       <Plus size={16} />
@@ -203,7 +234,7 @@ export default function Cart() {
               </div>
 
               <button
-                onClick={() => navigate('/checkout')}
+                onClick={handleCheckout}
                 className="w-full bg-indigo-600 text-white py-3 rounded-lg font-semibold hover:bg-indigo-700 transition flex items-center justify-center gap-2"
               >
                 Proceed to Checkout <ArrowRight size={18} />
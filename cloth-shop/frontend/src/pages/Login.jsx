@@ -1,6 +1,6 @@
 // cloth-shop/frontend/src/pages/Login.jsx
 import React, { useState } from 'react';
-import { useNavigate, Link } from 'react-router-dom';
+import { useNavigate, useLocation, Link } from 'react-router-dom';
 import { useDispatch, useSelector } from 'react-redux';
 import { login, googleLogin } from '../redux/slices/authSlice';
 import { Eye, EyeOff, Mail, Lock, AlertCircle } from 'lucide-react';
@@ -9,7 +9,10 @@ import toast from 'react-hot-toast';
 
 export default function Login() {
   const navigate = useNavigate();
+  const location = useLocation();
   const dispatch = useDispatch();
+  // Where to go after login, e.g. back to checkout from a guest cart
+  const redirectTo = location.state?.from || '/';
   const { loading, error } = useSelector((state) => state.auth);
   const [showPassword, setShowPassword] = useState(false);
   const [formData, setFormData] = useState({
@@ -32,14 +35,14 @@ export default function Login() {
     const result = await dispatch(login(formData));
     if (result.payload?.user) {
       toast.success('Login successful!');
-      navigate('/');
+      navigate(redirectTo, { replace: true });
     }
   };
 
   const handleGoogleSuccess = async (credentialResponse) => {
     const result = await dispatch(googleLogin(credentialResponse.credential));
     if (result.payload?.user) {
-      navigate('/');
+      navigate(redirectTo, { replace: true });
     }
   };
 
@@ -14,7 +14,7 @@ export default function ProductDetail() {
   const navigate = useNavigate();
   const dispatch = useDispatch();
   const { isAuthenticated } = useSelector((state) => state.auth);
-  const wishlistItems = useSelector((state) => state.wishlist.items);
+  const wishlistIds = useSelector((state) => state.wishlist.ids);
 
   const [product, setProduct] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -30,7 +30,7 @@ export default function ProductDetail() {
   const [zoomPosition, setZoomPosition] = useState({ x: 50, y: 50 });
   const imageContainerRef = useRef(null);
 
-  const isWishlisted = wishlistItems.some((item) => item.id === product?.id);
+  const isWishlisted = wishlistIds.includes(product?.id);
 
   useEffect(() => {
     fetchProduct();
@@ -105,12 +105,6 @@ export default function ProductDetail() {
   };
 
   const handleAddToCart = () => {
-    if (!isAuthenticated) {
-      toast.error('Please login to add items');
-      navigate('/login');
-      return;
-    }
-
     if (!selectedVariant) {
       toast.error('Please select a color');
       return;
@@ -13,19 +13,13 @@ const ProductCardNew = ({ product }) => {
   const dispatch = useDispatch();
   const navigate = useNavigate();
   const { isAuthenticated } = useSelector((state) => state.auth);
-  const wishlistItems = useSelector((state) => state.wishlist.items) || [];
+  const wishlistIds = useSelector((state) => state.wishlist.ids) || [];
   const [quantity, setQuantity] = useState(1);
 
-  const isWishlisted = Array.isArray(wishlistItems) && wishlistItems.some((item) => item.id === product.id);
+  const isWishlisted = wishlistIds.includes(product.id);
 
   const handleAddToCart = (e) => {
     e.stopPropagation();
-    if (!isAuthenticated) {
-      toast.error('Please login to add items to cart');
-      navigate('/login');
-      return;
-    }
-
     dispatch(
       addToCart({
         product_id: product.id,
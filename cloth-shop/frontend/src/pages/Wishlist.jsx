@@ -13,7 +13,7 @@ export default function Wishlist() {
   const { items } = useSelector((state) => state.wishlist);
 
   useEffect(() => {
-    dispatch(fetchWishlist());
+    dispatch(fetchWishlist({ expand: true }));
   }, [dispatch]);
 
   if (!items || items.length === 0) {
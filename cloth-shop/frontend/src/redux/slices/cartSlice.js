@@ -3,10 +3,38 @@ import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { cartAPI } from '../../api/cart';
 import toast from 'react-hot-toast';
 
+const GUEST_CART_KEY = 'guest_cart';
+
+// Guest line ids are "product:variant:size"; send the full new quantity
+const guestLine = (id, quantity) => {
+  const [product_id, variant_id, size] = id.split(':');
+  return { product_id, variant_id: variant_id || null, size: size || null, quantity };
+};
+
+const updateGuestCart = async (items) => {
+  const response = await cartAPI.guestCart({
+    token: localStorage.getItem(GUEST_CART_KEY),
+    items,
+  });
+  localStorage.setItem(GUEST_CART_KEY, response.data.token);
+  response.data.errors?.forEach((line) => toast.error(line.error));
+  return response.data;
+};
+
 export const fetchCart = createAsyncThunk(
   'cart/fetchCart',
-  async (_, { rejectWithValue }) => {
+  async (_, { getState, rejectWithValue }) => {
     try {
+      if (!getState().auth.isAuthenticated) {
+        return await updateGuestCart([]);
+      }
+      // First load after login: fold the guest cart in with one request
+      const guestToken = localStorage.getItem(GUEST_CART_KEY);
+      if (guestToken) {
+        const response = await cartAPI.mergeCart(guestToken);
+        localStorage.removeItem(GUEST_CART_KEY);
+        return response.data.cart;
+      }
       const response = await cartAPI.getCart();
       return response.data;
     } catch (error) {
@@ -17,8 +45,17 @@ export const fetchCart = createAsyncThunk(
 
 export const addToCart = createAsyncThunk(
   'cart/addToCart',
-  async (data, { rejectWithValue }) => {
+  async (data, { getState, rejectWithValue }) => {
     try {
+      const { auth, cart } = getState();
+      if (!auth.isAuthenticated) {
+        const id = `${data.product_id}:${data.variant_id || ''}:${data.size || ''}`;
+        const existing = cart.items.find((item) => item.id === id);
+        const quantity = (existing?.quantity || 0) + (data.quantity || 1);
+        const guestCart = await updateGuestCart([guestLine(id, quantity)]);
+        toast.success('Added to cart!');
+        return guestCart;
+      }
       const response = await cartAPI.addToCart(data);
       toast.success('Added to cart!');
       return response.data.cart;
@@ -31,8 +68,11 @@ export const addToCart = createAsyncThunk(
 
 export const updateCartItem = createAsyncThunk(
   'cart/updateCartItem',
-  async ({ item_id, quantity }, { rejectWithValue }) => {
+  async ({ item_id, quantity }, { getState, rejectWithValue }) => {
     try {
+      if (!getState().auth.isAuthenticated) {
+        return await updateGuestCart([guestLine(item_id, Math.max(quantity, 0))]);
+      }
       const response = await cartAPI.updateCart(item_id, { quantity });
       return response.data;
     } catch (error) {
@@ -42,10 +82,34 @@ export const updateCartItem = createAsyncThunk(
   }
 );
 
+export const updateCartItems = createAsyncThunk(
+  'cart/updateCartItems',
+  async (operations, { getState, rejectWithValue }) => {
+    try {
+      if (!getState().auth.isAuthenticated) {
+        return await updateGuestCart(
+          operations.map(({ item_id, quantity }) => guestLine(item_id, quantity))
+        );
+      }
+      const response = await cartAPI.updateCartItems(operations);
+      return response.data;
+    } catch (error) {
+      const data = error.response?.data;
+      toast.error(data?.items?.[0]?.error || data?.error || 'Failed to update cart');
+      return rejectWithValue(data);
+    }
+  }
+);
+
 export const removeFromCart = createAsyncThunk(
   'cart/removeFromCart',
-  async (item_id, { rejectWithValue }) => {
+  async (item_id, { getState, rejectWithValue }) => {
     try {
+      if (!getState().auth.isAuthenticated) {
+        const guestCart = await updateGuestCart([guestLine(item_id, 0)]);
+        toast.success('Removed from cart');
+        return guestCart;
+      }
       const response = await cartAPI.removeFromCart(item_id);
       toast.success('Removed from cart');
       return response.data;
@@ -58,8 +122,12 @@ export const removeFromCart = createAsyncThunk(
 
 export const clearCart = createAsyncThunk(
   'cart/clearCart',
-  async (_, { rejectWithValue }) => {
+  async (_, { getState, rejectWithValue }) => {
     try {
+      if (!getState().auth.isAuthenticated) {
+        localStorage.removeItem(GUEST_CART_KEY);
+        return { items: [], total_price: 0, total_quantity: 0 };
+      }
       await cartAPI.clearCart();
       toast.success('Cart cleared');
       return { items: [], total_price: 0, total_quantity: 0 };
@@ -124,6 +192,14 @@ const cartSlice = createSlice({
         state.quantity = action.payload.total_quantity || 0;
       });
 
+    // Batch update
+    builder
+      .addCase(updateCartItems.fulfilled, (state, action) => {
+        state.items = action.payload.items || [];
+        state.total = action.payload.total_price || 0;
+        state.quantity = action.payload.total_quantity || 0;
+      });
+
     // Remove from Cart
     builder
       .addCase(removeFromCart.fulfilled, (state, action) => {
@@ -2,12 +2,43 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import API from '../../api/api';
 import toast from 'react-hot-toast';
+import { logout } from './authSlice';
 
+const GUEST_WISHLIST_KEY = 'guest_wishlist';
+
+// Before guest wishlists had their own key, 'wishlist' held a copy of the
+// server wishlist; merging it again would undo removals made elsewhere
+localStorage.removeItem('wishlist');
+
+const guestItems = () => JSON.parse(localStorage.getItem(GUEST_WISHLIST_KEY)) || [];
+
+const saveGuestItems = (items) => localStorage.setItem(GUEST_WISHLIST_KEY, JSON.stringify(items));
+
+export const hasGuestWishlist = () => guestItems().length > 0;
+
+// Hearts and counts only need the ids; the wishlist page asks for
+// { expand: true } to get the product cards as well
 export const fetchWishlist = createAsyncThunk(
   'wishlist/fetchWishlist',
+  async ({ expand = false } = {}, { rejectWithValue }) => {
+    try {
+      const response = await API.get(expand ? '/wishlist/?expand=products' : '/wishlist/');
+      return response.data;
+    } catch (error) {
+      return rejectWithValue(error.response?.data);
+    }
+  }
+);
+
+// Right after login: add what was saved while logged out, then forget it so
+// later loads are plain GETs
+export const mergeGuestWishlist = createAsyncThunk(
+  'wishlist/mergeGuestWishlist',
   async (_, { rejectWithValue }) => {
     try {
-      const response = await API.get('/wishlist/');
+      const add = guestItems().map((item) => item.id);
+      const response = await API.post('/wishlist/bulk/', { add });
+      localStorage.removeItem(GUEST_WISHLIST_KEY);
       return response.data;
     } catch (error) {
       return rejectWithValue(error.response?.data);
@@ -17,10 +48,14 @@ export const fetchWishlist = createAsyncThunk(
 
 export const addToWishlist = createAsyncThunk(
   'wishlist/addToWishlist',
-  async (product, { rejectWithValue }) => {
+  async (product, { getState, rejectWithValue }) => {
     try {
-      // Since our API might not have a dedicated wishlist endpoint,
-      // we'll store in localStorage
+      // Guests keep the wishlist in localStorage; it is merged on login
+      if (getState().auth.isAuthenticated) {
+        await API.post(`/wishlist/add/${product.id}/`);
+      } else {
+        saveGuestItems([...guestItems().filter((item) => item.id !== product.id), product]);
+      }
       toast.success('Added to wishlist');
       return product;
     } catch (error) {
@@ -31,8 +66,13 @@ export const addToWishlist = createAsyncThunk(
 
 export const removeFromWishlist = createAsyncThunk(
   'wishlist/removeFromWishlist',
-  async (productId, { rejectWithValue }) => {
+  async (productId, { getState, rejectWithValue }) => {
     try {
+      if (getState().auth.isAuthenticated) {
+        await API.delete(`/wishlist/remove/${productId}/`);
+      } else {
+        saveGuestItems(guestItems().filter((item) => item.id !== productId));
+      }
       toast.success('Removed from wishlist');
       return productId;
     } catch (error) {
@@ -44,42 +84,48 @@ export const removeFromWishlist = createAsyncThunk(
 const wishlistSlice = createSlice({
   name: 'wishlist',
   initialState: {
-    items: JSON.parse(localStorage.getItem('wishlist')) || [],
+    ids: guestItems().map((item) => item.id),
+    items: guestItems(),
     loading: false,
     error: null,
   },
   extraReducers: (builder) => {
-    // Fetch Wishlist
+    // Fetch Wishlist (and the post-login merge, which answers the same way)
+    const setServerItems = (state, action) => {
+      state.ids = action.payload?.product_ids || [];
+      if (action.payload?.products) {
+        state.items = action.payload.products;
+      } else {
+        state.items = state.items.filter((item) => state.ids.includes(item.id));
+      }
+    };
     builder
-      .addCase(fetchWishlist.fulfilled, (state, action) => {
-        // Ensure items is always an array, handle different API response formats
-        const data = action.payload;
-        if (Array.isArray(data)) {
-          state.items = data;
-        } else if (data && Array.isArray(data.items)) {
-          state.items = data.items;
-        } else if (data && Array.isArray(data.results)) {
-          state.items = data.results;
-        } else {
-          state.items = [];
-        }
-      });
+      .addCase(fetchWishlist.fulfilled, setServerItems)
+      .addCase(mergeGuestWishlist.fulfilled, setServerItems);
 
     // Add to Wishlist
     builder
       .addCase(addToWishlist.fulfilled, (state, action) => {
+        if (!state.ids.includes(action.payload.id)) {
+          state.ids.push(action.payload.id);
+        }
         if (!state.items.find((item) => item.id === action.payload.id)) {
           state.items.push(action.payload);
-          localStorage.setItem('wishlist', JSON.stringify(state.items));
         }
       });
 
     // Remove from Wishlist
     builder
       .addCase(removeFromWishlist.fulfilled, (state, action) => {
+        state.ids = state.ids.filter((id) => id !== action.payload);
         state.items = state.items.filter((item) => item.id !== action.payload);
-        localStorage.setItem('wishlist', JSON.stringify(state.items));
       });
+
+    // The account's wishlist stays on the server; show the guest one again
+    builder.addCase(logout.fulfilled, (state) => {
+      state.items = guestItems();
+      state.ids = state.items.map((item) => item.id);
+    });
   },
 });
 